@@ -5,6 +5,124 @@ load_dotenv()
 
 class Settings(BaseSettings):
     ENV: str = "debug"
+
+    # deployment
+    WORKERS: int = 1  # uvicorn worker processes
+    SHARED_STATE_DIR: str = "/tmp/technical_analysis"  # state shared by the workers of one host
+    PROCESS_POOL_WORKERS: int = 0  # processes parsing pages and running calculations, 0 to run them inline
     PLAYWRIGHT_TIMEOUT: int = 10000  # in milliseconds
+    PLAYWRIGHT_BLOCKED_RESOURCE_TYPES: list[str] = ["image", "media", "font"]
+    PLAYWRIGHT_BLOCKED_DOMAINS: list[str] = [
+        "doubleclick.net",
+        "googlesyndication.com",
+        "googletagmanager.com",
+        "google-analytics.com",
+        "amazon-adsystem.com",
+        "scorecardresearch.com",
+        "criteo.com",
+        "taboola.com",
+        "outbrain.com",
+        "ads.yahoo.com",
+        "analytics.yahoo.com",
+    ]
+
+    # parsing
+    HTML_PARSER: str = "lxml"  # "lxml" or "html.parser"
+
+    # record and replay
+    SCRAPE_MODE: str = "live"  # "live", "record" to save fetched pages to the corpus, or "replay" to serve them from it
+    SCRAPE_CORPUS_DIR: str = "corpus"
+
+    # http fetching
+    FETCH_HTTP_FIRST: bool = True  # try plain HTTP before rendering pages in a browser
+    FETCH_HTTP_RETRY_AFTER: int = 3600  # in seconds, before retrying HTTP for a pattern where it failed
+    HTTP_POOL_CONNECTIONS: int = 4  # number of hosts with pooled connections
+    HTTP_POOL_SIZE: int = 32  # keep-alive connections per host
+
+    # upstream resilience, per host
+    BREAKER_FAILURE_THRESHOLD: int = 5  # consecutive failed fetches before failing fast
+    BREAKER_RESET_TIMEOUT: float = 30  # in seconds, before letting a probe fetch through
+    ADAPTIVE_TIMEOUT_PERCENTILE: float = 95  # percentile of recent fetch latencies, a timed out fetch counting as its timeout
+    ADAPTIVE_TIMEOUT_MULTIPLIER: float = 2  # timeout as a multiple of that percentile, at most PLAYWRIGHT_TIMEOUT
+    ADAPTIVE_TIMEOUT_MIN: int = 2000  # in milliseconds
+    ADAPTIVE_TIMEOUT_MIN_SAMPLES: int = 20  # fetches before adapting the timeout
+    ADAPTIVE_TIMEOUT_WINDOW: int = 200  # recent fetches considered
+    RETRY_MAX_ATTEMPTS: int = 2  # retries of a failed fetch
+    RETRY_BUDGET_RATIO: float = 0.1  # retries allowed per fetch, on average
+    RETRY_BUDGET_BURST: int = 10  # retries allowed at once
+    RETRY_BACKOFF_BASE: float = 0.5  # in seconds, doubled on each retry
+
+    # browser pool
+    BROWSER_POOL_SIZE: int = 2  # number of long-lived browsers per worker
+    BROWSER_POOL_BUDGET: int | None = None  # browsers across all workers, split evenly, overrides BROWSER_POOL_SIZE
+    BROWSER_POOL_PAGES_PER_BROWSER: int = 8  # concurrent pages per browser for async scrapes
+    BROWSER_POOL_MAX_QUEUE: int = 256  # scrapes allowed to wait for a free browser
+    BROWSER_POOL_ACQUIRE_TIMEOUT: float = 30  # in seconds
+    BROWSER_POOL_MAX_PAGES: int = 100  # pages served before a browser is recycled
+
+    # financials endpoint
+    FINANCIALS_SECTION_TIMEOUT: float = 30  # in seconds, per section
+
+    # metrics
+    SERVER_TIMING: bool = False  # let requests sending an X-Server-Timing header get their stage timings in a Server-Timing header
+
+    # exchange rates
+    FX_BASE_CURRENCY: str = "USD"  # rate table other currencies are triangulated through
+
+    # mongodb
+    MONGO_ENDPOINT: str = "mongodb://localhost:27017"
+    MONGO_INITDB_ROOT_USERNAME: str | None = None
+    MONGO_INITDB_ROOT_PASSWORD: str | None = None
+    MONGO_POOL_SIZE: int = 100  # connections shared by every collection
+
+    # fundamentals and price store
+    STORE_ENABLED: bool = False  # save scraped financials and price histories to mongodb
+    STORE_MONGO_DB: str = "technical_analysis"
+    STORE_BATCH_SIZE: int = 5000  # documents per bulk write or batched read
+    STORE_MAX_IDS: int = 5000  # securities per store read request
+    STORE_SAVED_MAX: int = 10000  # securities whose last write is remembered to skip unchanged rewrites
+
+    # cache
+    CACHE_MAX_SIZE: int = 10000  # entries kept in the in-process tier
+    CACHE_MONGO_ENABLED: bool = False  # share cached results through mongodb
+    CACHE_MONGO_DB: str = "technical_analysis"
+    CACHE_MONGO_COLLECTION: str = "scrape_cache"
+    CACHE_SQLITE_ENABLED: bool = False  # share cached results between the workers of one host, always on with several workers
+    CACHE_LEASE_TIMEOUT: float = 60  # in seconds, how long other workers wait for a scrape in progress
+    CACHE_TTL_OVERVIEW: int = 86400  # in seconds
+    CACHE_TTL_PRICE: int = 60  # in seconds
+    CACHE_TTL_QUOTE: int = 60  # in seconds
+    CACHE_TTL_FINANCIALS: int = 86400  # in seconds
+    CACHE_TTL_FX: int = 60  # in seconds
+
+    # price history
+    HISTORY_REFRESH_INTERVAL: int = 300  # in seconds, before fetching newer bars
+    HISTORY_MAX_SECURITIES: int = 2000  # histories kept in memory, the least recently used are dropped first
+
+    # outbound rate limit, per host
+    OUTBOUND_RATE_LIMIT: float = 2  # requests per second, only enforced on background refreshes
+    OUTBOUND_RATE_BURST: int = 10
+
+    # background refresh
+    SCHEDULER_ENABLED: bool | None = None  # defaults to enabled when there is a watchlist
+    WATCHLIST: list[str] = []  # security IDs kept fresh in the cache, e.g. ["AAPL", "D05.SI"]
+    WATCHLIST_FX: bool = False  # keep the exchange rate table fresh in the cache
+    SCHEDULER_PRICE_INTERVAL: int = 45  # in seconds, below CACHE_TTL_PRICE so entries do not expire
+    SCHEDULER_FX_INTERVAL: int = 45  # in seconds, below CACHE_TTL_FX
+    SCHEDULER_FINANCIALS_INTERVAL: int = 43200  # in seconds, below CACHE_TTL_OVERVIEW and CACHE_TTL_FINANCIALS
+    SCHEDULER_JITTER: float = 0.1  # fraction of the interval each refresh is randomly moved by
+    SCHEDULER_CONCURRENCY: int = 4  # refreshes in flight
+    SCHEDULER_RECENT_TTL: int = 3600  # in seconds, requested securities are kept fresh for this long
+    SCHEDULER_RECENT_MAX: int = 1000  # requested securities kept fresh, the least recently requested are dropped first
+    SCHEDULER_SYNC_INTERVAL: float = 5  # in seconds, how often securities requested from the other workers are picked up
+
+    # portfolio valuation
+    PORTFOLIO_CONCURRENCY: int = 8  # holdings valued at once
+    PORTFOLIO_DEADLINE: float = 120  # in seconds, for the whole valuation
+    PORTFOLIO_MAX_HOLDINGS: int = 200
+
+    # batch endpoints
+    BATCH_CONCURRENCY: int = 16  # scrapes in flight per batch request
+    BATCH_MAX_IDS: int = 500
 
 settings = Settings()
\ No newline at end of file
@@ -0,0 +1,216 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable
+
+# in seconds, from a parsed page to a slow browser render
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(pairs) + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class _Metric(ABC):
+    """
+    A named metric with a fixed set of label names, rendered in the Prometheus text format.
+    """
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def _key(self, labels: dict) -> tuple[str, ...]:
+        if labels.keys() != set(self.labelnames):
+            raise ValueError(f"Metric {self.name} expects labels {self.labelnames}, got {tuple(labels)}.")
+        return tuple(_escape(labels[name]) for name in self.labelnames)
+
+    @abstractmethod
+    def _samples(self) -> list[str]:
+        """
+        Get the sample lines of the metric, without its HELP and TYPE lines.
+        """
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        return "\n".join(lines + self._samples())
+
+
+class Counter(_Metric):
+    """
+    Monotonically increasing count, e.g. of cache hits or timeouts.
+    """
+
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in values]
+
+
+class Gauge(_Metric):
+    """
+    Value read when the metrics are collected, e.g. the pages a browser pool has in use.
+    """
+
+    type = "gauge"
+
+    def track(self, func: Callable[[], float], **labels):
+        """
+        Read the value of the gauge from ``func`` on every collection.
+        """
+        with self._lock:
+            self._values[self._key(labels)] = func
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            funcs = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {func()}" for key, func in funcs]
+
+
+class Histogram(_Metric):
+    """
+    Distribution of observed values in cumulative buckets, e.g. of stage latencies.
+    """
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = buckets
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # one count per bucket and the +Inf bucket, then the sum
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            counts[-2] += 1
+            counts[-1] += value
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            values = [(key, list(counts)) for key, counts in self._values.items()]
+        lines = []
+        for key, counts in values:
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {counts[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {counts[-2]}")
+        return lines
+
+
+class Registry:
+    """
+    Collection of every metric of the process.
+    """
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric: _Metric):
+        self._metrics.append(metric)
+
+    def render(self) -> str:
+        """
+        Render every metric in the Prometheus text exposition format.
+        """
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+
+registry = Registry()
+
+stage_seconds = Histogram("scrape_stage_seconds", "Time spent in each stage of a scrape or calculation.", ("stage",))
+timeouts_total = Counter("scrape_timeouts_total", "Browser navigations or waits that timed out.", ("stage",))
+fetch_total = Counter("fetch_pages_total", "Pages fetched, by URL pattern and the strategy that served them.", ("pattern", "strategy"))
+cache_requests_total = Counter(
+    "cache_requests_total",
+    "Cache lookups by data type and outcome: hit, shared_hit, coalesced, miss, refresh or stale.",
+    ("data_type", "result"),
+)
+browser_pool_pages = Gauge("browser_pool_pages", "Browser pool pages by state: in_use, capacity or waiting.", ("pool", "state"))
+browser_pool_rejections_total = Counter("browser_pool_rejections_total", "Scrapes rejected because the browser pool was full.", ("pool",))
+scheduler_refreshes_total = Counter("scheduler_refreshes_total", "Background refreshes by kind and result.", ("kind", "result"))
+scheduler_jobs = Gauge("scheduler_jobs", "Refresh jobs scheduled in the background.")
+upstream_state = Gauge("upstream_circuit_state", "Circuit breaker state of upstream hosts: 0 closed, 1 half open, 2 open.", ("host",))
+upstream_timeout_ms = Gauge("upstream_timeout_ms", "Adaptive fetch timeout by upstream host, URL pattern and strategy.", ("host", "pattern", "strategy"))
+upstream_failures_total = Counter("upstream_failures_total", "Failed or incomplete fetches from upstream hosts.", ("host",))
+upstream_retries_total = Counter("upstream_retries_total", "Fetches retried within the retry budget of upstream hosts.", ("host",))
+http_request_seconds = Histogram("http_request_seconds", "Time to respond to API requests.", ("method", "endpoint", "status"))
+
+# stage timings of the current API request, reported in the Server-Timing header
+_timings: ContextVar[dict[str, float] | None] = ContextVar("timings", default=None)
+
+
+@contextmanager
+def timed(stage: str, timeouts: type[BaseException] | tuple[type[BaseException], ...] = ()):
+    """
+    Record the time spent in a stage, as a context manager or a decorator of sync functions.
+
+    Stages may nest, e.g. the "extract_*" stages include the "parse" of their page.
+
+    :param stage: Name of the stage, e.g. "navigate".
+    :param timeouts: Exceptions counted as timeouts of the stage.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except timeouts:
+        timeouts_total.inc(stage=stage)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_seconds.observe(elapsed, stage=stage)
+        timings = _timings.get()
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0) + elapsed
+
+
+@contextmanager
+def collect_timings():
+    """
+    Collect the stage timings of everything run in this context, including tasks and threads it starts.
+
+    :return: Dictionary of stage name to total seconds, filled in as stages complete.
+    """
+    timings = {}
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+def server_timing(timings: dict[str, float]) -> str:
+    """
+    Format stage timings as a Server-Timing header value.
+    """
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items())
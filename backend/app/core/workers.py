@@ -0,0 +1,33 @@
+import fcntl
+from pathlib import Path
+from loguru import logger
+
+from app.core.config import settings
+
+# lock files held for the lifetime of this process
+_held = {}
+
+
+def hold_worker_lock(name: str) -> bool:
+    """
+    Try to become the one worker process of this host running a singleton task, e.g. the refresh scheduler.
+
+    The lock is released by the operating system when the process exits, so another worker can take over
+    after a restart.
+
+    :param name: Name of the task.
+    :return: Whether this process holds the lock.
+    """
+    if name in _held:
+        return True
+    path = Path(settings.SHARED_STATE_DIR) / f"{name}.lock"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    lock_file = open(path, "w")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        logger.debug(f"Another worker holds the {name} lock.")
+        return False
+    _held[name] = lock_file
+    return True
@@ -1,6 +1,28 @@
-from pymongo import MongoClient
+import functools
 from app.core.config import settings
 
+
+@functools.cache
+def get_client():
+    """
+    Get the MongoDB client shared by every collection, holding a pool of connections.
+    """
+    from pymongo import MongoClient
+
+    return MongoClient(
+        settings.MONGO_ENDPOINT,
+        username=settings.MONGO_INITDB_ROOT_USERNAME,
+        password=settings.MONGO_INITDB_ROOT_PASSWORD,
+        maxPoolSize=settings.MONGO_POOL_SIZE,
+    )
+
+
+def close_client():
+    if get_client.cache_info().currsize:
+        get_client().close()
+        get_client.cache_clear()
+
+
 class MongoDb:
     def __init__(self, db_name: str, collection_name: str):
         self.db_name = db_name
@@ -10,14 +32,12 @@ class MongoDb:
         self.collection = None
 
     def connect(self):
-        self.client = MongoClient(
-            settings.MONGO_ENDPOINT, 
-            username=settings.MONGO_INITDB_ROOT_USERNAME, 
-            password=settings.MONGO_INITDB_ROOT_PASSWORD
-        )
+        self.client = get_client()
         self.db = self.client[self.db_name]
         self.collection = self.db[self.collection_name]
 
     def close(self):
-        if self.client:
-            self.client.close()
\ No newline at end of file
+        # the client is shared, see ``close_client``
+        self.client = None
+        self.db = None
+        self.collection = None
@@ -1,13 +1,69 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, BackgroundTasks
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from contextlib import asynccontextmanager
 from loguru import logger
+import asyncio
+import importlib
+import json
 import traceback
+import math
+import time
 
+from app.core.config import settings
 from app.core.logging import config_logger
-from app.schema.body import PredictRequestBody
-from app.service.yahoo_finance import scrape_price, scrape_main, scrape_financial_statement, scrape_balance
-from app.service.exchange_rate import get_exchange_rate
-from app.service.calculations import predict_values, fallback_predict_average_income
+from app.core.metrics import registry, collect_timings, server_timing, http_request_seconds
+from app.core.workers import hold_worker_lock
+from app.db.db import close_client
+from app.schema.body import PredictRequestBody, PredictBatchRequestBody, IndicatorsRequestBody, BatchRequestBody, StoreRequestBody, StorePricesRequestBody, PortfolioRequestBody
+from app.service.yahoo_finance import async_scrape_price, async_scrape_main, async_scrape_quote, async_scrape_financials
+from app.service.exchange_rate import async_get_exchange_rate, async_get_rate_table, rate_matrix
+from app.service.history import async_get_history, COLUMNS, HistoryNotFoundError
+from app.service.browser_pool import browser_pool, async_browser_pool, BrowserPoolFullError
+from app.service.cache import cache
+from app.service.resilience import CircuitOpenError
+from app.service.scheduler import scheduler, SharedRequests
+from app.service.store import store
+from app.service.batch import run_batch, stream_batch
+from app.service.portfolio import PortfolioValuation
+from app.service.offload import run_cpu_bound, shutdown as shutdown_process_pool
+from app.service.calculations import predict_values, predict_values_batch, fallback_predict_average_income, compute_indicators_batch, INDICATORS
+
+# sent by clients asking for the stage timings of a request
+SERVER_TIMING_REQUEST_HEADER = "X-Server-Timing"
+
+# heavy dependencies imported on first use, pre-warmed in the background at startup
+PREWARM_MODULES = ("bs4", "soupsieve", "lxml", "requests", "pymongo", "scipy.signal")
+
+
+def _prewarm():
+    """
+    Import heavy dependencies so the first requests using them do not pay for the import.
+    """
+    for module in PREWARM_MODULES:
+        try:
+            importlib.import_module(module)
+        except ImportError as e:
+            logger.warning(f"Failed to pre-warm {module}: {e}")
+    logger.debug("Pre-warmed heavy dependencies.")
+
+
+def _save_to_store(save, records: dict):
+    """
+    Save scraped data to the store after the response is sent, without failing the request.
+    """
+    try:
+        save(records)
+    except Exception as e:
+        logger.warning(f"Failed to save {', '.join(records)} to the store: {e!r}")
+
+
+async def _start_browser_pool():
+    try:
+        await async_browser_pool.start()
+    except Exception:
+        # already logged, scrapes fall back to launching their own browser
+        pass
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -15,12 +71,62 @@ async def lifespan(app: FastAPI):
     Manage application dependencies
     """
     config_logger()
+    # accept requests right away, dependencies and browsers load in the background
+    background = [
+        asyncio.create_task(asyncio.to_thread(_prewarm)),
+        asyncio.create_task(_start_browser_pool()),
+    ]
+    scheduler_enabled = settings.SCHEDULER_ENABLED
+    if scheduler_enabled is None:
+        scheduler_enabled = bool(settings.WATCHLIST or settings.WATCHLIST_FX)
+    if scheduler_enabled:
+        if settings.WORKERS > 1:
+            # the other workers record the securities they are asked for in the shared state
+            scheduler.shared = SharedRequests()
+        # with several workers, only the one holding the lock refreshes in the background
+        if hold_worker_lock("scheduler"):
+            scheduler.start()
     yield
+    await scheduler.stop()
+    scheduler.close()
+    for task in background:
+        task.cancel()
+    await async_browser_pool.stop()
+    # started by the first sync scrape, if any
+    await asyncio.to_thread(browser_pool.stop)
+    shutdown_process_pool()
+    cache.close()
+    store.close()
+    close_client()
 
 
 app = FastAPI(lifespan=lifespan)
 
 
+@app.middleware("http")
+async def record_timings(request: Request, call_next):
+    """
+    Record the response time of each request, and report its stage timings in a Server-Timing header
+    if enabled and the request asks for them with an X-Server-Timing header.
+    """
+    start = time.perf_counter()
+    if settings.SERVER_TIMING and SERVER_TIMING_REQUEST_HEADER in request.headers:
+        with collect_timings() as timings:
+            response = await call_next(request)
+        if timings:
+            response.headers["Server-Timing"] = server_timing(timings)
+    else:
+        response = await call_next(request)
+    endpoint = request.scope.get("endpoint")
+    http_request_seconds.observe(
+        time.perf_counter() - start,
+        method=request.method,
+        endpoint=endpoint.__name__ if endpoint else "unmatched",
+        status=response.status_code,
+    )
+    return response
+
+
 @app.get("/health")
 def health_check():
     """
@@ -29,59 +135,224 @@ def health_check():
     return {"status": "ok"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """
+    Expose stage latencies, cache hit rates, browser pool utilisation and timeouts in the Prometheus text format.
+    """
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/finance/overview/{id}", response_model=dict)
-def get_security_overview(id: str) -> dict:
+async def get_security_overview(id: str) -> dict:
     """
     Get the overview of a security by its ID.
 
     :param id: The ID of the security.
     :return: The overview of the security.
     """
+    scheduler.touch(id)
     try:
-        overview = scrape_main(id)
+        overview = await async_scrape_main(id)
         return overview
+    except (BrowserPoolFullError, CircuitOpenError) as e:
+        logger.warning(e)
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/finance/price/{id}", response_model=float)
-def get_security_price(id: str) -> float:
+async def get_security_price(id: str) -> float:
     """
     Get the price of a security by its ID.
 
     :param id: The ID of the security.
     :return: The price of the security.
     """
+    scheduler.touch(id)
     try:
-        price = scrape_price(id)
+        price = await async_scrape_price(id)
         return price
+    except (BrowserPoolFullError, CircuitOpenError) as e:
+        logger.warning(e)
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=str(e))
     
 
+@app.get("/finance/quote/{id}", response_model=dict)
+async def get_security_quote(id: str) -> dict:
+    """
+    Get the overview and the latest price of a security by its ID from a single page load.
+
+    :param id: The ID of the security.
+    :return: The name, sector, exchange currency and price of the security.
+    """
+    scheduler.touch(id)
+    try:
+        quote = await async_scrape_quote(id)
+        return quote
+    except (BrowserPoolFullError, CircuitOpenError) as e:
+        logger.warning(e)
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/finance/history/{id}", response_model=dict)
+async def get_security_history(id: str, background_tasks: BackgroundTasks) -> dict:
+    """
+    Get the daily price history of a security by its ID.
+
+    :param id: The ID of the security.
+    :return: The dates and the open, high, low, close, adjusted close and volume columns, oldest first.
+    """
+    scheduler.touch(id)
+    try:
+        history = await async_get_history(id)
+        if settings.STORE_ENABLED:
+            background_tasks.add_task(_save_to_store, store.save_prices, {id: history})
+        return history.to_dict()
+    except HistoryNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except (BrowserPoolFullError, CircuitOpenError) as e:
+        logger.warning(e)
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/finance/overview/batch", response_model=None)
+async def get_security_overviews(body: BatchRequestBody) -> dict | StreamingResponse:
+    """
+    Get the overviews of multiple securities.
+
+    :param body: The IDs of the securities and whether to stream the results.
+    :return: The per-ID overviews and errors, or an NDJSON stream of them.
+    """
+    return await _batch_response(body, async_scrape_main)
+
+
+@app.post("/finance/price/batch", response_model=None)
+async def get_security_prices(body: BatchRequestBody) -> dict | StreamingResponse:
+    """
+    Get the prices of multiple securities.
+
+    :param body: The IDs of the securities and whether to stream the results.
+    :return: The per-ID prices and errors, or an NDJSON stream of them.
+    """
+    return await _batch_response(body, async_scrape_price)
+
+
+async def _batch_response(body: BatchRequestBody, fetch) -> dict | StreamingResponse:
+    """
+    Run a scraper over the IDs of a batch request and format the response.
+    """
+    if body.stream:
+        async def lines():
+            async for outcome in stream_batch(body.ids, fetch):
+                yield json.dumps(outcome) + "\n"
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+    return await run_batch(body.ids, fetch)
+
+
 @app.get("/finance/financials/{id}", response_model=dict)
-def get_financials(id: str) -> dict:
+async def get_financials(id: str, background_tasks: BackgroundTasks) -> dict:
     """
     Get the financials of a security by its ID.
 
+    Sections are scraped concurrently; sections that fail are omitted and reported under "errors".
+
     :param id: The ID of the security.
     :return: The financials of the security.
     """
+    scheduler.touch(id)
     try:
-        financials = {
-            "financial_statement": scrape_financial_statement(id), 
-            "balance_sheet": scrape_balance(id)
-        }
+        financials, errors = await async_scrape_financials(id)
+        if not financials:
+            # every section failed, surface the first error
+            raise next(iter(errors.values()))
+        if settings.STORE_ENABLED:
+            background_tasks.add_task(_save_to_store, store.save_fundamentals, {id: dict(financials)})
+        if errors:
+            financials["errors"] = {name: str(e) for name, e in errors.items()}
         return financials
+    except (BrowserPoolFullError, CircuitOpenError) as e:
+        logger.warning(e)
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=str(e))
     
 
+@app.post("/portfolio/valuation", response_model=None)
+async def value_portfolio(body: PortfolioRequestBody) -> StreamingResponse:
+    """
+    Value the holdings of a portfolio in one request, sharing scrapes and exchange rates between holdings.
+
+    :param body: The holdings, as security IDs and quantities, and the currency to value them in.
+    :return: An NDJSON stream of the valuation or error of each holding as it completes,
+             ending with a summary of the total value.
+    """
+    holdings = {}
+    for holding in body.holdings:
+        holdings[holding.id] = holdings.get(holding.id, 0) + holding.quantity
+    valuation = PortfolioValuation(holdings, body.currency)
+
+    async def lines():
+        async for outcome in valuation.stream():
+            yield json.dumps(outcome) + "\n"
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@app.post("/store/financials", response_model=dict)
+async def get_stored_financials(body: StoreRequestBody) -> dict:
+    """
+    Get the stored financials of many securities in one batched read, without scraping.
+
+    :param body: The IDs of the securities.
+    :return: The financials by ID and the IDs with none stored.
+    """
+    try:
+        results = await asyncio.to_thread(store.load_fundamentals, body.ids)
+    except Exception as e:
+        logger.error(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"results": results, "missing": [id for id in dict.fromkeys(body.ids) if id not in results]}
+
+
+@app.post("/store/history", response_model=dict)
+async def get_stored_histories(body: StorePricesRequestBody) -> dict:
+    """
+    Get the stored daily price histories of many securities in one batched read, without scraping.
+
+    :param body: The IDs of the securities, the first date and the columns to load.
+    :return: The price histories by ID, in the format of the history endpoint, and the IDs with none stored.
+    """
+    columns = tuple(body.columns or COLUMNS)
+    unknown = [name for name in columns if name not in COLUMNS]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown columns: {', '.join(unknown)}")
+    try:
+        histories = await asyncio.to_thread(store.load_prices, body.ids, body.since, columns)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logger.error(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=str(e))
+    return {
+        "results": {id: history.to_dict() for id, history in histories.items()},
+        "missing": [id for id in dict.fromkeys(body.ids) if id not in histories],
+    }
+
+
 @app.get("/exchange/{curr1}/{curr2}", response_model=float)
-def get_exchange(curr1: str, curr2: str) -> float:
+async def get_exchange(curr1: str, curr2: str) -> float:
     """
     Get the exchange rate between two currencies.
 
@@ -90,15 +361,48 @@ def get_exchange(curr1: str, curr2: str) -> float:
     :return: The exchange rate from curr1 to curr2.
     """
     try:
-        rate = get_exchange_rate(curr1, curr2)
+        rate = await async_get_exchange_rate(curr1, curr2)
         if rate is None:
             raise HTTPException(status_code=404, detail="Exchange rate not found")
         return rate
+    except (BrowserPoolFullError, CircuitOpenError) as e:
+        logger.warning(e)
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/exchange/matrix", response_model=dict)
+async def get_exchange_matrix(currencies: str | None = None) -> dict:
+    """
+    Get the exchange rates between every pair of currencies from a single rate table.
+
+    :param currencies: Comma-separated currency codes, defaults to every currency in the rate table.
+    :return: The base currency, the time of the scrape, the rates from each currency to each other currency
+        and the requested currencies missing from the rate table.
+    """
+    try:
+        table = await async_get_rate_table(settings.FX_BASE_CURRENCY)
+    except (BrowserPoolFullError, CircuitOpenError) as e:
+        logger.warning(e)
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=str(e))
+    if not table:
+        raise HTTPException(status_code=502, detail="Exchange rate table not found")
+
+    requested = [currency.strip().upper() for currency in currencies.split(",") if currency.strip()] if currencies else None
+    matrix = rate_matrix(table, requested)
+    return {
+        "base": table["base"],
+        "timestamp": table["timestamp"],
+        "rates": matrix,
+        "missing": [currency for currency in requested or [] if currency not in matrix],
+    }
+
+
 @app.post("/calculate/predict", response_model=dict)
 def generate_prediction(body: PredictRequestBody) -> dict:
     """
@@ -118,8 +422,48 @@ def generate_prediction(body: PredictRequestBody) -> dict:
         except Exception as e:
             logger.error(traceback.format_exc())
             raise HTTPException(status_code=500, detail=str(e))
-    
+
+
+@app.post("/calculate/predict/batch", response_model=list[dict])
+async def generate_predictions(body: PredictBatchRequestBody) -> list[dict]:
+    """
+    Get the predicted growth rates and average incomes of many series in one vectorised fit.
+
+    :param body: List of series of historical data points.
+    :return: A list with the growth rate and predicted average income of each series,
+             or an error for series with fewer than two points.
+    """
+    try:
+        growth_rates, avg_incomes, _ = await run_cpu_bound(predict_values_batch, body.prices)
+        return [
+            {"growth_rate": gr, "predicted_average_income": avg_income}
+            if math.isfinite(gr) else {"error": "Insufficient valid data points for prediction."}
+            for gr, avg_income in zip(growth_rates.tolist(), avg_incomes.tolist())
+        ]
+    except Exception as e:
+        logger.error(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/calculate/indicators", response_model=dict)
+async def generate_indicators(body: IndicatorsRequestBody) -> dict:
+    """
+    Compute technical indicators for many price series at once.
+
+    :param body: The price series by ID and the indicators to compute.
+    :return: A dictionary of ID to indicator values.
+    """
+    try:
+        series = {id: prices.model_dump() for id, prices in body.series.items()}
+        return await run_cpu_bound(compute_indicators_batch, series, tuple(body.indicators or INDICATORS))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logger.error(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=str(e))
+
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000, lifespan="on")
\ No newline at end of file
+    # several workers need the app as an import string, so each process can load it
+    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, lifespan="on", workers=settings.WORKERS)
\ No newline at end of file
@@ -1,4 +1,36 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from app.core.config import settings
 
 class PredictRequestBody(BaseModel):
-    prices: list[float]
\ No newline at end of file
+    prices: list[float]
+
+class PredictBatchRequestBody(BaseModel):
+    prices: list[list[float]]
+
+class PriceSeriesBody(BaseModel):
+    close: list[float] = Field(min_length=1)
+    high: list[float] | None = None
+    low: list[float] | None = None
+
+class IndicatorsRequestBody(BaseModel):
+    series: dict[str, PriceSeriesBody]
+    indicators: list[str] | None = None  # defaults to every indicator
+
+class BatchRequestBody(BaseModel):
+    ids: list[str] = Field(min_length=1, max_length=settings.BATCH_MAX_IDS)
+    stream: bool = False  # stream results as NDJSON as each ID completes
+
+class StoreRequestBody(BaseModel):
+    ids: list[str] = Field(min_length=1, max_length=settings.STORE_MAX_IDS)
+
+class StorePricesRequestBody(StoreRequestBody):
+    since: str | None = None  # ISO date of the first bar, defaults to the whole history
+    columns: list[str] | None = None  # defaults to every column
+
+class HoldingBody(BaseModel):
+    id: str
+    quantity: float = 1.0
+
+class PortfolioRequestBody(BaseModel):
+    holdings: list[HoldingBody] = Field(min_length=1, max_length=settings.PORTFOLIO_MAX_HOLDINGS)
+    currency: str = settings.FX_BASE_CURRENCY  # currency the holdings are valued in
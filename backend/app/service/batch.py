@@ -0,0 +1,78 @@
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable
+from loguru import logger
+
+from app.core.config import settings
+
+
+def _is_found(result) -> bool:
+    """
+    Scrapers signal data that was not found with non-positive prices or empty results, rather than raising.
+    """
+    if isinstance(result, (int, float)):
+        return result > 0
+    if isinstance(result, dict):
+        return any(result.values())
+    return bool(result)
+
+
+async def stream_batch(
+    ids: list[str],
+    fetch: Callable[[str], Awaitable],
+    concurrency: int = settings.BATCH_CONCURRENCY,
+) -> AsyncIterator[dict]:
+    """
+    Run ``fetch`` over a list of ids with bounded concurrency, yielding each outcome as soon as it completes.
+
+    Duplicate ids are fetched once.
+
+    :param ids: The IDs to fetch.
+    :param fetch: Coroutine function fetching a single ID.
+    :param concurrency: Maximum number of fetches in flight.
+    :return: Async iterator of {"id", "result"} or {"id", "error"} dictionaries,
+        with results the scraper did not find reported as errors.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(id: str) -> dict:
+        async with semaphore:
+            try:
+                result = await fetch(id)
+            except Exception as e:
+                logger.error(f"Batch fetch failed for {id}: {e!r}")
+                return {"id": id, "error": str(e) or type(e).__name__}
+            if not _is_found(result):
+                logger.warning(f"Batch fetch found no data for {id}.")
+                return {"id": id, "error": f"No data found for {id}."}
+            return {"id": id, "result": result}
+
+    tasks = [asyncio.create_task(run(id)) for id in dict.fromkeys(ids)]
+    try:
+        for task in asyncio.as_completed(tasks):
+            yield await task
+    finally:
+        # the consumer may stop early, e.g. when a streaming client disconnects
+        for task in tasks:
+            task.cancel()
+
+
+async def run_batch(
+    ids: list[str],
+    fetch: Callable[[str], Awaitable],
+    concurrency: int = settings.BATCH_CONCURRENCY,
+) -> dict[str, dict]:
+    """
+    Run ``fetch`` over a list of ids with bounded concurrency and collect the outcomes.
+
+    :param ids: The IDs to fetch.
+    :param fetch: Coroutine function fetching a single ID.
+    :param concurrency: Maximum number of fetches in flight.
+    :return: Dictionary with the per-ID "results" and "errors".
+    """
+    results, errors = {}, {}
+    async for outcome in stream_batch(ids, fetch, concurrency):
+        if "error" in outcome:
+            errors[outcome["id"]] = outcome["error"]
+        else:
+            results[outcome["id"]] = outcome["result"]
+    return {"results": results, "errors": errors}
@@ -0,0 +1,542 @@
+import asyncio
+import importlib
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+from loguru import logger
+from app.core.config import settings
+from app.core.metrics import timed, browser_pool_pages, browser_pool_rejections_total
+
+EXECUTABLE_PATH = "/usr/bin/chromium"
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3"
+
+
+def _should_block(request) -> bool:
+    """
+    Check whether a request made by a page is on the resource type or domain blocklists.
+    """
+    if request.resource_type in settings.PLAYWRIGHT_BLOCKED_RESOURCE_TYPES:
+        return True
+    host = urlsplit(request.url).hostname or ""
+    return any(host == domain or host.endswith(f".{domain}") for domain in settings.PLAYWRIGHT_BLOCKED_DOMAINS)
+
+
+def block_requests(context):
+    """
+    Abort blocklisted requests made by pages of a Playwright Sync API browser context.
+    """
+    def handle(route):
+        if _should_block(route.request):
+            route.abort()
+        else:
+            route.continue_()
+    context.route("**/*", handle)
+
+
+async def async_block_requests(context):
+    """
+    Abort blocklisted requests made by pages of a Playwright Async API browser context.
+    """
+    async def handle(route):
+        if _should_block(route.request):
+            await route.abort()
+        else:
+            await route.continue_()
+    await context.route("**/*", handle)
+
+
+class PageLoadError(Exception):
+    """
+    Raised when a page or the selector of its data did not load in time, or its server returned an error.
+    """
+
+    def __init__(self, message: str, content: str, timed_out: bool = True):
+        super().__init__(message)
+        # the HTML loaded so far
+        self.content = content
+        self.timed_out = timed_out
+
+
+def _server_error(url: str, response) -> str | None:
+    if response is not None and response.status >= 500:
+        return f"{url} returned HTTP {response.status}."
+    return None
+
+
+def _should_wait(response) -> bool:
+    # a missing page or server error has no data to wait for
+    return response is None or response.status < 400
+
+
+def _content_so_far(page) -> str:
+    try:
+        return page.content()
+    except Exception:
+        # e.g. still navigating
+        return ""
+
+
+async def _async_content_so_far(page) -> str:
+    try:
+        return await page.content()
+    except Exception:
+        return ""
+
+
+def _remaining(deadline: float) -> int:
+    # in milliseconds, at least 1 as Playwright treats 0 as no timeout
+    return max(1, int((deadline - time.monotonic()) * 1000))
+
+
+def goto(page, url: str, timeout: int, wait_for: str | None = None):
+    """
+    Navigate a Playwright Sync API page, returning as soon as the data is available.
+
+    :param page: The page to navigate.
+    :param url: The URL to load.
+    :param timeout: Timeout in milliseconds, shared by the navigation and the wait for the selector.
+    :param wait_for: Selector signalling that the data is in the DOM. If not given, wait for the load event.
+    :raises PageLoadError: If the page or selector does not load in time, or the server returned an error.
+    """
+    from playwright.sync_api import TimeoutError
+
+    deadline = time.monotonic() + timeout / 1000
+    try:
+        if wait_for is None:
+            with timed("navigate", timeouts=TimeoutError):
+                response = page.goto(url, timeout=timeout)
+        else:
+            with timed("navigate", timeouts=TimeoutError):
+                response = page.goto(url, timeout=timeout, wait_until="commit")
+            if _should_wait(response):
+                with timed("wait_for_selector", timeouts=TimeoutError):
+                    page.wait_for_selector(wait_for, state="attached", timeout=_remaining(deadline))
+    except TimeoutError as e:
+        raise PageLoadError(f"Timed out loading {url}: {e}", _content_so_far(page)) from e
+    error = _server_error(url, response)
+    if error:
+        raise PageLoadError(error, _content_so_far(page), timed_out=False)
+
+
+async def async_goto(page, url: str, timeout: int, wait_for: str | None = None):
+    """
+    Async version of ``goto``.
+    """
+    from playwright.async_api import TimeoutError as AsyncTimeoutError
+
+    deadline = time.monotonic() + timeout / 1000
+    try:
+        if wait_for is None:
+            with timed("navigate", timeouts=AsyncTimeoutError):
+                response = await page.goto(url, timeout=timeout)
+        else:
+            with timed("navigate", timeouts=AsyncTimeoutError):
+                response = await page.goto(url, timeout=timeout, wait_until="commit")
+            if _should_wait(response):
+                with timed("wait_for_selector", timeouts=AsyncTimeoutError):
+                    await page.wait_for_selector(wait_for, state="attached", timeout=_remaining(deadline))
+    except AsyncTimeoutError as e:
+        raise PageLoadError(f"Timed out loading {url}: {e}", await _async_content_so_far(page)) from e
+    error = _server_error(url, response)
+    if error:
+        raise PageLoadError(error, await _async_content_so_far(page), timed_out=False)
+
+
+def worker_pool_size() -> int:
+    """
+    Get the number of browsers of each worker process, splitting ``BROWSER_POOL_BUDGET`` between the workers if set.
+    """
+    if settings.BROWSER_POOL_BUDGET is None:
+        return settings.BROWSER_POOL_SIZE
+    return max(1, settings.BROWSER_POOL_BUDGET // settings.WORKERS)
+
+
+class BrowserPoolFullError(Exception):
+    """
+    Raised when every browser in the pool is busy and the wait queue is full.
+    """
+
+
+class _BrowserWorker(threading.Thread):
+    """
+    Thread owning one long-lived Chromium instance.
+
+    The Playwright Sync API is bound to the thread that started it, so each browser
+    lives on its own thread and pulls scrape jobs from the shared pool queue.
+    """
+
+    def __init__(self, pool: "BrowserPool", index: int):
+        super().__init__(name=f"browser-worker-{index}", daemon=True)
+        self.pool = pool
+        self.browser = None
+        self.context = None
+        self.page = None
+        self.uses = 0
+        self.busy = False
+        self.stopped = False
+
+    def _launch(self, playwright):
+        with timed("launch"):
+            self.browser = playwright.chromium.launch(executable_path=EXECUTABLE_PATH, channel="chromium")
+            self.context = self.browser.new_context(user_agent=USER_AGENT)
+            block_requests(self.context)
+            self.page = self.context.new_page()
+        self.uses = 0
+        logger.debug(f"{self.name} launched a new browser.")
+
+    def _close(self):
+        if self.browser is not None:
+            try:
+                self.browser.close()
+            except Exception:
+                logger.warning(f"{self.name} failed to close browser cleanly.")
+        self.browser = None
+        self.context = None
+        self.page = None
+
+    def _is_healthy(self) -> bool:
+        if self.browser is None or not self.browser.is_connected():
+            return False
+        if self.page is None or self.page.is_closed():
+            return False
+        return self.uses < settings.BROWSER_POOL_MAX_PAGES
+
+    def _scrape(self, url: str, timeout: int, wait_for: str | None) -> str:
+        try:
+            goto(self.page, url, timeout, wait_for)
+            with timed("content"):
+                return self.page.content()
+        finally:
+            # release the previous document so the reused page does not accumulate memory
+            self.page.goto("about:blank")
+
+    def _serve(self, playwright, error: Exception | None = None):
+        """
+        Run scrape jobs until the pool stops, or fail each with ``error`` if Playwright could not start.
+        """
+        while True:
+            job = self.pool._jobs.get()
+            if job is None:
+                self.stopped = True
+                return
+            url, timeout, wait_for, future = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            if error is not None:
+                future.set_exception(error)
+                continue
+            self.busy = True
+            try:
+                if not self._is_healthy():
+                    self._close()
+                    self._launch(playwright)
+                self.uses += 1
+                future.set_result(self._scrape(url, timeout, wait_for))
+            except PageLoadError as e:
+                # the browser is fine, the page was slow or failing
+                future.set_exception(e)
+            except Exception as e:
+                # the browser may have crashed, recycle it before the next job
+                logger.warning(f"{self.name} failed to scrape {url}, recycling browser: {e}")
+                self._close()
+                future.set_exception(e)
+            finally:
+                self.busy = False
+
+    def run(self):
+        try:
+            from playwright.sync_api import sync_playwright
+
+            with sync_playwright() as playwright:
+                self._serve(playwright)
+                self._close()
+        except Exception as e:
+            logger.exception(f"{self.name} failed to start Playwright.")
+            # fail the queued scrapes rather than leave their callers waiting
+            if not self.stopped:
+                self._serve(None, error=e)
+
+
+class BrowserPool:
+    """
+    Pool of long-lived headless Chromium browsers shared by all scrapers.
+    """
+
+    def __init__(self, size: int | None = None, max_queue: int = settings.BROWSER_POOL_MAX_QUEUE):
+        self.size = size or worker_pool_size()
+        self.max_queue = max_queue
+        self._jobs = None
+        self._workers = []
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    @property
+    def in_use(self) -> int:
+        return sum(worker.busy for worker in self._workers)
+
+    @property
+    def waiting(self) -> int:
+        return self._jobs.qsize() if self._jobs is not None else 0
+
+    def start(self):
+        """
+        Start the worker threads, if not already started. Each launches its browser on its first scrape.
+        """
+        with self._lock:
+            if self.running:
+                return
+            self._jobs = queue.Queue(maxsize=self.max_queue)
+            workers = [_BrowserWorker(self, i) for i in range(self.size)]
+            for worker in workers:
+                worker.start()
+            self._workers = workers
+        logger.info(f"Started browser pool with {self.size} browsers.")
+
+    def stop(self):
+        with self._lock:
+            if not self.running:
+                return
+            for _ in self._workers:
+                self._jobs.put(None)
+            for worker in self._workers:
+                worker.join()
+            self._workers = []
+        logger.info("Stopped browser pool.")
+
+    def scrape(self, url: str, timeout: int = settings.PLAYWRIGHT_TIMEOUT, wait_for: str | None = None) -> str:
+        """
+        Scrape the contents of a page using one of the pooled browsers.
+
+        :param url: The URL to load.
+        :param timeout: Navigation timeout in milliseconds.
+        :param wait_for: Selector signalling that the data is in the DOM.
+        :return: The page HTML.
+        :raises BrowserPoolFullError: If no browser becomes available in time.
+        :raises PageLoadError: If the page does not load in time or its server returned an error.
+        """
+        future = Future()
+        try:
+            with timed("pool_wait"):
+                self._jobs.put((url, timeout, wait_for, future), timeout=settings.BROWSER_POOL_ACQUIRE_TIMEOUT)
+        except queue.Full:
+            browser_pool_rejections_total.inc(pool="sync")
+            raise BrowserPoolFullError(f"All {self.size} browsers are busy, try again later.")
+        try:
+            # waiting for a browser, then the scrape itself
+            return future.result(timeout=settings.BROWSER_POOL_ACQUIRE_TIMEOUT + timeout / 1000)
+        except FutureTimeoutError:
+            # skipped by the workers if still queued
+            future.cancel()
+            browser_pool_rejections_total.inc(pool="sync")
+            raise BrowserPoolFullError(f"No browser completed the scrape of {url} in time, try again later.")
+
+
+class _AsyncBrowser:
+    """
+    One long-lived Chromium instance driven by the Playwright Async API.
+    """
+
+    def __init__(self, index: int):
+        self.name = f"async-browser-{index}"
+        self.browser = None
+        self.context = None
+        self.idle_pages = []
+        self.in_use = 0
+        self.uses = 0
+        self.lock = asyncio.Lock()
+
+    @property
+    def healthy(self) -> bool:
+        return self.browser is not None and self.browser.is_connected() and self.uses < settings.BROWSER_POOL_MAX_PAGES
+
+    async def launch(self, playwright):
+        with timed("launch"):
+            self.browser = await playwright.chromium.launch(executable_path=EXECUTABLE_PATH, channel="chromium")
+            self.context = await self.browser.new_context(user_agent=USER_AGENT)
+            await async_block_requests(self.context)
+        self.idle_pages = []
+        self.uses = 0
+        logger.debug(f"{self.name} launched a new browser.")
+
+    async def close(self):
+        if self.browser is not None:
+            try:
+                await self.browser.close()
+            except Exception:
+                logger.warning(f"{self.name} failed to close browser cleanly.")
+        self.browser = None
+        self.context = None
+        self.idle_pages = []
+
+    async def get_page(self, playwright):
+        async with self.lock:
+            crashed = self.browser is None or not self.browser.is_connected()
+            # a leaking browser is only recycled once its in-flight pages are done
+            if crashed or (not self.healthy and self.in_use == 0):
+                await self.close()
+                await self.launch(playwright)
+        self.in_use += 1
+        self.uses += 1
+        try:
+            if self.idle_pages:
+                return self.idle_pages.pop()
+            return await self.context.new_page()
+        except Exception:
+            self.in_use -= 1
+            raise
+
+    async def release_page(self, page, reusable: bool):
+        self.in_use -= 1
+        if reusable and self.healthy and not page.is_closed():
+            self.idle_pages.append(page)
+            return
+        try:
+            await page.close()
+        except Exception:
+            pass
+
+
+class AsyncBrowserPool:
+    """
+    Pool of long-lived headless Chromium browsers for the async scrapers.
+
+    Each browser serves up to ``pages_per_browser`` concurrent pages from a single event loop,
+    so a handful of browsers can keep hundreds of scrapes in flight.
+    """
+
+    def __init__(
+        self,
+        size: int | None = None,
+        pages_per_browser: int = settings.BROWSER_POOL_PAGES_PER_BROWSER,
+        max_queue: int = settings.BROWSER_POOL_MAX_QUEUE,
+    ):
+        self.size = size or worker_pool_size()
+        self.pages_per_browser = pages_per_browser
+        self.max_queue = max_queue
+        self._playwright = None
+        self._browsers = []
+        self._slots = None
+        self._waiting = 0
+        self._ready = None
+
+    @property
+    def running(self) -> bool:
+        """
+        Whether the pool is started, or starting, and scrapes should wait for it.
+        """
+        return self._ready is not None
+
+    @property
+    def in_use(self) -> int:
+        return sum(browser.in_use for browser in self._browsers)
+
+    @property
+    def waiting(self) -> int:
+        return self._waiting
+
+    async def start(self):
+        """
+        Start the pool. Scrapes requested while the browsers launch wait for them to be ready.
+        """
+        if self.running:
+            return
+        ready = self._ready = asyncio.Event()
+        self._slots = asyncio.Semaphore(self.size * self.pages_per_browser)
+        try:
+            # import in a thread so a cold start does not block the event loop
+            async_api = await asyncio.to_thread(importlib.import_module, "playwright.async_api")
+            self._playwright = await async_api.async_playwright().start()
+            self._browsers = [_AsyncBrowser(i) for i in range(self.size)]
+            await asyncio.gather(*(browser.launch(self._playwright) for browser in self._browsers))
+        except Exception:
+            logger.exception("Failed to start async browser pool.")
+            await self.stop()
+            raise
+        finally:
+            # wake up scrapes waiting for the pool, which fail if it could not start
+            ready.set()
+        logger.info(f"Started async browser pool with {self.size} browsers.")
+
+    async def stop(self):
+        if self._playwright is None:
+            self._ready = None
+            return
+        await asyncio.gather(*(browser.close() for browser in self._browsers))
+        await self._playwright.stop()
+        self._playwright = None
+        self._browsers = []
+        self._ready = None
+        logger.info("Stopped async browser pool.")
+
+    @asynccontextmanager
+    async def page(self):
+        """
+        Borrow a page from the least busy browser.
+
+        :raises BrowserPoolFullError: If no page becomes available in time.
+        """
+        if self._waiting >= self.max_queue:
+            browser_pool_rejections_total.inc(pool="async")
+            raise BrowserPoolFullError(f"All {self.size} browsers are busy, try again later.")
+        self._waiting += 1
+        try:
+            with timed("pool_wait"):
+                await self._ready.wait()
+                if self._playwright is None:
+                    raise RuntimeError("The browser pool failed to start.")
+                await asyncio.wait_for(self._slots.acquire(), timeout=settings.BROWSER_POOL_ACQUIRE_TIMEOUT)
+        except asyncio.TimeoutError:
+            browser_pool_rejections_total.inc(pool="async")
+            raise BrowserPoolFullError(f"All {self.size} browsers are busy, try again later.")
+        finally:
+            self._waiting -= 1
+
+        try:
+            browser = min(self._browsers, key=lambda b: (not b.healthy, b.in_use))
+            page = await browser.get_page(self._playwright)
+            reusable = True
+            try:
+                yield page
+            except BaseException:
+                # includes cancellation, which leaves the page mid-navigation
+                reusable = False
+                raise
+            finally:
+                await browser.release_page(page, reusable)
+        finally:
+            self._slots.release()
+
+    async def scrape(self, url: str, timeout: int = settings.PLAYWRIGHT_TIMEOUT, wait_for: str | None = None) -> str:
+        """
+        Scrape the contents of a page using one of the pooled browsers.
+
+        :param url: The URL to load.
+        :param timeout: Navigation timeout in milliseconds.
+        :param wait_for: Selector signalling that the data is in the DOM.
+        :return: The page HTML.
+        :raises PageLoadError: If the page does not load in time or its server returned an error.
+        """
+        async with self.page() as page:
+            await async_goto(page, url, timeout, wait_for)
+            with timed("content"):
+                return await page.content()
+
+
+browser_pool = BrowserPool()
+async_browser_pool = AsyncBrowserPool()
+
+for name, pool in (("sync", browser_pool), ("async", async_browser_pool)):
+    browser_pool_pages.track(lambda pool=pool: pool.in_use, pool=name, state="in_use")
+    browser_pool_pages.track(lambda pool=pool: pool.waiting, pool=name, state="waiting")
+browser_pool_pages.track(lambda: browser_pool.size if browser_pool.running else 0, pool="sync", state="capacity")
+browser_pool_pages.track(
+    lambda: async_browser_pool.size * async_browser_pool.pages_per_browser if async_browser_pool.running else 0,
+    pool="async",
+    state="capacity",
+)
@@ -0,0 +1,498 @@
+import asyncio
+import functools
+import inspect
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from loguru import logger
+
+from app.core.config import settings
+from app.core.metrics import cache_requests_total
+from app.db.db import MongoDb
+from app.service.resilience import CircuitOpenError
+
+# identifies the process holding a lease on a key
+LEASE_OWNER = f"{socket.gethostname()}:{os.getpid()}"
+LEASE_POLL_INTERVAL = 0.05  # in seconds
+
+
+class LRUCache:
+    """
+    In-process cache tier with per-entry expiry and size-bounded LRU eviction.
+    """
+
+    def __init__(self, max_size: int = settings.CACHE_MAX_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        """
+        Get a fresh value from the cache.
+
+        :param key: The cache key.
+        :return: The cached value, or None if it is missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def get_stale(self, key: str):
+        """
+        Get a value from the cache even if it has expired, as expired entries are only dropped on eviction.
+
+        :param key: The cache key.
+        :return: The cached value, or None if it is missing.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            return None if entry is None else entry[1]
+
+    def set(self, key: str, value, ttl: float):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class MongoCache:
+    """
+    Shared cache tier stored in MongoDB, so cached scrapes survive restarts and are shared between replicas.
+    """
+
+    def __init__(self, db_name: str = settings.CACHE_MONGO_DB, collection_name: str = settings.CACHE_MONGO_COLLECTION):
+        self.db = MongoDb(db_name, collection_name)
+        self._connected = False
+
+    def _collection(self):
+        if not self._connected:
+            self.db.connect()
+            # let MongoDB purge expired entries and leases on its own
+            self.db.collection.create_index("expires_at", expireAfterSeconds=0)
+            self.db.db[f"{self.db.collection_name}_leases"].create_index("expires_at", expireAfterSeconds=0)
+            self._connected = True
+        return self.db.collection
+
+    def _leases(self):
+        self._collection()
+        return self.db.db[f"{self.db.collection_name}_leases"]
+
+    def get(self, key: str):
+        doc = self._collection().find_one({"_id": key, "expires_at": {"$gt": datetime.now(timezone.utc)}})
+        return doc["value"] if doc else None
+
+    def set(self, key: str, value, ttl: float):
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=ttl)
+        self._collection().replace_one({"_id": key}, {"value": value, "expires_at": expires_at}, upsert=True)
+
+    def lease(self, key: str, ttl: float) -> bool:
+        from pymongo.errors import DuplicateKeyError
+
+        now = datetime.now(timezone.utc)
+        try:
+            # only matches an expired lease, otherwise the upsert collides with the live one
+            self._leases().update_one(
+                {"_id": key, "expires_at": {"$lt": now}},
+                {"$set": {"owner": LEASE_OWNER, "expires_at": now + timedelta(seconds=ttl)}},
+                upsert=True,
+            )
+            return True
+        except DuplicateKeyError:
+            return False
+
+    def release(self, key: str):
+        self._leases().delete_one({"_id": key, "owner": LEASE_OWNER})
+
+    def close(self):
+        self.db.close()
+        self._connected = False
+
+
+class SqliteCache:
+    """
+    Shared cache tier stored in a local SQLite database, so the worker processes of one host share cached scrapes.
+    """
+
+    def __init__(self, path: str | Path = Path(settings.SHARED_STATE_DIR) / "cache.sqlite3"):
+        self.path = Path(path)
+        self._local = threading.local()
+        self._writes = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite connections cannot be shared between threads
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT, expires_at REAL)")
+            connection.execute("CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, owner TEXT, expires_at REAL)")
+            self._local.connection = connection
+        return connection
+
+    def get(self, key: str):
+        row = self._connection().execute(
+            "SELECT value FROM cache WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, value, ttl: float):
+        connection = self._connection()
+        connection.execute(
+            "INSERT OR REPLACE INTO cache VALUES (?, ?, ?)", (key, json.dumps(value), time.time() + ttl)
+        )
+        self._writes += 1
+        if self._writes % 1000 == 0:
+            connection.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+
+    def lease(self, key: str, ttl: float) -> bool:
+        now = time.time()
+        cursor = self._connection().execute(
+            "INSERT INTO leases VALUES (?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+            "WHERE leases.expires_at <= ?",
+            (key, LEASE_OWNER, now + ttl, now),
+        )
+        return cursor.rowcount == 1
+
+    def release(self, key: str):
+        self._connection().execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, LEASE_OWNER))
+
+    def close(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+
+class _Flight:
+    """
+    A sync fetch in progress, shared by every caller asking for the same key.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TieredCache:
+    """
+    Read-through cache with an in-process LRU tier, an optional shared MongoDB or SQLite tier
+    and request coalescing, so concurrent misses on the same key trigger a single fetch.
+
+    With a shared tier, misses are also coalesced across processes: the process holding the lease
+    on a key fetches it, while the others wait for its value to appear in the shared tier.
+
+    While the circuit breaker of an upstream host is open, misses are served the expired value
+    of the in-process tier if there is one.
+    """
+
+    def __init__(self, local: LRUCache, shared: MongoCache | SqliteCache | None = None):
+        self.local = local
+        self.shared = shared
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._async_flights = {}
+
+    def _get_shared(self, key: str):
+        try:
+            return self.shared.get(key)
+        except Exception as e:
+            logger.warning(f"Shared cache lookup failed for {key}: {e}")
+            return None
+
+    def _set_shared(self, key: str, value, ttl: float):
+        try:
+            self.shared.set(key, value, ttl)
+        except Exception as e:
+            logger.warning(f"Shared cache write failed for {key}: {e}")
+
+    def _lease(self, key: str) -> bool:
+        try:
+            return self.shared.lease(key, settings.CACHE_LEASE_TIMEOUT)
+        except Exception as e:
+            # fetching without a lease at worst duplicates a scrape
+            logger.warning(f"Shared cache lease failed for {key}: {e}")
+            return True
+
+    def _release(self, key: str):
+        try:
+            self.shared.release(key)
+        except Exception as e:
+            logger.warning(f"Shared cache lease release failed for {key}: {e}")
+
+    def _poll_shared(self, key: str) -> tuple[bool, object]:
+        """
+        Check whether another process fetching a key has stored it, or given up its lease.
+
+        :return: Whether to stop waiting, and the value if it was stored.
+        """
+        value = self._get_shared(key)
+        if value is not None:
+            return True, value
+        return self._lease(key), None
+
+    def _wait_for_lease(self, key: str):
+        """
+        Wait for another process to fetch a key, taking over its lease if it fails.
+
+        :return: The value fetched by the other process, or None if this process should fetch it.
+        """
+        if self._lease(key):
+            return None
+        deadline = time.monotonic() + settings.CACHE_LEASE_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(LEASE_POLL_INTERVAL)
+            done, value = self._poll_shared(key)
+            if done:
+                return value
+        return None
+
+    async def _async_wait_for_lease(self, key: str):
+        """
+        Async version of ``_wait_for_lease``.
+        """
+        if await asyncio.to_thread(self._lease, key):
+            return None
+        deadline = time.monotonic() + settings.CACHE_LEASE_TIMEOUT
+        while time.monotonic() < deadline:
+            await asyncio.sleep(LEASE_POLL_INTERVAL)
+            done, value = await asyncio.to_thread(self._poll_shared, key)
+            if done:
+                return value
+        return None
+
+    def _get_stale(self, key: str, refresh: bool):
+        """
+        Get the expired value of a key whose upstream is failing, without storing it again.
+
+        :return: The expired value, or None if refreshing or no value was ever cached.
+        """
+        value = None if refresh else self.local.get_stale(key)
+        if value is not None:
+            logger.info(f"Serving stale value for {key}, its upstream is failing.")
+            _count(key, "stale")
+        return value
+
+    def get_or_fetch(self, key: str, ttl: float, fetch, refresh: bool = False):
+        """
+        Get a value from the cache, calling ``fetch`` on a miss.
+
+        :param key: The cache key.
+        :param ttl: Time to live of a fetched value in seconds.
+        :param fetch: Callable producing the value.
+        :param refresh: Whether to fetch and store a new value even if one is cached.
+        :return: The cached or fetched value.
+        """
+        value = None if refresh else self.local.get(key)
+        if value is not None:
+            _count(key, "hit")
+            return value
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            _count(key, "coalesced")
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        leased = False
+        try:
+            value = self._get_shared(key) if self.shared and not refresh else None
+            if value is None and self.shared:
+                if refresh:
+                    leased = self._lease(key)
+                else:
+                    value = self._wait_for_lease(key)
+                    leased = value is None
+            if value is None:
+                _count(key, "refresh" if refresh else "miss")
+                try:
+                    value = fetch()
+                except CircuitOpenError:
+                    value = self._get_stale(key, refresh)
+                    if value is None:
+                        raise
+                    flight.value = value
+                    return value
+                if _is_cacheable(value):
+                    self.local.set(key, value, ttl)
+                    if self.shared:
+                        self._set_shared(key, value, ttl)
+            else:
+                _count(key, "shared_hit")
+                self.local.set(key, value, ttl)
+            flight.value = value
+            return value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            if leased:
+                self._release(key)
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    async def async_get_or_fetch(self, key: str, ttl: float, fetch, refresh: bool = False):
+        """
+        Async version of ``get_or_fetch``, where ``fetch`` returns an awaitable.
+        """
+        value = None if refresh else self.local.get(key)
+        if value is not None:
+            _count(key, "hit")
+            return value
+
+        while (flight := self._async_flights.get(key)) is not None:
+            _count(key, "coalesced")
+            try:
+                return await asyncio.shield(flight)
+            except asyncio.CancelledError:
+                # retry if only the leading fetch was cancelled, not this caller
+                if not flight.cancelled() or asyncio.current_task().cancelling():
+                    raise
+
+        flight = asyncio.get_running_loop().create_future()
+        self._async_flights[key] = flight
+        leased = False
+        try:
+            value = await asyncio.to_thread(self._get_shared, key) if self.shared and not refresh else None
+            if value is None and self.shared:
+                if refresh:
+                    leased = await asyncio.to_thread(self._lease, key)
+                else:
+                    value = await self._async_wait_for_lease(key)
+                    leased = value is None
+            if value is None:
+                _count(key, "refresh" if refresh else "miss")
+                try:
+                    value = await fetch()
+                except CircuitOpenError:
+                    value = self._get_stale(key, refresh)
+                    if value is None:
+                        raise
+                    flight.set_result(value)
+                    return value
+                if _is_cacheable(value):
+                    self.local.set(key, value, ttl)
+                    if self.shared:
+                        await asyncio.to_thread(self._set_shared, key, value, ttl)
+            else:
+                _count(key, "shared_hit")
+                self.local.set(key, value, ttl)
+            flight.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except Exception as e:
+            flight.set_exception(e)
+            # avoid "exception was never retrieved" warnings when nobody else is waiting
+            flight.exception()
+            raise
+        finally:
+            if leased:
+                await asyncio.to_thread(self._release, key)
+            self._async_flights.pop(key, None)
+
+    def close(self):
+        if self.shared:
+            self.shared.close()
+
+
+def _count(key: str, result: str):
+    # keys start with their data type, see ``cached``
+    cache_requests_total.inc(data_type=key.partition(":")[0], result=result)
+
+
+def _is_cacheable(value) -> bool:
+    """
+    Scrapers signal failures with empty results or non-positive prices, which must not be cached.
+    """
+    if value is None:
+        return False
+    if isinstance(value, (int, float)):
+        return value > 0
+    if isinstance(value, dict):
+        # e.g. a quote whose name was found but not its price
+        if "price" in value and not _is_cacheable(value["price"]):
+            return False
+        return any(value.values())
+    return bool(value)
+
+
+def _shared_tier() -> MongoCache | SqliteCache | None:
+    if settings.CACHE_MONGO_ENABLED:
+        return MongoCache()
+    if settings.CACHE_SQLITE_ENABLED or settings.WORKERS > 1:
+        return SqliteCache()
+    return None
+
+
+cache = TieredCache(LRUCache(), _shared_tier())
+
+
+def cached(data_type: str):
+    """
+    Cache the results of a scraper, keyed by the data type, the scraper name and its arguments.
+
+    The TTL is read from the ``CACHE_TTL_<DATA_TYPE>`` setting. Works on both sync and async functions,
+    and the two versions of a scraper share their cache entries. ``<scraper>.refresh(*args)`` scrapes
+    and stores a new value even if one is cached, joining a scrape of the same key already in progress.
+
+    :param data_type: The type of data returned by the scraper, e.g. "price".
+    """
+    ttl = getattr(settings, f"CACHE_TTL_{data_type.upper()}")
+
+    def decorator(func):
+        name = func.__name__.removeprefix("async_")
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args):
+                key = ":".join([data_type, name, *map(str, args)])
+                return await cache.async_get_or_fetch(key, ttl, lambda: func(*args))
+
+            async def async_refresh(*args):
+                key = ":".join([data_type, name, *map(str, args)])
+                return await cache.async_get_or_fetch(key, ttl, lambda: func(*args), refresh=True)
+
+            async_wrapper.refresh = async_refresh
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args):
+            key = ":".join([data_type, name, *map(str, args)])
+            return cache.get_or_fetch(key, ttl, lambda: func(*args))
+
+        def refresh(*args):
+            key = ":".join([data_type, name, *map(str, args)])
+            return cache.get_or_fetch(key, ttl, lambda: func(*args), refresh=True)
+
+        wrapper.refresh = refresh
+        return wrapper
+
+    return decorator
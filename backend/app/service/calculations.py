@@ -1,34 +1,77 @@
-from scipy.optimize import curve_fit
 import numpy as np
 from loguru import logger
 
+from app.core.metrics import timed
 
-def _predict_y_value(x: int | float, m: float, c: float) -> float:
+
+def _to_matrix(y_data: list[list[float]] | np.ndarray) -> np.ndarray:
+    """
+    Stack series into a 2-D array, padding shorter series with NaN at the end.
     """
-    Predict the y value for a given x using the exponential regression parameters.
+    if isinstance(y_data, np.ndarray):
+        return np.atleast_2d(y_data.astype(np.float64))
+    width = max((len(row) for row in y_data), default=0)
+    matrix = np.full((len(y_data), width), np.nan)
+    for i, row in enumerate(y_data):
+        matrix[i, :len(row)] = row
+    return matrix
+
 
-    :param x: The x value.
-    :param m: Slope parameter.
-    :param c: Intercept parameter.
-    :return: Predicted y value.
+def _fit_lines(y: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
     """
-    return c + m * x
-    
+    Fit y = c + m * x with x = 0, 1, ... to every row by closed-form least squares.
 
-def _regression(x_data: list[int | float], y_data: list[int | float]) -> tuple[float, float]:
+    :param y: 2-D array of series, padded with NaN at the end.
+    :return: Tuple of the slopes, intercepts and number of points of each row.
     """
-    Perform exponential regression on the given data.
+    mask = ~np.isnan(y)
+    n = mask.sum(axis=1)
+    x = np.where(mask, np.arange(y.shape[1]), 0)
+    y = np.where(mask, y, 0)
+    sx, sy = x.sum(axis=1), y.sum(axis=1)
+    sxx, sxy = (x * x).sum(axis=1), (x * y).sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        m = (n * sxy - sx * sy) / (n * sxx - sx * sx)
+        c = (sy - m * sx) / n
+    return m, c, n
+
 
-    :param x_data: List of x values.
-    :param y_data: List of y values.
-    :return: Tuple containing the parameters (gr, v0) of the fitted curve.
+@timed("predict_batch")
+def predict_values_batch(y_data: list[list[float]] | np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
     """
-    # Perform curve fitting
-    params, _ = curve_fit(_predict_y_value, x_data, y_data)
+    Calculate the average growth rate and the predicted average income of many series at once.
 
-    return params.tolist()  # m, c
+    Rows where the linear fit gives no real growth rate use ``fallback_predict_average_income`` instead.
 
+    :param y_data: List of series, or a 2-D array of series padded with NaN at the end.
+    :return: Tuple of the growth rates, predicted average incomes and whether each row used the fallback.
+             Rows with fewer than two points have NaN values.
+    """
+    y = _to_matrix(y_data)
+    m, c, n = _fit_lines(y)
+    first = c
+    last = c + m * (n - 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gr = np.where(first != 0, last / first, 0.0)
+        # no real growth rate when the fitted line changes sign or reaches zero, an odd root would still be finite
+        growth_rate = np.where(gr > 0, gr, np.nan) ** (1 / (n - 1)) - 1
+        avg_income = (first + last) / 2  # mean of the fitted line
 
+        # fallback CAGR on the first and last data points
+        rows = np.arange(len(y))
+        y_first = y[rows, 0] if y.shape[1] else np.full(len(y), np.nan)
+        y_last = y[rows, np.maximum(n - 1, 0)] if y.shape[1] else np.full(len(y), np.nan)
+        fallback_rate = np.where((y_first > 0) & (y_last > 0), (y_last / y_first) ** (1 / (n - 1)) - 1, 0.0)
+        fallback_income = np.nanmean(np.where(n[:, None] > 0, y, 0), axis=1) if y.shape[1] else np.full(len(y), np.nan)
+
+    enough = n >= 2
+    fallback = enough & ~(np.isfinite(growth_rate) & np.isfinite(avg_income))
+    growth_rate = np.where(fallback, fallback_rate, np.where(enough, growth_rate, np.nan))
+    avg_income = np.where(fallback, fallback_income, np.where(enough, avg_income, np.nan))
+    return growth_rate, avg_income, fallback
+
+
+@timed("predict")
 def predict_values(y_data: list[float]) -> tuple[float, float]:
     """
     Calculate the average growth rate and the predicted average income.
@@ -38,22 +81,15 @@ def predict_values(y_data: list[float]) -> tuple[float, float]:
     """
     logger.debug(f"Input data for prediction: {y_data}")
     assert len(y_data) >= 2, "Data must contain at least two points for regression."
-    x_data = range(len(y_data))
-
-    # calculate factor to divide y_data to avoid overflow
-    min_y = min(y_data)
-    factor = 1
-    while min_y > 1:
-        factor *= 10
-        min_y /= 10
-    m, c = _regression(x_data, [y / factor for y in y_data])
-
-    predicted_ys = [_predict_y_value(x, m, c) * factor for x in x_data]
-    avg_income = sum(predicted_ys) / len(predicted_ys)
-    gr = predicted_ys[-1] / predicted_ys[0] if predicted_ys[0] != 0 else 0
-    cagr = gr ** (1 / (len(predicted_ys) - 1))  # convert to growth rate
-    logger.debug(f"Predicted values: {predicted_ys}, Growth Rate: {cagr}, Average Income: {avg_income}")
-    return cagr-1, avg_income
+    m, c, n = _fit_lines(np.array([y_data], dtype=np.float64))
+    predicted_first, predicted_last = c[0], c[0] + m[0] * (n[0] - 1)
+    avg_income = (predicted_first + predicted_last) / 2
+    gr = predicted_last / predicted_first if predicted_first != 0 else 0
+    if gr <= 0 or not np.isfinite(gr) or not np.isfinite(avg_income):
+        raise ValueError("Fitted line changes sign or reaches zero, no real growth rate.")
+    cagr = gr ** (1 / (n[0] - 1))  # convert to growth rate
+    logger.debug(f"Fitted line: {predicted_first} to {predicted_last}, Growth Rate: {cagr}, Average Income: {avg_income}")
+    return float(cagr - 1), float(avg_income)
 
 
 def fallback_predict_average_income(data: list[float]) -> tuple[float, float]:
@@ -74,3 +110,300 @@ def fallback_predict_average_income(data: list[float]) -> tuple[float, float]:
     avg_income = sum(data) / n
     logger.debug(f"Fallback CAGR: {cagr}, Average Income: {avg_income}")
     return cagr, avg_income
+
+
+# technical indicators
+# all functions take arrays of shape (..., bars), so a 2-D array computes every ticker at once,
+# and return arrays of the same shape with NaN where there is not enough history yet
+
+INDICATORS = ("sma", "ema", "rsi", "macd", "bollinger", "atr", "volatility", "drawdown")
+SMA_WINDOW = 20
+EMA_SPAN = 20
+RSI_PERIOD = 14
+MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+BOLLINGER_WINDOW, BOLLINGER_WIDTH = 20, 2.0
+ATR_PERIOD = 14
+VOLATILITY_WINDOW = 20
+TRADING_DAYS = 252
+# bars before every indicator has a value, the MACD signal line starting last
+WARMUP = max(SMA_WINDOW, EMA_SPAN, RSI_PERIOD + 1, MACD_SLOW + MACD_SIGNAL - 1, BOLLINGER_WINDOW, ATR_PERIOD, VOLATILITY_WINDOW + 1)
+
+
+def _rolling_sum(x: np.ndarray, window: int) -> np.ndarray:
+    """
+    Rolling sum over the last axis using cumulative sums.
+    """
+    out = np.full(x.shape, np.nan)
+    if x.shape[-1] < window:
+        return out
+    c = np.cumsum(x, axis=-1)
+    out[..., window - 1] = c[..., window - 1]
+    out[..., window:] = c[..., window:] - c[..., :-window]
+    return out
+
+
+def _smooth(x: np.ndarray, alpha: float, period: int, start: int = 0) -> np.ndarray:
+    """
+    Exponential smoothing y[t] = alpha * x[t] + (1 - alpha) * y[t-1], seeded with the mean of the first ``period`` values.
+
+    :param start: Index of the first value, the values before it being the warm-up of a smoothed input.
+    :return: The smoothed series, NaN before the seed.
+    """
+    from scipy.signal import lfilter
+
+    out = np.full(x.shape, np.nan)
+    seed_at = start + period - 1
+    if x.shape[-1] <= seed_at:
+        return out
+    seed = x[..., start:seed_at + 1].mean(axis=-1, keepdims=True)
+    out[..., seed_at:seed_at + 1] = seed
+    out[..., seed_at + 1:] = lfilter([alpha], [1, alpha - 1], x[..., seed_at + 1:], axis=-1, zi=(1 - alpha) * seed)[0]
+    return out
+
+
+def sma(x: np.ndarray, window: int = SMA_WINDOW) -> np.ndarray:
+    """
+    Simple moving average.
+    """
+    return _rolling_sum(x, window) / window
+
+
+def ema(x: np.ndarray, span: int = EMA_SPAN) -> np.ndarray:
+    """
+    Exponential moving average with smoothing factor 2 / (span + 1), seeded with the simple moving average.
+    """
+    return _smooth(x, 2 / (span + 1), span)
+
+
+def rsi(close: np.ndarray, period: int = RSI_PERIOD) -> np.ndarray:
+    """
+    Relative strength index using Wilder's smoothing, seeded with the average gain and loss of the first ``period`` changes.
+    """
+    out = np.full(close.shape, np.nan)
+    if close.shape[-1] < 2:
+        return out
+    change = np.diff(close, axis=-1)
+    avg_gain = _smooth(np.clip(change, 0, None), 1 / period, period)
+    avg_loss = _smooth(np.clip(-change, 0, None), 1 / period, period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out[..., 1:] = np.where(avg_loss == 0, 100.0, 100 - 100 / (1 + avg_gain / avg_loss))
+    return out
+
+
+def macd(close: np.ndarray, fast: int = MACD_FAST, slow: int = MACD_SLOW, signal: int = MACD_SIGNAL) -> dict[str, np.ndarray]:
+    """
+    Moving average convergence divergence, its signal line and histogram.
+    """
+    line = ema(close, fast) - ema(close, slow)
+    # the line starts once the slow average does
+    signal_line = _smooth(line, 2 / (signal + 1), signal, start=max(fast, slow) - 1)
+    return {"macd": line, "signal": signal_line, "histogram": line - signal_line}
+
+
+def bollinger(close: np.ndarray, window: int = BOLLINGER_WINDOW, width: float = BOLLINGER_WIDTH) -> dict[str, np.ndarray]:
+    """
+    Bollinger bands around the simple moving average.
+    """
+    # shift by the first value to keep the sum of squares well conditioned
+    shifted = close - close[..., :1]
+    mean = _rolling_sum(shifted, window) / window
+    var = np.clip(_rolling_sum(shifted ** 2, window) / window - mean ** 2, 0, None)
+    middle = mean + close[..., :1]
+    std = np.sqrt(var)
+    return {"middle": middle, "upper": middle + width * std, "lower": middle - width * std}
+
+
+def _true_range(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    prev_close = np.concatenate([close[..., :1], close[..., :-1]], axis=-1)
+    return np.maximum(high - low, np.maximum(np.abs(high - prev_close), np.abs(low - prev_close)))
+
+
+def atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, period: int = ATR_PERIOD) -> np.ndarray:
+    """
+    Average true range using Wilder's smoothing, seeded with the mean true range of the first ``period`` bars.
+    """
+    return _smooth(_true_range(high, low, close), 1 / period, period)
+
+
+def volatility(close: np.ndarray, window: int = VOLATILITY_WINDOW, periods: int = TRADING_DAYS) -> np.ndarray:
+    """
+    Annualised rolling standard deviation of log returns.
+    """
+    out = np.full(close.shape, np.nan)
+    if close.shape[-1] < 2:
+        return out
+    returns = np.diff(np.log(close), axis=-1)
+    mean = _rolling_sum(returns, window) / window
+    var = np.clip(_rolling_sum(returns ** 2, window) / window - mean ** 2, 0, None) * window / (window - 1)
+    out[..., 1:] = np.sqrt(var * periods)
+    return out
+
+
+def drawdown(close: np.ndarray) -> np.ndarray:
+    """
+    Fractional decline from the running maximum.
+    """
+    return close / np.maximum.accumulate(close, axis=-1) - 1
+
+
+def compute_indicators(
+    close: np.ndarray, high: np.ndarray | None = None, low: np.ndarray | None = None, names: tuple[str, ...] = INDICATORS
+) -> dict[str, np.ndarray | dict[str, np.ndarray]]:
+    """
+    Compute a set of indicators over whole price arrays.
+
+    :param close: Close prices of shape (..., bars).
+    :param high: High prices, defaults to the close prices.
+    :param low: Low prices, defaults to the close prices.
+    :param names: The indicators to compute.
+    :return: Dictionary of indicator name to values.
+    """
+    unknown = set(names) - set(INDICATORS)
+    if unknown:
+        raise ValueError(f"Unknown indicators: {sorted(unknown)}.")
+    high = close if high is None else high
+    low = close if low is None else low
+    functions = {
+        "sma": lambda: sma(close),
+        "ema": lambda: ema(close),
+        "rsi": lambda: rsi(close),
+        "macd": lambda: macd(close),
+        "bollinger": lambda: bollinger(close),
+        "atr": lambda: atr(high, low, close),
+        "volatility": lambda: volatility(close),
+        "drawdown": lambda: drawdown(close),
+    }
+    return {name: functions[name]() for name in names}
+
+
+class IndicatorState:
+    """
+    State of the indicators of a set of tickers, updated in O(1) per ticker when a new bar is appended.
+
+    Holds the last value of every smoothed series, ring buffers of the bars inside the rolling windows
+    and the running maximum, all as arrays with one entry per ticker.
+    """
+
+    def __init__(self, close: np.ndarray, high: np.ndarray | None = None, low: np.ndarray | None = None):
+        """
+        Initialise the state from the full history of shape (tickers, bars), at least ``WARMUP`` bars long.
+        """
+        close = np.atleast_2d(np.asarray(close, dtype=np.float64))
+        high = close if high is None else np.atleast_2d(np.asarray(high, dtype=np.float64))
+        low = close if low is None else np.atleast_2d(np.asarray(low, dtype=np.float64))
+        window = max(SMA_WINDOW, BOLLINGER_WINDOW)
+        if close.shape[-1] < WARMUP:
+            raise ValueError(f"Not enough bars to initialise the indicators, at least {WARMUP} are needed.")
+
+        # the same seeded series as the full computation, continued by ``update``
+        self.close = close[:, -1].copy()
+        self.ema = ema(close)[:, -1]
+        self.ema_fast = ema(close, MACD_FAST)[:, -1]
+        self.ema_slow = ema(close, MACD_SLOW)[:, -1]
+        self.macd_signal = macd(close)["signal"][:, -1]
+        change = np.diff(close, axis=-1)
+        self.avg_gain = _smooth(np.clip(change, 0, None), 1 / RSI_PERIOD, RSI_PERIOD)[:, -1]
+        self.avg_loss = _smooth(np.clip(-change, 0, None), 1 / RSI_PERIOD, RSI_PERIOD)[:, -1]
+        self.atr = atr(high, low, close)[:, -1]
+        self.peak = close.max(axis=-1)
+        # ring buffers of the most recent closes and log returns
+        self.closes = close[:, -window:].copy()
+        self.returns = np.diff(np.log(close[:, -VOLATILITY_WINDOW - 1:]), axis=-1)
+        self._close_pos = 0
+        self._return_pos = 0
+
+    def update(self, close: np.ndarray, high: np.ndarray | None = None, low: np.ndarray | None = None) -> dict[str, np.ndarray]:
+        """
+        Append one bar per ticker and get the latest value of every indicator.
+
+        :param close: The new close price of each ticker.
+        :param high: The new high price of each ticker, defaults to the close price.
+        :param low: The new low price of each ticker, defaults to the close price.
+        :return: Dictionary of indicator name to the latest value per ticker.
+        """
+        close = np.asarray(close, dtype=np.float64)
+        high = close if high is None else np.asarray(high, dtype=np.float64)
+        low = close if low is None else np.asarray(low, dtype=np.float64)
+
+        def step(prev: np.ndarray, x: np.ndarray, alpha: float) -> np.ndarray:
+            return alpha * x + (1 - alpha) * prev
+
+        change = close - self.close
+        true_range = np.maximum(high - low, np.maximum(np.abs(high - self.close), np.abs(low - self.close)))
+        log_return = np.log(close / self.close)
+
+        self.ema = step(self.ema, close, 2 / (EMA_SPAN + 1))
+        self.ema_fast = step(self.ema_fast, close, 2 / (MACD_FAST + 1))
+        self.ema_slow = step(self.ema_slow, close, 2 / (MACD_SLOW + 1))
+        macd_line = self.ema_fast - self.ema_slow
+        self.macd_signal = step(self.macd_signal, macd_line, 2 / (MACD_SIGNAL + 1))
+        self.avg_gain = step(self.avg_gain, np.clip(change, 0, None), 1 / RSI_PERIOD)
+        self.avg_loss = step(self.avg_loss, np.clip(-change, 0, None), 1 / RSI_PERIOD)
+        self.atr = step(self.atr, true_range, 1 / ATR_PERIOD)
+        self.peak = np.maximum(self.peak, close)
+        self.close = close
+
+        self.closes[:, self._close_pos] = close
+        self._close_pos = (self._close_pos + 1) % self.closes.shape[-1]
+        self.returns[:, self._return_pos] = log_return
+        self._return_pos = (self._return_pos + 1) % self.returns.shape[-1]
+
+        # ring buffer order does not matter for window sums; windows are the most recent bars
+        sma_values = self._window(SMA_WINDOW).mean(axis=-1)
+        bollinger_window = self._window(BOLLINGER_WINDOW)
+        middle = bollinger_window.mean(axis=-1)
+        std = bollinger_window.std(axis=-1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rsi_values = np.where(self.avg_loss == 0, 100.0, 100 - 100 / (1 + self.avg_gain / self.avg_loss))
+        return {
+            "sma": sma_values,
+            "ema": self.ema,
+            "rsi": rsi_values,
+            "macd": {"macd": macd_line, "signal": self.macd_signal, "histogram": macd_line - self.macd_signal},
+            "bollinger": {"middle": middle, "upper": middle + BOLLINGER_WIDTH * std, "lower": middle - BOLLINGER_WIDTH * std},
+            "atr": self.atr,
+            "volatility": self.returns.std(axis=-1, ddof=1) * np.sqrt(TRADING_DAYS),
+            "drawdown": close / self.peak - 1,
+        }
+
+    def _window(self, window: int) -> np.ndarray:
+        """
+        Get the last ``window`` closes of each ticker, in any order.
+        """
+        size = self.closes.shape[-1]
+        positions = (self._close_pos - 1 - np.arange(window)) % size
+        return self.closes[:, positions]
+
+
+@timed("indicators")
+def compute_indicators_batch(
+    series: dict[str, dict[str, list[float] | None]], names: tuple[str, ...] = INDICATORS
+) -> dict[str, dict]:
+    """
+    Compute indicators for many price series, stacking series of equal length into a single array.
+
+    :param series: Dictionary of ID to a dictionary with "close" and optionally "high" and "low" prices.
+    :param names: The indicators to compute.
+    :return: Dictionary of ID to indicator values, with None where there is not enough history.
+    """
+    groups = {}
+    for id, prices in series.items():
+        groups.setdefault(len(prices["close"]), []).append(id)
+
+    results = {}
+    for ids in groups.values():
+        close = np.array([series[id]["close"] for id in ids], dtype=np.float64)
+        high = np.array([series[id].get("high") or series[id]["close"] for id in ids], dtype=np.float64)
+        low = np.array([series[id].get("low") or series[id]["close"] for id in ids], dtype=np.float64)
+        if high.shape != close.shape or low.shape != close.shape:
+            raise ValueError("High and low prices must have the same length as the close prices.")
+        indicators = compute_indicators(close, high, low, names)
+        for row, id in enumerate(ids):
+            results[id] = {name: _row_to_list(values, row) for name, values in indicators.items()}
+    return results
+
+
+def _row_to_list(values: np.ndarray | dict[str, np.ndarray], row: int) -> list | dict[str, list]:
+    if isinstance(values, dict):
+        return {name: _row_to_list(v, row) for name, v in values.items()}
+    return np.where(np.isnan(values[row]), None, values[row]).tolist()
@@ -0,0 +1,90 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from loguru import logger
+
+from app.core.config import settings
+
+LIVE = "live"
+RECORD = "record"
+REPLAY = "replay"
+INDEX_FILE = "index.jsonl"
+
+
+class CorpusMissError(LookupError):
+    """
+    Raised in replay mode when a page was never recorded.
+    """
+
+
+class Corpus:
+    """
+    On-disk corpus of fetched pages, gzip-compressed and keyed by a hash of their URL.
+
+    The index lists the URL and URL pattern of every recorded page, so the corpus can be replayed by page type.
+    """
+
+    def __init__(self, root: str | Path = settings.SCRAPE_CORPUS_DIR):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(url: str) -> str:
+        return hashlib.sha256(url.encode()).hexdigest()
+
+    def _path(self, url: str) -> Path:
+        return self.root / f"{self.key(url)}.html.gz"
+
+    def load(self, url: str) -> str:
+        """
+        Get a recorded page.
+
+        :param url: The URL of the page.
+        :return: The page HTML.
+        :raises CorpusMissError: If the page was not recorded.
+        """
+        try:
+            with gzip.open(self._path(url), "rt", encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            raise CorpusMissError(f"No recorded page for {url} in {self.root}.")
+
+    def save(self, url: str, pattern: str, content: str):
+        """
+        Record a page, replacing any previous recording of the same URL.
+
+        :param url: The URL of the page.
+        :param pattern: Name of the URL pattern, e.g. "yahoo:history".
+        :param content: The page HTML.
+        """
+        path = self._path(url)
+        with self._lock:
+            self.root.mkdir(parents=True, exist_ok=True)
+            new = not path.exists()
+            # write to a temporary file first so a replay never reads a partial page
+            tmp_path = path.with_suffix(".tmp")
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+            if new:
+                entry = {"key": self.key(url), "url": url, "pattern": pattern, "recorded_at": datetime.now(timezone.utc).isoformat()}
+                with open(self.root / INDEX_FILE, "a") as f:
+                    f.write(json.dumps(entry) + "\n")
+        logger.debug(f"Recorded {url} in {self.root}.")
+
+    def entries(self) -> list[dict]:
+        """
+        Get the index entries of every recorded page.
+        """
+        try:
+            with open(self.root / INDEX_FILE) as f:
+                return [json.loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+
+
+corpus = Corpus()
@@ -1,20 +1,191 @@
+from datetime import datetime, timezone
 from loguru import logger
-import bs4
+import re
 
-from app.service.scraper import playwright_scrape
+from app.core.config import settings
+from app.core.metrics import timed
+from app.service.cache import cached
+from app.service.fetch import fetch_page, async_fetch_page
+from app.service.offload import run_cpu_bound
+from app.service.parsing import make_soup
 
 ROOT_EXCHANGE_URL = "https://www.x-rates.com/calculator"
+RATE_SELECTOR = "span.ccOutputRslt"
+ROOT_RATE_TABLE_URL = "https://www.x-rates.com/table"
+RATE_TABLE_SELECTOR = "table.ratesTable"
+
+# the rate is read from adjacent spans, so the rest of the page is not built
+CALCULATOR_STRAINER = ("span",)
+# every rate in the table links to its graph page, e.g. "/graph/?from=USD&to=EUR"
+RATE_TABLE_STRAINER = ("a",)
+RATE_LINK_PATTERN = re.compile(r"/graph/\?from=([A-Z]{3})&to=([A-Z]{3})")
+
 
 def get_exchange_rate(curr1: str, curr2: str) -> float | None:
     """
     Get the exchange rate between two currencies.
 
+    The rate is triangulated from the cached rate table of ``settings.FX_BASE_CURRENCY``,
+    falling back to the calculator page for currencies missing from the table.
+
     :param str curr1: The first currency code.
     :param str curr2: The second currency code.
     :return float: The exchange rate from curr1 to curr2.
     """
-    content = playwright_scrape(f"{ROOT_EXCHANGE_URL}/?from={curr1}&to={curr2}&amount=1", headless=True, timeout=5000)
-    soup = bs4.BeautifulSoup(content, "html.parser")
+    try:
+        table = get_rate_table(settings.FX_BASE_CURRENCY)
+    except Exception as e:
+        logger.warning(f"Failed to get the exchange rate table, falling back to the calculator: {e!r}")
+        table = {}
+    rate = cross_rate(table, curr1, curr2)
+    if rate is None:
+        return scrape_calculator_rate(curr1, curr2)
+    return rate
+
+
+async def async_get_exchange_rate(curr1: str, curr2: str) -> float | None:
+    """
+    Get the exchange rate between two currencies using the Playwright Async API.
+
+    The rate is triangulated from the cached rate table of ``settings.FX_BASE_CURRENCY``,
+    falling back to the calculator page for currencies missing from the table.
+
+    :param str curr1: The first currency code.
+    :param str curr2: The second currency code.
+    :return float: The exchange rate from curr1 to curr2.
+    """
+    try:
+        table = await async_get_rate_table(settings.FX_BASE_CURRENCY)
+    except Exception as e:
+        logger.warning(f"Failed to get the exchange rate table, falling back to the calculator: {e!r}")
+        table = {}
+    rate = cross_rate(table, curr1, curr2)
+    if rate is None:
+        return await async_scrape_calculator_rate(curr1, curr2)
+    return rate
+
+
+def _rate_table_url(base: str) -> str:
+    return f"{ROOT_RATE_TABLE_URL}/?from={base}&amount=1"
+
+
+def _rate_table_fields(base: str) -> list[str]:
+    return [r"ratesTable", rf"from={base}&(?:amp;)?to="]
+
+
+@cached("fx")
+def get_rate_table(base: str) -> dict:
+    """
+    Get the exchange rates from a base currency to every currency listed on the rate table page.
+
+    :param str base: The base currency code.
+    :return dict: The "base" currency, the "timestamp" of the scrape and the "rates" from the base currency.
+    """
+    content = fetch_page(_rate_table_url(base), "x-rates:table", _rate_table_fields(base), timeout=5000, wait_for=RATE_TABLE_SELECTOR)
+    return _parse_rate_table(content, base)
+
+
+@cached("fx")
+async def async_get_rate_table(base: str) -> dict:
+    """
+    Get the exchange rates from a base currency to every currency listed on the rate table page
+    using the Playwright Async API.
+
+    :param str base: The base currency code.
+    :return dict: The "base" currency, the "timestamp" of the scrape and the "rates" from the base currency.
+    """
+    content = await async_fetch_page(_rate_table_url(base), "x-rates:table", _rate_table_fields(base), timeout=5000, wait_for=RATE_TABLE_SELECTOR)
+    return await run_cpu_bound(_parse_rate_table, content, base)
+
+
+@timed("extract_fx_table")
+def _parse_rate_table(content: str, base: str) -> dict:
+    """
+    Parse the rates from the base currency out of the links of the rate table page.
+    """
+    soup = make_soup(content, RATE_TABLE_STRAINER)
+    rates = {}
+    for link in soup.find_all("a", href=True):
+        match = RATE_LINK_PATTERN.search(link["href"])
+        # the table also links the inverse rates, from each currency to the base
+        if not match or match.group(1) != base:
+            continue
+        try:
+            rates[match.group(2)] = float(link.get_text(strip=True).replace(",", ""))
+        except ValueError:
+            logger.warning(f"Invalid rate {link.get_text(strip=True)!r} from {base} to {match.group(2)}.")
+    if not rates:
+        logger.error(f"No rates found in the rate table for {base}.")
+        return {}
+    return {"base": base, "timestamp": datetime.now(timezone.utc).isoformat(), "rates": rates}
+
+
+def _rate_from_base(table: dict, currency: str) -> float | None:
+    if currency == table["base"]:
+        return 1.0
+    rate = table["rates"].get(currency)
+    # a zero rate cannot be inverted
+    return rate or None
+
+
+def cross_rate(table: dict, curr1: str, curr2: str) -> float | None:
+    """
+    Triangulate the exchange rate between two currencies through the base currency of a rate table.
+
+    :param dict table: The rate table, see ``get_rate_table``.
+    :param str curr1: The first currency code.
+    :param str curr2: The second currency code.
+    :return float: The exchange rate from curr1 to curr2, or None if either currency is not in the table.
+    """
+    if not table:
+        return None
+    rate1 = _rate_from_base(table, curr1.upper())
+    rate2 = _rate_from_base(table, curr2.upper())
+    if rate1 is None or rate2 is None:
+        return None
+    return rate2 / rate1
+
+
+def rate_matrix(table: dict, currencies: list[str] | None = None) -> dict[str, dict[str, float]]:
+    """
+    Get the exchange rates between every pair of currencies of a rate table.
+
+    :param dict table: The rate table, see ``get_rate_table``.
+    :param list currencies: The currency codes to include, defaults to every currency in the table.
+    :return dict: The rate from each currency (outer key) to each other currency (inner key).
+        Currencies missing from the table are left out.
+    """
+    if currencies is None:
+        currencies = [table["base"], *table["rates"]]
+    from_base = {currency.upper(): _rate_from_base(table, currency.upper()) for currency in currencies}
+    from_base = {currency: rate for currency, rate in from_base.items() if rate is not None}
+    return {curr1: {curr2: rate2 / rate1 for curr2, rate2 in from_base.items()} for curr1, rate1 in from_base.items()}
+
+
+@cached("fx")
+def scrape_calculator_rate(curr1: str, curr2: str) -> float | None:
+    """
+    Scrape the exchange rate between two currencies from the calculator page.
+    """
+    content = fetch_page(f"{ROOT_EXCHANGE_URL}/?from={curr1}&to={curr2}&amount=1", "x-rates:calculator", [re.escape(f"1.00 {curr1}")], timeout=5000, wait_for=RATE_SELECTOR)
+    return _parse_exchange_rate(content, curr1, curr2)
+
+
+@cached("fx")
+async def async_scrape_calculator_rate(curr1: str, curr2: str) -> float | None:
+    """
+    Scrape the exchange rate between two currencies from the calculator page using the Playwright Async API.
+    """
+    content = await async_fetch_page(f"{ROOT_EXCHANGE_URL}/?from={curr1}&to={curr2}&amount=1", "x-rates:calculator", [re.escape(f"1.00 {curr1}")], timeout=5000, wait_for=RATE_SELECTOR)
+    return await run_cpu_bound(_parse_exchange_rate, content, curr1, curr2)
+
+
+@timed("extract_fx")
+def _parse_exchange_rate(content: str, curr1: str, curr2: str) -> float | None:
+    """
+    Parse the exchange rate from the calculator page.
+    """
+    soup = make_soup(content, CALCULATOR_STRAINER)
     
     # look for span containing amount
     span_elements = soup.find_all("span")
@@ -0,0 +1,311 @@
+import asyncio
+import functools
+import itertools
+import re
+import time
+from loguru import logger
+
+from app.core.config import settings
+from app.core.metrics import timed, fetch_total
+from app.service.browser_pool import BrowserPoolFullError, PageLoadError, USER_AGENT
+from app.service.corpus import corpus, RECORD, REPLAY
+from app.service.rate_limit import rate_limiter
+from app.service.resilience import Upstream, upstream_for
+from app.service.scraper import playwright_scrape, async_playwright_scrape
+
+HTTP = "http"
+BROWSER = "browser"
+
+
+@functools.cache
+def _session():
+    """
+    Get the shared HTTP session, with a keep-alive connection pool per host.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=settings.HTTP_POOL_CONNECTIONS, pool_maxsize=settings.HTTP_POOL_SIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"User-Agent": USER_AGENT, "Accept-Language": "en-US,en;q=0.9"})
+    return session
+
+# URL pattern -> time at which plain HTTP last failed to return the required fields
+_http_failed_at = {}
+
+
+def strategy_for(pattern: str) -> str:
+    """
+    Get the fetch strategy to try first for a URL pattern.
+
+    :param pattern: Name of the URL pattern, e.g. "yahoo:history".
+    :return: "http" or "browser".
+    """
+    if not settings.FETCH_HTTP_FIRST:
+        return BROWSER
+    failed_at = _http_failed_at.get(pattern)
+    if failed_at is not None and time.monotonic() - failed_at < settings.FETCH_HTTP_RETRY_AFTER:
+        return BROWSER
+    return HTTP
+
+
+def _record(pattern: str, strategy: str):
+    if strategy == HTTP:
+        _http_failed_at.pop(pattern, None)
+    elif pattern not in _http_failed_at:
+        logger.info(f"Plain HTTP is missing data for {pattern}, using the browser for the next {settings.FETCH_HTTP_RETRY_AFTER}s.")
+        _http_failed_at[pattern] = time.monotonic()
+
+
+def _http_get(url: str, timeout: int) -> str:
+    response = _session().get(url, timeout=timeout / 1000)
+    response.raise_for_status()
+    return response.text
+
+
+def _has_fields(content: str, required: list[str]) -> bool:
+    return all(re.search(field, content) for field in required)
+
+
+def _is_server_error(error: Exception) -> bool:
+    response = getattr(error, "response", None)
+    return response is not None and response.status_code >= 500
+
+
+def _loaded_content(error: PageLoadError, required: list[str]) -> str:
+    """
+    Get the HTML of a page that did not finish loading if it already contains the required fields,
+    as the data may arrive before the rest of the page.
+
+    :raises PageLoadError: Otherwise.
+    """
+    if not _has_fields(error.content, required):
+        raise error
+    return error.content
+
+
+def _try_http(url: str, required: list[str], timeout: int) -> str | None:
+    """
+    Fetch a page over plain HTTP, returning None if it does not contain the required fields.
+
+    :raises requests.RequestException: If the host could not be reached, timed out or returned a server error.
+    """
+    import requests
+
+    try:
+        with timed("http", timeouts=requests.Timeout):
+            content = _http_get(url, timeout)
+    except requests.HTTPError as e:
+        if _is_server_error(e):
+            raise
+        logger.debug(f"HTTP fetch failed for {url}: {e}")
+        return None
+    if not _has_fields(content, required):
+        logger.debug(f"HTTP response for {url} is missing required fields.")
+        return None
+    return content
+
+
+def fetch_page(url: str, pattern: str, required: list[str], timeout: int = settings.PLAYWRIGHT_TIMEOUT, wait_for: str | None = None) -> str:
+    """
+    Fetch the contents of a page, trying a pooled HTTP client before falling back to Playwright.
+
+    :param url: The URL to fetch.
+    :param pattern: Name of the URL pattern, used to remember which strategy works.
+    :param required: Regular expressions that must all match the HTML for the parser to succeed.
+    :param timeout: Timeout in milliseconds.
+    :param wait_for: Selector signalling that the data is in the DOM, used when rendering in a browser.
+    :return: The page HTML.
+    :raises CorpusMissError: If replaying and the page was not recorded.
+    :raises CircuitOpenError: If the host is failing and the page was not fetched.
+    """
+    if settings.SCRAPE_MODE == REPLAY:
+        return corpus.load(url)
+    content = _fetch_live(url, pattern, required, timeout, wait_for)
+    if settings.SCRAPE_MODE == RECORD:
+        corpus.save(url, pattern, content)
+    return content
+
+
+async def async_fetch_page(url: str, pattern: str, required: list[str], timeout: int = settings.PLAYWRIGHT_TIMEOUT, wait_for: str | None = None) -> str:
+    """
+    Async version of ``fetch_page``, where background refreshes wait for the outbound rate limit.
+    """
+    if settings.SCRAPE_MODE == REPLAY:
+        return await asyncio.to_thread(corpus.load, url)
+    content = await _async_fetch_live(url, pattern, required, timeout, wait_for)
+    if settings.SCRAPE_MODE == RECORD:
+        await asyncio.to_thread(corpus.save, url, pattern, content)
+    return content
+
+
+def _fetch_once(upstream: Upstream, url: str, pattern: str, required: list[str], timeout: int, wait_for: str | None) -> tuple[str, bool]:
+    """
+    Fetch a page once, with timeouts adapted to past fetches of the pattern.
+
+    :return: The page HTML, and whether it contains the required fields.
+    :raises requests.RequestException: If plain HTTP failed at the host, with a server error
+        or when the browser did not get the data either.
+    :raises PageLoadError: If the browser render timed out or the server returned an error.
+    """
+    import requests
+
+    tried_http = strategy_for(pattern) == HTTP
+    http_error = None
+    if tried_http:
+        start = time.perf_counter()
+        http_timeout = upstream.timeout(pattern, HTTP, timeout)
+        try:
+            content = _try_http(url, required, http_timeout)
+        except requests.RequestException as e:
+            logger.debug(f"HTTP fetch failed for {url}: {e}")
+            if isinstance(e, requests.Timeout):
+                upstream.record_timeout(pattern, HTTP, http_timeout)
+            if _is_server_error(e):
+                # a browser would get the same error
+                raise
+            content, http_error = None, e
+        if content is not None:
+            upstream.record_latency(pattern, HTTP, time.perf_counter() - start)
+            _record(pattern, HTTP)
+            fetch_total.inc(pattern=pattern, strategy=HTTP)
+            return content, True
+    fetch_total.inc(pattern=pattern, strategy=BROWSER)
+    start = time.perf_counter()
+    browser_timeout = upstream.timeout(pattern, BROWSER, timeout)
+    try:
+        content = playwright_scrape(url, headless=True, timeout=browser_timeout, wait_for=wait_for)
+    except PageLoadError as e:
+        if e.timed_out:
+            upstream.record_timeout(pattern, BROWSER, browser_timeout)
+        content = _loaded_content(e, required)
+    complete = _has_fields(content, required)
+    if complete:
+        upstream.record_latency(pattern, BROWSER, time.perf_counter() - start)
+        # only once the browser is known to work, e.g. an unknown ticker is missing data either way
+        if tried_http:
+            _record(pattern, BROWSER)
+    elif http_error is not None:
+        # the host failed, rather than the page lacking the data
+        raise http_error
+    return content, complete
+
+
+async def _async_fetch_once(upstream: Upstream, url: str, pattern: str, required: list[str], timeout: int, wait_for: str | None) -> tuple[str, bool]:
+    import requests
+
+    tried_http = strategy_for(pattern) == HTTP
+    http_error = None
+    if tried_http:
+        start = time.perf_counter()
+        http_timeout = upstream.timeout(pattern, HTTP, timeout)
+        try:
+            content = await asyncio.to_thread(_try_http, url, required, http_timeout)
+        except requests.RequestException as e:
+            logger.debug(f"HTTP fetch failed for {url}: {e}")
+            if isinstance(e, requests.Timeout):
+                upstream.record_timeout(pattern, HTTP, http_timeout)
+            if _is_server_error(e):
+                # a browser would get the same error
+                raise
+            content, http_error = None, e
+        if content is not None:
+            upstream.record_latency(pattern, HTTP, time.perf_counter() - start)
+            _record(pattern, HTTP)
+            fetch_total.inc(pattern=pattern, strategy=HTTP)
+            return content, True
+    fetch_total.inc(pattern=pattern, strategy=BROWSER)
+    start = time.perf_counter()
+    browser_timeout = upstream.timeout(pattern, BROWSER, timeout)
+    try:
+        content = await async_playwright_scrape(url, headless=True, timeout=browser_timeout, wait_for=wait_for)
+    except PageLoadError as e:
+        if e.timed_out:
+            upstream.record_timeout(pattern, BROWSER, browser_timeout)
+        content = _loaded_content(e, required)
+    complete = _has_fields(content, required)
+    if complete:
+        upstream.record_latency(pattern, BROWSER, time.perf_counter() - start)
+        # only once the browser is known to work, e.g. an unknown ticker is missing data either way
+        if tried_http:
+            _record(pattern, BROWSER)
+    elif http_error is not None:
+        # the host failed, rather than the page lacking the data
+        raise http_error
+    return content, complete
+
+
+def _fetch_live(url: str, pattern: str, required: list[str], timeout: int, wait_for: str | None) -> str:
+    """
+    Fetch a page from its host, retrying failed fetches within the retry budget of the host.
+
+    Only errors, timeouts and server errors count as failures of the host. A page missing the required fields,
+    e.g. for an unknown ticker, is returned as is without a retry, as the parsers handle it,
+    and so is what loaded of a page that timed out in the browser once the retries are exhausted.
+
+    :raises CircuitOpenError: If the host is failing and the fetch was not attempted.
+    """
+    upstream = upstream_for(url)
+    upstream.budget.deposit()
+    for attempt in itertools.count(1):
+        upstream.check(url)
+        rate_limiter.consume(url)
+        error = None
+        try:
+            content, complete = _fetch_once(upstream, url, pattern, required, timeout, wait_for)
+        except BrowserPoolFullError:
+            # our own capacity, not the health of the host
+            upstream.breaker.release()
+            raise
+        except Exception as e:
+            logger.warning(f"Fetch of {url} failed: {e!r}")
+            content, complete, error = None, False, e
+        if complete:
+            upstream.breaker.record_success()
+            return content
+        if error is None:
+            # the host answered, so this says nothing about its health
+            upstream.breaker.release()
+            return content
+        upstream.record_failure()
+        delay = upstream.retry_delay(attempt)
+        if delay is None:
+            if isinstance(error, PageLoadError):
+                return error.content
+            raise error
+        logger.debug(f"Retrying {url} in {delay:.2f}s.")
+        time.sleep(delay)
+
+
+async def _async_fetch_live(url: str, pattern: str, required: list[str], timeout: int, wait_for: str | None) -> str:
+    upstream = upstream_for(url)
+    upstream.budget.deposit()
+    for attempt in itertools.count(1):
+        upstream.check(url)
+        await rate_limiter.acquire(url)
+        error = None
+        try:
+            content, complete = await _async_fetch_once(upstream, url, pattern, required, timeout, wait_for)
+        except (BrowserPoolFullError, asyncio.CancelledError):
+            upstream.breaker.release()
+            raise
+        except Exception as e:
+            logger.warning(f"Fetch of {url} failed: {e!r}")
+            content, complete, error = None, False, e
+        if complete:
+            upstream.breaker.record_success()
+            return content
+        if error is None:
+            # the host answered, so this says nothing about its health
+            upstream.breaker.release()
+            return content
+        upstream.record_failure()
+        delay = upstream.retry_delay(attempt)
+        if delay is None:
+            if isinstance(error, PageLoadError):
+                return error.content
+            raise error
+        logger.debug(f"Retrying {url} in {delay:.2f}s.")
+        await asyncio.sleep(delay)
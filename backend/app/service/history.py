@@ -0,0 +1,257 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from loguru import logger
+
+from app.core.config import settings
+from app.core.metrics import timed
+from app.service.fetch import fetch_page, async_fetch_page
+from app.service.offload import run_cpu_bound
+from app.service.parsing import make_soup
+from app.service.yahoo_finance import (
+    ROOT_YAHOO_URL, HISTORY_FIELDS, HISTORY_SELECTOR, HISTORY_UPDATE_FIELDS, HISTORY_UPDATE_SELECTOR, HISTORY_STRAINER
+)
+
+COLUMNS = ("open", "high", "low", "close", "adj_close", "volume")
+DATE_FORMATS = ("%d %b %Y", "%b %d, %Y", "%d/%m/%Y")
+
+
+class HistoryNotFoundError(LookupError):
+    """
+    Raised when no price history is found for a security, e.g. an unknown ticker.
+    """
+
+
+class PriceHistory:
+    """
+    Columnar OHLCV price series of a security, oldest bar first.
+    """
+
+    def __init__(self, dates: np.ndarray, columns: dict[str, np.ndarray]):
+        self.dates = dates.astype("datetime64[D]")
+        self.columns = {name: np.asarray(columns[name], dtype=np.float64) for name in COLUMNS}
+        self.fetched_at = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    @property
+    def last_date(self) -> np.datetime64 | None:
+        return self.dates[-1] if len(self.dates) else None
+
+    def append(self, other: "PriceHistory"):
+        """
+        Merge the bars of another series into this one, its bars replacing those of the same dates,
+        e.g. the last bar of this one if it was fetched during the trading day.
+        """
+        keep = ~np.isin(self.dates, other.dates)
+        dates = np.concatenate([self.dates[keep], other.dates])
+        order = np.argsort(dates, kind="stable")
+        self.dates = dates[order]
+        self.columns = {name: np.concatenate([self.columns[name][keep], other.columns[name]])[order] for name in COLUMNS}
+        self.fetched_at = time.monotonic()
+
+    def to_dict(self) -> dict[str, list]:
+        """
+        Convert the series to JSON-serialisable columns, with missing values as None.
+        """
+        result = {"date": np.datetime_as_string(self.dates, unit="D").tolist()}
+        for name, values in self.columns.items():
+            result[name] = np.where(np.isnan(values), None, values).tolist()
+        return result
+
+
+def _parse_date(text: str) -> np.datetime64 | None:
+    for date_format in DATE_FORMATS:
+        try:
+            return np.datetime64(datetime.strptime(text, date_format).date(), "D")
+        except ValueError:
+            continue
+    return None
+
+
+def _parse_number(text: str) -> float:
+    try:
+        return float(text.replace(",", ""))
+    except ValueError:
+        return np.nan
+
+
+def _column_name(header: str) -> str | None:
+    header = header.lower().replace(".", "").replace("*", "").strip()
+    if header.startswith("adj"):
+        return "adj_close"
+    for name in COLUMNS:
+        if header.startswith(name):
+            return name
+    return None
+
+
+@timed("extract_history")
+def _parse_history(content: str, id: str) -> PriceHistory:
+    """
+    Parse every price row of the history table.
+    """
+    soup = make_soup(content, HISTORY_STRAINER)
+    table = soup.find("table")
+    # an empty tag is falsy, and an update over a weekend has an empty body
+    if table is None or table.find("thead") is None or table.find("tbody") is None:
+        logger.error(f"No history table found in page for {id}.")
+        return PriceHistory(np.array([], dtype="datetime64[D]"), {name: [] for name in COLUMNS})
+
+    headers = [th.get_text(strip=True) for th in table.find("thead").find_all("th")]
+    indexes = {_column_name(h): i for i, h in enumerate(headers)}
+
+    dates, rows = [], []
+    for tr in table.find("tbody").find_all("tr"):
+        cells = [td.get_text(strip=True) for td in tr.find_all("td")]
+        # dividend and split rows span the price columns
+        if len(cells) != len(headers):
+            continue
+        date = _parse_date(cells[0])
+        if date is None:
+            logger.warning(f"Unrecognised date {cells[0]!r} in history table for {id}.")
+            continue
+        dates.append(date)
+        rows.append([_parse_number(cells[indexes[name]]) if name in indexes else np.nan for name in COLUMNS])
+
+    values = np.array(rows, dtype=np.float64).reshape(len(rows), len(COLUMNS))
+    # the table lists the newest bar first
+    order = np.argsort(np.array(dates, dtype="datetime64[D]"), kind="stable")
+    return PriceHistory(
+        np.array(dates, dtype="datetime64[D]")[order],
+        {name: values[order, i] for i, name in enumerate(COLUMNS)},
+    )
+
+
+def _history_url(id: str, since: np.datetime64 | None) -> str:
+    """
+    Get the URL of the history page, limited to bars from ``since`` if given.
+    """
+    url = f"{ROOT_YAHOO_URL}/{id}/history"
+    if since is None:
+        return url
+    start = datetime.fromisoformat(str(since)).replace(tzinfo=timezone.utc)
+    end = datetime.now(timezone.utc) + timedelta(days=1)
+    return f"{url}/?period1={int(start.timestamp())}&period2={int(end.timestamp())}"
+
+
+def _fetch_args(since: np.datetime64 | None) -> tuple[str, list[str], str]:
+    """
+    Get the URL pattern, required fields and selector of a history fetch.
+    """
+    if since is None:
+        return "yahoo:history", HISTORY_FIELDS, HISTORY_SELECTOR
+    # updates may have no new rows, which is a complete result, and must not affect the strategy of full fetches
+    return "yahoo:history-update", HISTORY_UPDATE_FIELDS, HISTORY_UPDATE_SELECTOR
+
+
+# least recently used first, at most HISTORY_MAX_SECURITIES
+_histories: OrderedDict[str, PriceHistory] = OrderedDict()
+_lock = threading.Lock()
+# only kept along with a stored history, or while its first fetch is in flight
+_ticker_locks: dict[str, threading.Lock] = {}
+_async_ticker_locks: dict[str, asyncio.Lock] = {}
+
+
+def _is_fresh(history: PriceHistory | None) -> bool:
+    return history is not None and time.monotonic() - history.fetched_at < settings.HISTORY_REFRESH_INTERVAL
+
+
+def _lookup(id: str) -> PriceHistory | None:
+    with _lock:
+        history = _histories.get(id)
+        if history is not None:
+            _histories.move_to_end(id)
+        return history
+
+
+def _forget(id: str):
+    """
+    Drop the locks of a security without a stored history.
+    """
+    _ticker_locks.pop(id, None)
+    _async_ticker_locks.pop(id, None)
+
+
+def _store(id: str, history: PriceHistory | None, fetched: PriceHistory) -> PriceHistory:
+    """
+    Store the bars fetched for a security, evicting the least recently used histories beyond ``HISTORY_MAX_SECURITIES``.
+
+    :param history: The stored history the fetch updates, or None for a first fetch.
+    :raises HistoryNotFoundError: If the first fetch of a security has no bars.
+    """
+    if history is None:
+        if not len(fetched):
+            # e.g. an unknown ticker or a blocked page, which must not be served as a fresh empty history
+            raise HistoryNotFoundError(f"No price history found for {id}.")
+        # parsed in another process if offloaded, so restart its clock in this one
+        fetched.fetched_at = time.monotonic()
+        history = fetched
+    else:
+        history.append(fetched)
+    with _lock:
+        # stored again, in case it was evicted during the fetch
+        _histories[id] = history
+        _histories.move_to_end(id)
+        while len(_histories) > settings.HISTORY_MAX_SECURITIES:
+            evicted, _ = _histories.popitem(last=False)
+            _forget(evicted)
+    logger.debug(f"Stored {len(history)} bars for {id}.")
+    return history
+
+
+def get_history(id: str) -> PriceHistory:
+    """
+    Get the full price history of a security, only fetching bars from the last stored one,
+    which is refetched as it may have been a partial trading day.
+
+    :param id: The ID of the security.
+    :return: The price history of the security.
+    :raises HistoryNotFoundError: If the security has no price history.
+    """
+    with _lock:
+        ticker_lock = _ticker_locks.setdefault(id, threading.Lock())
+    with ticker_lock:
+        history = _lookup(id)
+        if _is_fresh(history):
+            return history
+        since = history.last_date if history is not None else None
+        pattern, required, selector = _fetch_args(since)
+        try:
+            content = fetch_page(_history_url(id, since), pattern, required, wait_for=selector)
+            return _store(id, history, _parse_history(content, id))
+        except BaseException:
+            if history is None:
+                with _lock:
+                    _forget(id)
+            raise
+
+
+async def async_get_history(id: str) -> PriceHistory:
+    """
+    Get the full price history of a security using the Playwright Async API,
+    only fetching bars from the last stored one.
+
+    :param id: The ID of the security.
+    :return: The price history of the security.
+    :raises HistoryNotFoundError: If the security has no price history.
+    """
+    ticker_lock = _async_ticker_locks.setdefault(id, asyncio.Lock())
+    async with ticker_lock:
+        history = _lookup(id)
+        if _is_fresh(history):
+            return history
+        since = history.last_date if history is not None else None
+        pattern, required, selector = _fetch_args(since)
+        try:
+            content = await async_fetch_page(_history_url(id, since), pattern, required, wait_for=selector)
+            return _store(id, history, await run_cpu_bound(_parse_history, content, id))
+        except BaseException:
+            if history is None:
+                with _lock:
+                    _forget(id)
+            raise
@@ -0,0 +1,41 @@
+import asyncio
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable
+from loguru import logger
+
+from app.core.config import settings
+
+
+@functools.cache
+def _executor() -> ProcessPoolExecutor:
+    # spawn rather than fork, the server process runs threads and an event loop
+    executor = ProcessPoolExecutor(
+        max_workers=settings.PROCESS_POOL_WORKERS, mp_context=multiprocessing.get_context("spawn")
+    )
+    logger.info(f"Started process pool with {settings.PROCESS_POOL_WORKERS} processes.")
+    return executor
+
+
+async def run_cpu_bound(func: Callable, *args):
+    """
+    Run CPU-bound work, such as parsing a page or a batch calculation, in the process pool
+    so it does not hold the GIL of the server process.
+
+    Runs in a thread if ``settings.PROCESS_POOL_WORKERS`` is 0. Stage timings recorded inside ``func``
+    stay in the pool process and are not reported.
+
+    :param func: Module-level function, so it can be sent to another process.
+    :param args: Arguments of the function, which must be picklable.
+    :return: The result of the function.
+    """
+    if settings.PROCESS_POOL_WORKERS <= 0:
+        return await asyncio.to_thread(func, *args)
+    return await asyncio.get_running_loop().run_in_executor(_executor(), func, *args)
+
+
+def shutdown():
+    if _executor.cache_info().currsize:
+        _executor().shutdown(cancel_futures=True)
+        _executor.cache_clear()
@@ -0,0 +1,63 @@
+import functools
+import importlib.util
+from typing import TYPE_CHECKING
+from loguru import logger
+
+from app.core.config import settings
+from app.core.metrics import timed
+
+if TYPE_CHECKING:
+    import bs4
+    import soupsieve
+
+PARSERS = ("html.parser", "lxml")
+
+
+@functools.cache
+def _resolve_parser(parser: str) -> str:
+    """
+    Get the BeautifulSoup tree builder to use, falling back to the standard library parser.
+    """
+    if parser not in PARSERS:
+        raise ValueError(f"Unsupported HTML parser {parser!r}, expected one of {PARSERS}.")
+    # only look the module up, bs4 imports it when building the first tree
+    if parser == "lxml" and importlib.util.find_spec("lxml") is None:
+        logger.warning("lxml is not installed, falling back to html.parser.")
+        return "html.parser"
+    return parser
+
+
+@functools.cache
+def _strainer(names: tuple[str, ...]) -> "bs4.SoupStrainer":
+    import bs4
+
+    return bs4.SoupStrainer(list(names))
+
+
+@functools.cache
+def selector(pattern: str) -> "soupsieve.SoupSieve":
+    """
+    Get a CSS selector, compiled on first use and reused afterwards.
+
+    :param pattern: The CSS selector.
+    :return: The compiled selector.
+    """
+    import soupsieve
+
+    return soupsieve.compile(pattern)
+
+
+def make_soup(content: str, parse_only: tuple[str, ...] | None = None, parser: str | None = None) -> "bs4.BeautifulSoup":
+    """
+    Parse a page with the configured parser backend.
+
+    :param content: The page HTML.
+    :param parse_only: Names of the tags the extractor needs, the rest of the page is not built.
+    :param parser: The parser backend, defaults to ``settings.HTML_PARSER``.
+    :return: The parsed tree.
+    """
+    import bs4
+
+    strainer = _strainer(parse_only) if parse_only else None
+    with timed("parse"):
+        return bs4.BeautifulSoup(content, _resolve_parser(parser or settings.HTML_PARSER), parse_only=strainer)
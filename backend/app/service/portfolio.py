@@ -0,0 +1,156 @@
+import asyncio
+from typing import AsyncIterator
+from loguru import logger
+
+from app.core.config import settings
+from app.service.batch import stream_batch
+from app.service.calculations import predict_values, fallback_predict_average_income
+from app.service.exchange_rate import async_get_exchange_rate
+from app.service.yahoo_finance import async_scrape_quote, async_scrape_financials
+
+TTM = "TTM"
+
+
+def _fundamentals(financials: dict) -> dict[str, float | None]:
+    """
+    Get the per-share figures and the predicted income growth from scraped financials, in the financials currency.
+
+    Periods are listed newest first, the trailing twelve months leading the income statement.
+    Growth is fitted on the yearly incomes only.
+    """
+    rows = financials.get("financial_statement", {}).get("financials", {})
+    balance = financials.get("balance_sheet", {})
+    shares = next((row["shares"] for row in rows.values() if row["shares"]), 0)
+    latest_income = next(iter(rows.values()), {}).get("income")
+    latest_balance = next(iter(balance.values()), {})
+
+    incomes = [row["income"] for period, row in rows.items() if period != TTM][::-1]
+    growth_rate = average_income = None
+    if len(incomes) >= 2:
+        try:
+            growth_rate, average_income = predict_values(incomes)
+        except (AssertionError, ValueError) as e:
+            logger.info(e)
+            growth_rate, average_income = fallback_predict_average_income(incomes)
+    return {
+        "eps": latest_income / shares if shares and latest_income is not None else None,
+        "bvps": latest_balance["book_value"] / shares if shares and "book_value" in latest_balance else None,
+        "growth_rate": growth_rate,
+        "predicted_average_income": average_income,
+    }
+
+
+class PortfolioValuation:
+    """
+    Values the holdings of a portfolio in a base currency, sharing fetches between holdings:
+    one quote and one financials scrape per security, and one exchange rate per currency.
+    """
+
+    def __init__(self, holdings: dict[str, float], currency: str = settings.FX_BASE_CURRENCY):
+        """
+        :param holdings: Quantity held by security ID.
+        :param currency: Base currency of the valuation.
+        """
+        self.holdings = holdings
+        self.currency = currency.upper()
+        self._rates = {}
+
+    async def _rate(self, currency: str) -> float | None:
+        """
+        Get the exchange rate from a currency to the base currency, fetched once per currency.
+        """
+        currency = currency.upper()
+        if currency == self.currency:
+            return 1.0
+        if currency not in self._rates:
+            self._rates[currency] = asyncio.ensure_future(async_get_exchange_rate(currency, self.currency))
+        # shared by the holdings in this currency, so one being cancelled must not cancel it for the others
+        return await asyncio.shield(self._rates[currency])
+
+    async def value(self, id: str) -> dict:
+        """
+        Value a single holding.
+
+        :param id: The ID of the security.
+        :return: The price, EPS and book value per share in the base currency, the predicted growth,
+            and the value of the holding in the base currency.
+        """
+        quote_task = asyncio.ensure_future(async_scrape_quote(id))
+        financials_task = asyncio.ensure_future(async_scrape_financials(id))
+        try:
+            quote, (financials, errors) = await asyncio.gather(quote_task, financials_task)
+        finally:
+            # the holding fails with the first failed fetch, which must not leave the other one scraping
+            quote_task.cancel()
+            financials_task.cancel()
+        if quote["price"] <= 0 or not quote["exchange_currency"]:
+            raise ValueError(f"No price found for {id}.")
+        if not financials:
+            raise next(iter(errors.values()))
+
+        fundamentals = _fundamentals(financials)
+        financials_currency = financials.get("financial_statement", {}).get("financials_currency") or quote["exchange_currency"]
+        price_rate, financials_rate = await asyncio.gather(
+            self._rate(quote["exchange_currency"]), self._rate(financials_currency)
+        )
+        if price_rate is None or financials_rate is None:
+            raise ValueError(f"No exchange rate found to {self.currency} for {id}.")
+
+        def convert(amount: float | None, rate: float) -> float | None:
+            return amount * rate if amount is not None else None
+
+        price = quote["price"] * price_rate
+        result = {
+            "name": quote["name"],
+            "quantity": self.holdings[id],
+            "exchange_currency": quote["exchange_currency"],
+            "financials_currency": financials_currency,
+            "price": price,
+            "eps": convert(fundamentals["eps"], financials_rate),
+            "bvps": convert(fundamentals["bvps"], financials_rate),
+            "growth_rate": fundamentals["growth_rate"],
+            "predicted_average_income": convert(fundamentals["predicted_average_income"], financials_rate),
+            "value": price * self.holdings[id],
+        }
+        if errors:
+            result["errors"] = {name: str(e) for name, e in errors.items()}
+        return result
+
+    async def stream(
+        self, concurrency: int = settings.PORTFOLIO_CONCURRENCY, deadline: float = settings.PORTFOLIO_DEADLINE
+    ) -> AsyncIterator[dict]:
+        """
+        Value every holding with bounded concurrency, yielding each outcome as soon as it completes
+        and a summary once all are done or the deadline has passed.
+
+        :param concurrency: Maximum number of holdings valued at once.
+        :param deadline: Time in seconds for the whole valuation, holdings still pending after it are reported as errors.
+        :return: Async iterator of {"id", "result"} or {"id", "error"} dictionaries,
+            then a {"summary"} of the total value in the base currency.
+        """
+        loop = asyncio.get_running_loop()
+        end = loop.time() + deadline
+        pending = dict.fromkeys(self.holdings)
+        total, failed = 0.0, 0
+        outcomes = stream_batch(list(self.holdings), self.value, concurrency)
+        try:
+            while pending:
+                try:
+                    outcome = await asyncio.wait_for(anext(outcomes), max(0, end - loop.time()))
+                except asyncio.TimeoutError:
+                    logger.warning(f"Portfolio valuation passed its {deadline}s deadline with {len(pending)} holdings pending.")
+                    for id in pending:
+                        failed += 1
+                        yield {"id": id, "error": f"Valuation did not complete within {deadline}s."}
+                    break
+                pending.pop(outcome["id"], None)
+                if "error" in outcome:
+                    failed += 1
+                else:
+                    total += outcome["result"]["value"]
+                yield outcome
+        finally:
+            await outcomes.aclose()
+            for task in self._rates.values():
+                task.cancel()
+        yield {"summary": {"currency": self.currency, "value": total, "holdings": len(self.holdings), "errors": failed}}
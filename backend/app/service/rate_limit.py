@@ -0,0 +1,106 @@
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from urllib.parse import urlsplit
+
+from app.core.config import settings
+
+# whether the current task is a background refresh, which waits for the rate limit
+_background = ContextVar("background", default=False)
+
+
+class TokenBucket:
+    """
+    Token bucket allowing ``rate`` requests per second with bursts of up to ``burst`` requests.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def consume(self):
+        """
+        Take a token without waiting. The balance may go negative, down to ``-burst``,
+        which delays the requests that wait for a token.
+        """
+        with self._lock:
+            self._refill()
+            self._tokens = max(-self.burst, self._tokens - 1)
+
+    def try_consume(self) -> float:
+        """
+        Take a token if one is available.
+
+        :return: 0 if a token was taken, otherwise the seconds until one is available.
+        """
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            return (1 - self._tokens) / self.rate
+
+
+class RateLimiter:
+    """
+    Per-host limit on outbound requests.
+
+    Requests made for API callers never wait but use up tokens, while background refreshes
+    wait for a token, so prefetching backs off when callers are generating traffic.
+    """
+
+    def __init__(self, rate: float = settings.OUTBOUND_RATE_LIMIT, burst: int = settings.OUTBOUND_RATE_BURST):
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, url: str) -> TokenBucket:
+        host = urlsplit(url).hostname or ""
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = self._buckets[host] = TokenBucket(self.rate, self.burst)
+            return bucket
+
+    def consume(self, url: str):
+        """
+        Account for a request made by a sync caller, which is never delayed.
+        """
+        self._bucket(url).consume()
+
+    async def acquire(self, url: str):
+        """
+        Account for a request to ``url``, waiting for a token if it is made by a background refresh.
+        """
+        bucket = self._bucket(url)
+        if not _background.get():
+            bucket.consume()
+            return
+        while (delay := bucket.try_consume()) > 0:
+            await asyncio.sleep(delay)
+
+
+@contextmanager
+def background():
+    """
+    Mark the requests made in this context as background traffic, which waits for the rate limit.
+    """
+    token = _background.set(True)
+    try:
+        yield
+    finally:
+        _background.reset(token)
+
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,207 @@
+import random
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+from loguru import logger
+
+from app.core.config import settings
+from app.core.metrics import upstream_state, upstream_timeout_ms, upstream_failures_total, upstream_retries_total
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+# exported as a gauge
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of fetching from a host whose circuit breaker is open.
+    """
+
+
+class CircuitBreaker:
+    """
+    Fails fast after ``threshold`` consecutive failed fetches from a host, then lets a single probe
+    through every ``reset_timeout`` seconds until one succeeds.
+    """
+
+    def __init__(self, host: str, threshold: int, reset_timeout: float):
+        self.host = host
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """
+        Check whether a fetch may be made, reserving the probe if the breaker is half open.
+        """
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self._probing = False
+            if self.state == HALF_OPEN:
+                if self._probing:
+                    return False
+                self._probing = True
+                return True
+            return self.state == CLOSED
+
+    def release(self):
+        """
+        Give up a probe without an outcome, e.g. when the fetch was cancelled.
+        """
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info(f"Circuit breaker for {self.host} closed.")
+            self.state = CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.threshold):
+                logger.warning(f"Circuit breaker for {self.host} opened after {self.failures} failed fetches.")
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+
+class AdaptiveTimeout:
+    """
+    Timeout derived from a percentile of recent fetch latencies,
+    so a slow upstream is given up on sooner than the fixed worst-case timeout.
+
+    Fetches that time out count as taking their timeout, so after a slowdown the timeout widens again
+    until fetches complete, rather than staying below the new latency.
+    """
+
+    def __init__(self, window: int):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def timeout(self, default: int) -> int:
+        """
+        Get the timeout in milliseconds, never above ``default``.
+        """
+        with self._lock:
+            if len(self._samples) < settings.ADAPTIVE_TIMEOUT_MIN_SAMPLES:
+                return default
+            samples = sorted(self._samples)
+        index = min(len(samples) - 1, int(len(samples) * settings.ADAPTIVE_TIMEOUT_PERCENTILE / 100))
+        adapted = samples[index] * 1000 * settings.ADAPTIVE_TIMEOUT_MULTIPLIER
+        return int(min(default, max(settings.ADAPTIVE_TIMEOUT_MIN, adapted)))
+
+
+class RetryBudget:
+    """
+    Limits retries to a fraction of fetches, so retrying cannot multiply the load on a failing host.
+    """
+
+    def __init__(self, ratio: float, burst: int):
+        self.ratio = ratio
+        self.burst = burst
+        self._tokens = float(burst)
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class Upstream:
+    """
+    Health of one upstream host: its circuit breaker, retry budget and adaptive timeouts.
+    """
+
+    def __init__(self, host: str):
+        self.host = host
+        self.breaker = CircuitBreaker(host, settings.BREAKER_FAILURE_THRESHOLD, settings.BREAKER_RESET_TIMEOUT)
+        self.budget = RetryBudget(settings.RETRY_BUDGET_RATIO, settings.RETRY_BUDGET_BURST)
+        # one timeout per URL pattern and fetch strategy, a browser render being far slower than plain HTTP
+        self._timeouts = {}
+        upstream_state.track(lambda: STATE_VALUES[self.breaker.state], host=host)
+
+    def _timeout(self, pattern: str, strategy: str) -> AdaptiveTimeout:
+        timeout = self._timeouts.get((pattern, strategy))
+        if timeout is None:
+            timeout = self._timeouts.setdefault((pattern, strategy), AdaptiveTimeout(settings.ADAPTIVE_TIMEOUT_WINDOW))
+            upstream_timeout_ms.track(lambda: timeout.timeout(settings.PLAYWRIGHT_TIMEOUT), host=self.host, pattern=pattern, strategy=strategy)
+        return timeout
+
+    def timeout(self, pattern: str, strategy: str, default: int) -> int:
+        """
+        Get the timeout in milliseconds of a fetch, adapted to the latency of past fetches.
+        """
+        return self._timeout(pattern, strategy).timeout(default)
+
+    def record_latency(self, pattern: str, strategy: str, seconds: float):
+        self._timeout(pattern, strategy).record(seconds)
+
+    def record_timeout(self, pattern: str, strategy: str, timeout: int):
+        """
+        Record a fetch that timed out.
+
+        :param timeout: The timeout of the fetch in milliseconds.
+        """
+        self._timeout(pattern, strategy).record(timeout / 1000)
+
+    def check(self, url: str):
+        """
+        :raises CircuitOpenError: If the circuit breaker of the host is open.
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{self.host} is failing, not fetching {url}.")
+
+    def record_failure(self):
+        upstream_failures_total.inc(host=self.host)
+        self.breaker.record_failure()
+
+    def retry_delay(self, attempt: int) -> float | None:
+        """
+        Get the backoff before a retry, or None if the fetch must not be retried.
+
+        :param attempt: Number of the retry, from 1.
+        """
+        if attempt > settings.RETRY_MAX_ATTEMPTS or self.breaker.state != CLOSED or not self.budget.withdraw():
+            return None
+        upstream_retries_total.inc(host=self.host)
+        # full jitter, so retries of concurrent fetches spread out
+        return random.uniform(0, settings.RETRY_BACKOFF_BASE * 2 ** (attempt - 1))
+
+
+_upstreams = {}
+_lock = threading.Lock()
+
+
+def upstream_for(url: str) -> Upstream:
+    """
+    Get the health tracker of the host of a URL.
+    """
+    host = urlsplit(url).hostname or ""
+    with _lock:
+        upstream = _upstreams.get(host)
+        if upstream is None:
+            upstream = _upstreams[host] = Upstream(host)
+        return upstream
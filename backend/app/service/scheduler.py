@@ -0,0 +1,258 @@
+import asyncio
+import heapq
+import itertools
+import random
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from loguru import logger
+
+from app.core.config import settings
+from app.core.metrics import scheduler_refreshes_total, scheduler_jobs
+from app.service.exchange_rate import async_get_rate_table
+from app.service.rate_limit import background
+from app.service.yahoo_finance import (
+    async_scrape_price, async_scrape_quote, async_scrape_main, async_scrape_financial_statement, async_scrape_balance
+)
+
+# job kind -> (function scraping and caching the data, setting holding the refresh interval)
+REFRESHERS = {
+    "price": (async_scrape_price.refresh, "SCHEDULER_PRICE_INTERVAL"),
+    "quote": (async_scrape_quote.refresh, "SCHEDULER_PRICE_INTERVAL"),
+    "overview": (async_scrape_main.refresh, "SCHEDULER_FINANCIALS_INTERVAL"),
+    "financials": (async_scrape_financial_statement.refresh, "SCHEDULER_FINANCIALS_INTERVAL"),
+    "balance": (async_scrape_balance.refresh, "SCHEDULER_FINANCIALS_INTERVAL"),
+    "fx": (async_get_rate_table.refresh, "SCHEDULER_FX_INTERVAL"),
+}
+WATCHLIST_JOBS = ("price", "quote", "overview", "financials", "balance")
+# securities requested outside the watchlist only have their fast-moving data kept fresh
+RECENT_JOBS = ("price", "quote")
+
+
+class SharedRequests:
+    """
+    Securities requested from any worker process of this host, stored in a local SQLite database,
+    so the one worker running the scheduler keeps fresh those requested from the others too.
+    """
+
+    def __init__(self, path: str | Path = Path(settings.SHARED_STATE_DIR) / "scheduler.sqlite3"):
+        self.path = Path(path)
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite connections cannot be shared between threads
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("CREATE TABLE IF NOT EXISTS requested (id TEXT PRIMARY KEY, requested_at REAL)")
+            self._local.connection = connection
+        return connection
+
+    def add(self, id: str):
+        self._connection().execute("INSERT OR REPLACE INTO requested VALUES (?, ?)", (id, time.time()))
+
+    def since(self, timestamp: float) -> list[tuple[str, float]]:
+        """
+        Get the securities requested after a time, dropping those no longer kept fresh.
+
+        :param timestamp: Unix time.
+        :return: Pairs of the ID and the Unix time of the last request, least recently requested first.
+        """
+        connection = self._connection()
+        connection.execute("DELETE FROM requested WHERE requested_at <= ?", (time.time() - settings.SCHEDULER_RECENT_TTL,))
+        connection.execute(
+            "DELETE FROM requested WHERE id NOT IN (SELECT id FROM requested ORDER BY requested_at DESC LIMIT ?)",
+            (settings.SCHEDULER_RECENT_MAX,),
+        )
+        return connection.execute(
+            "SELECT id, requested_at FROM requested WHERE requested_at > ? ORDER BY requested_at", (timestamp,)
+        ).fetchall()
+
+    def close(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+
+class RefreshScheduler:
+    """
+    Background refresh of the watchlist and recently requested securities, so endpoints serve them from the cache.
+
+    Each job is rescheduled after it runs with a jittered interval, so refreshes do not synchronise.
+    Due jobs of recently requested securities run before those of the rest of the watchlist,
+    and every refresh waits for the outbound rate limit.
+
+    With a ``shared`` state, securities requested from the worker processes not running the scheduler
+    are recorded there, and picked up every ``SCHEDULER_SYNC_INTERVAL`` seconds by the one running it.
+    """
+
+    def __init__(self, concurrency: int = settings.SCHEDULER_CONCURRENCY, shared: SharedRequests | None = None):
+        self.concurrency = concurrency
+        self.shared = shared
+        self._watchlist = set()
+        # heap of (due time, sequence, job), a job being a tuple of its kind and arguments
+        self._timers = []
+        self._scheduled = set()
+        self._requested = {}
+        # Unix time of the last request picked up from the shared state
+        self._synced_at = 0.0
+        self._sequence = itertools.count()
+        self._ready = None
+        self._wake = None
+        self._tasks = []
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self, watchlist: list[str] = settings.WATCHLIST, fx: bool = settings.WATCHLIST_FX):
+        """
+        Start refreshing in the background, with every watchlist job due immediately.
+
+        :param watchlist: IDs of the securities to keep fresh.
+        :param fx: Whether to keep the exchange rate table fresh.
+        """
+        if self.running:
+            return
+        self._ready = asyncio.PriorityQueue()
+        self._wake = asyncio.Event()
+        self._watchlist = set(watchlist)
+        now = time.monotonic()
+        for id in watchlist:
+            for kind in WATCHLIST_JOBS:
+                self._schedule((kind, id), now)
+        if fx:
+            self._schedule(("fx", settings.FX_BASE_CURRENCY), now)
+        self._tasks = [asyncio.create_task(self._dispatch())]
+        self._tasks += [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+        if self.shared is not None:
+            self._tasks.append(asyncio.create_task(self._sync()))
+        logger.info(f"Started refresh scheduler for {len(watchlist)} securities{' and exchange rates' if fx else ''}.")
+
+    async def stop(self):
+        if not self.running:
+            return
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._timers = []
+        self._scheduled = set()
+        self._requested = {}
+        self._synced_at = 0.0
+        logger.info("Stopped refresh scheduler.")
+
+    def close(self):
+        if self.shared is not None:
+            self.shared.close()
+
+    def touch(self, id: str):
+        """
+        Mark a security as requested, keeping its prices fresh for ``SCHEDULER_RECENT_TTL`` seconds
+        and prioritising its refreshes. Only the ``SCHEDULER_RECENT_MAX`` most recently requested securities are kept.
+
+        :param id: The ID of the security.
+        """
+        if self.running:
+            self._touch(id, time.monotonic())
+        elif self.shared is not None:
+            # picked up by the worker running the scheduler, without blocking the event loop on sqlite
+            asyncio.get_running_loop().run_in_executor(None, self._share, id)
+
+    def _share(self, id: str):
+        try:
+            self.shared.add(id)
+        except Exception as e:
+            logger.warning(f"Failed to share the request of {id} with the scheduler: {e}")
+
+    def _touch(self, id: str, requested_at: float):
+        # most recently requested last
+        requested_at = max(requested_at, self._requested.pop(id, requested_at))
+        self._requested[id] = requested_at
+        while len(self._requested) > settings.SCHEDULER_RECENT_MAX:
+            # its jobs are dropped when they next run
+            del self._requested[next(iter(self._requested))]
+        for kind in RECENT_JOBS:
+            job = (kind, id)
+            # the caller is scraping it right now, so the first refresh is one interval away
+            if job not in self._scheduled:
+                self._schedule(job, time.monotonic() + self._interval(kind))
+
+    async def _sync(self):
+        """
+        Pick up the securities requested from the other worker processes.
+        """
+        while True:
+            try:
+                requested = await asyncio.to_thread(self.shared.since, self._synced_at)
+            except Exception as e:
+                logger.warning(f"Failed to read the shared requested securities: {e}")
+                requested = []
+            for id, requested_at in requested:
+                # from Unix time to this process's monotonic clock
+                self._touch(id, time.monotonic() - max(0.0, time.time() - requested_at))
+                self._synced_at = max(self._synced_at, requested_at)
+            await asyncio.sleep(settings.SCHEDULER_SYNC_INTERVAL)
+
+    def _is_recent(self, job: tuple) -> bool:
+        kind, *args = job
+        requested_at = self._requested.get(args[0]) if kind != "fx" else None
+        return requested_at is not None and time.monotonic() - requested_at < settings.SCHEDULER_RECENT_TTL
+
+    def _interval(self, kind: str) -> float:
+        interval = getattr(settings, REFRESHERS[kind][1])
+        return interval * random.uniform(1 - settings.SCHEDULER_JITTER, 1 + settings.SCHEDULER_JITTER)
+
+    def _schedule(self, job: tuple, due: float):
+        self._scheduled.add(job)
+        heapq.heappush(self._timers, (due, next(self._sequence), job))
+        if self._wake is not None:
+            self._wake.set()
+
+    def _reschedule(self, job: tuple):
+        kind, *args = job
+        if kind == "fx" or args[0] in self._watchlist or self._is_recent(job):
+            self._schedule(job, time.monotonic() + self._interval(kind))
+            return
+        # no longer requested
+        self._scheduled.discard(job)
+        if not any((other, args[0]) in self._scheduled for other in RECENT_JOBS):
+            self._requested.pop(args[0], None)
+
+    async def _dispatch(self):
+        """
+        Move due jobs to the ready queue, recently requested securities first.
+        """
+        while True:
+            now = time.monotonic()
+            while self._timers and self._timers[0][0] <= now:
+                due, sequence, job = heapq.heappop(self._timers)
+                priority = 0 if self._is_recent(job) else 1
+                self._ready.put_nowait((priority, due, sequence, job))
+            self._wake.clear()
+            timeout = self._timers[0][0] - now if self._timers else None
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _work(self):
+        while True:
+            *_, job = await self._ready.get()
+            kind, *args = job
+            try:
+                with background():
+                    await REFRESHERS[kind][0](*args)
+                scheduler_refreshes_total.inc(kind=kind, result="ok")
+            except Exception as e:
+                logger.warning(f"Background refresh of {kind} for {args} failed: {e!r}")
+                scheduler_refreshes_total.inc(kind=kind, result="error")
+            self._reschedule(job)
+
+
+scheduler = RefreshScheduler()
+scheduler_jobs.track(lambda: len(scheduler._scheduled))
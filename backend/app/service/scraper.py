@@ -1,29 +1,66 @@
-from playwright.sync_api import sync_playwright, TimeoutError
-from loguru import logger
 from app.core.config import settings
+from app.core.metrics import timed
+from app.service.browser_pool import (
+    browser_pool, async_browser_pool, block_requests, async_block_requests, goto, async_goto, EXECUTABLE_PATH, USER_AGENT
+)
 
-EXECUTABLE_PATH = "/usr/bin/chromium"
-
-def playwright_scrape(url: str, headless: bool = False, timeout: int = settings.PLAYWRIGHT_TIMEOUT) -> str:
+def playwright_scrape(url: str, headless: bool = False, timeout: int = settings.PLAYWRIGHT_TIMEOUT, wait_for: str | None = None) -> str:
     """
     Scrape the contents of a page using the Playwright Sync API.
+
+    Headless scrapes go through the shared browser pool, started on first use.
+    If ``wait_for`` is given, the page is returned as soon as the selector appears instead of at the load event.
+
+    :raises PageLoadError: If the page does not load in time or its server returned an error.
     """
+    if headless:
+        browser_pool.start()
+        return browser_pool.scrape(url, timeout=timeout, wait_for=wait_for)
+
+    from playwright.sync_api import sync_playwright
+
     with sync_playwright() as playwright:
-        if headless:
-            browser = playwright.chromium.launch(executable_path=EXECUTABLE_PATH, channel="chromium")
-        else:
+        with timed("launch"):
             browser = playwright.chromium.launch(executable_path=EXECUTABLE_PATH, headless=False)
-        context = browser.new_context(user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3")
-        page = context.new_page()
+            context = browser.new_context(user_agent=USER_AGENT)
+            block_requests(context)
+            page = context.new_page()
         try:
-            page.goto(url, timeout=timeout)
-            content = page.content() 
-        except TimeoutError:
-            # Ignore timeout errors and continue to the next step
-            content = page.content() 
-        except Exception as e:
-            # throw error for all other exceptions
-            raise e
+            goto(page, url, timeout, wait_for)
+            with timed("content"):
+                content = page.content()
         finally:
             browser.close()
-    return content
\ No newline at end of file
+    return content
+
+
+async def async_playwright_scrape(url: str, headless: bool = False, timeout: int = settings.PLAYWRIGHT_TIMEOUT, wait_for: str | None = None) -> str:
+    """
+    Scrape the contents of a page using the Playwright Async API.
+
+    Headless scrapes go through the shared async browser pool when it is running.
+    If ``wait_for`` is given, the page is returned as soon as the selector appears instead of at the load event.
+
+    :raises PageLoadError: If the page does not load in time or its server returned an error.
+    """
+    if headless and async_browser_pool.running:
+        return await async_browser_pool.scrape(url, timeout=timeout, wait_for=wait_for)
+
+    from playwright.async_api import async_playwright
+
+    async with async_playwright() as playwright:
+        with timed("launch"):
+            if headless:
+                browser = await playwright.chromium.launch(executable_path=EXECUTABLE_PATH, channel="chromium")
+            else:
+                browser = await playwright.chromium.launch(executable_path=EXECUTABLE_PATH, headless=False)
+            context = await browser.new_context(user_agent=USER_AGENT)
+            await async_block_requests(context)
+            page = await context.new_page()
+        try:
+            await async_goto(page, url, timeout, wait_for)
+            with timed("content"):
+                content = await page.content()
+        finally:
+            await browser.close()
+    return content
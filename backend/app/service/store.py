@@ -0,0 +1,219 @@
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+import numpy as np
+from loguru import logger
+
+from app.core.config import settings
+from app.db.db import MongoDb
+from app.service.history import COLUMNS, PriceHistory
+
+STATEMENT_COLUMNS = ("income", "shares")
+BALANCE_COLUMNS = ("assets", "liabilities", "book_value")
+EPOCH = np.datetime64("1970-01-01", "D")
+
+
+def _chunks(items: list, size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _to_columns(rows: dict[str, dict[str, int]], columns: tuple[str, ...]) -> dict[str, list]:
+    """
+    Convert rows keyed by period label, as returned by the scrapers, to one list per column.
+    """
+    periods = list(rows)
+    return {"periods": periods, **{name: [rows[period].get(name) for period in periods] for name in columns}}
+
+
+def _to_rows(section: dict[str, list], columns: tuple[str, ...]) -> dict[str, dict[str, int]]:
+    return {
+        period: {name: section[name][i] for name in columns}
+        for i, period in enumerate(section["periods"])
+    }
+
+
+class FundamentalsStore:
+    """
+    Financials and price histories of many securities in MongoDB, in a compact columnar layout.
+
+    Financials are one document per security, with each section stored as a list of periods and one list per value.
+    Price histories are one document per security and year, with the dates and each OHLCV column stored as lists.
+    Reads and writes of many securities are batched, so a screen over thousands of securities
+    takes a few round trips rather than one per security.
+    """
+
+    def __init__(self, db_name: str = settings.STORE_MONGO_DB, batch_size: int = settings.STORE_BATCH_SIZE):
+        self.fundamentals = MongoDb(db_name, "fundamentals")
+        self.prices = MongoDb(db_name, "prices")
+        self.batch_size = batch_size
+        self._connected = False
+        # what was last written per ID, so data served from the cache is not written again,
+        # least recently saved first and at most STORE_SAVED_MAX, as forgetting an ID only costs a rewrite
+        self._saved_financials = OrderedDict()
+        # fetch time and last date of each price history
+        self._saved_prices = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if not self._connected:
+            from pymongo import ASCENDING
+
+            self.fundamentals.connect()
+            self.prices.connect()
+            self.prices.collection.create_index([("ticker", ASCENDING), ("period", ASCENDING)], unique=True)
+            self._connected = True
+
+    def _remember(self, saved: OrderedDict, entries: dict):
+        # unchanged entries are remembered again too, as the most recently saved
+        with self._lock:
+            for id, entry in entries.items():
+                saved[id] = entry
+                saved.move_to_end(id)
+            while len(saved) > settings.STORE_SAVED_MAX:
+                saved.popitem(last=False)
+
+    def save_fundamentals(self, records: dict[str, dict]) -> int:
+        """
+        Save the financials of many securities, replacing the sections they include.
+
+        :param records: Financials by ID, as returned by the financials endpoint.
+        :return: The number of securities written.
+        """
+        from pymongo import UpdateOne
+
+        to_write = {id: financials for id, financials in records.items() if self._saved_financials.get(id) != financials}
+        if not to_write:
+            self._remember(self._saved_financials, records)
+            return 0
+        self._connect()
+        now = datetime.now(timezone.utc)
+        operations = []
+        for id, financials in to_write.items():
+            fields = {"ticker": id, "updated_at": now}
+            statement = financials.get("financial_statement")
+            if statement:
+                fields["currency"] = statement.get("financials_currency", "")
+                fields["statement"] = _to_columns(statement.get("financials", {}), STATEMENT_COLUMNS)
+            balance = financials.get("balance_sheet")
+            if balance:
+                fields["balance"] = _to_columns(balance, BALANCE_COLUMNS)
+            operations.append(UpdateOne({"_id": id}, {"$set": fields}, upsert=True))
+
+        written = 0
+        for chunk in _chunks(operations, self.batch_size):
+            result = self.fundamentals.collection.bulk_write(chunk, ordered=False)
+            written += result.upserted_count + result.matched_count
+        self._remember(self._saved_financials, records)
+        logger.debug(f"Saved financials of {written} securities.")
+        return written
+
+    def load_fundamentals(self, ids: list[str]) -> dict[str, dict]:
+        """
+        Load the financials of many securities.
+
+        :param ids: The IDs of the securities.
+        :return: Financials by ID in the shape of the financials endpoint, omitting securities not stored.
+        """
+        self._connect()
+        results = {}
+        for chunk in _chunks(list(dict.fromkeys(ids)), self.batch_size):
+            # a single batch for the whole chunk, rather than the default of 101 documents
+            cursor = self.fundamentals.collection.find({"_id": {"$in": chunk}}).batch_size(len(chunk))
+            for doc in cursor:
+                financials = {}
+                if "statement" in doc:
+                    financials["financial_statement"] = {
+                        "financials_currency": doc.get("currency", ""),
+                        "financials": _to_rows(doc["statement"], STATEMENT_COLUMNS),
+                    }
+                if "balance" in doc:
+                    financials["balance_sheet"] = _to_rows(doc["balance"], BALANCE_COLUMNS)
+                results[doc["_id"]] = financials
+        return results
+
+    def save_prices(self, histories: dict[str, PriceHistory]) -> int:
+        """
+        Save the price histories of many securities, replacing the years they cover.
+
+        Only the years from the last bar written before are written again for a history saved earlier,
+        as an update only replaces bars from that one on, see ``PriceHistory.append``.
+
+        :param histories: Price histories by ID.
+        :return: The number of yearly documents written.
+        """
+        from pymongo import ReplaceOne
+
+        saved = {id: (history.fetched_at, history.last_date) for id, history in histories.items()}
+        to_write = {
+            id: history for id, history in histories.items()
+            if self._saved_prices.get(id, (None,))[0] != history.fetched_at
+        }
+        if not to_write:
+            self._remember(self._saved_prices, saved)
+            return 0
+        self._connect()
+        now = datetime.now(timezone.utc)
+        operations = []
+        for id, history in to_write.items():
+            years = history.dates.astype("datetime64[Y]").astype(int) + 1970
+            _, saved_last_date = self._saved_prices.get(id, (None, None))
+            changed = years if saved_last_date is None else years[history.dates >= saved_last_date]
+            for year in np.unique(changed):
+                mask = years == year
+                doc = {
+                    "ticker": id,
+                    "period": int(year),
+                    # days since the epoch, more compact than dates
+                    "dates": (history.dates[mask] - EPOCH).astype(int).tolist(),
+                    **{name: values[mask].tolist() for name, values in history.columns.items()},
+                    "updated_at": now,
+                }
+                operations.append(ReplaceOne({"_id": f"{id}:{year}"}, doc, upsert=True))
+
+        written = 0
+        for chunk in _chunks(operations, self.batch_size):
+            result = self.prices.collection.bulk_write(chunk, ordered=False)
+            written += result.upserted_count + result.matched_count
+        self._remember(self._saved_prices, saved)
+        logger.debug(f"Saved {written} yearly price series of {len(to_write)} securities.")
+        return written
+
+    def load_prices(self, ids: list[str], since: str | None = None, columns: tuple[str, ...] = COLUMNS) -> dict[str, PriceHistory]:
+        """
+        Load the price histories of many securities.
+
+        :param ids: The IDs of the securities.
+        :param since: ISO date of the first bar to load, defaults to the whole history.
+        :param columns: Columns to load, the others are filled with NaN.
+        :return: Price histories by ID, omitting securities not stored.
+        """
+        self._connect()
+        start = np.datetime64(since, "D") if since else None
+        query = {} if start is None else {"period": {"$gte": int(start.astype("datetime64[Y]").astype(int)) + 1970}}
+        projection = {"ticker": 1, "dates": 1, **{name: 1 for name in columns}}
+        docs = {}
+        for chunk in _chunks(list(dict.fromkeys(ids)), self.batch_size):
+            cursor = self.prices.collection.find({"ticker": {"$in": chunk}, **query}, projection).sort([("ticker", 1), ("period", 1)])
+            for doc in cursor.batch_size(self.batch_size):
+                docs.setdefault(doc["ticker"], []).append(doc)
+
+        results = {}
+        for id, years in docs.items():
+            days = np.concatenate([np.asarray(doc["dates"], dtype=np.int64) for doc in years])
+            history_dates = EPOCH + days.astype("timedelta64[D]")
+            mask = history_dates >= start if start is not None else slice(None)
+            history_columns = {
+                name: np.concatenate([np.asarray(doc.get(name, [np.nan] * len(doc["dates"])), dtype=np.float64) for doc in years])[mask]
+                for name in COLUMNS
+            }
+            results[id] = PriceHistory(history_dates[mask], history_columns)
+        return results
+
+    def close(self):
+        self.fundamentals.close()
+        self.prices.close()
+        self._connected = False
+
+
+store = FundamentalsStore()
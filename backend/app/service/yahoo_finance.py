@@ -1,18 +1,77 @@
+import asyncio
 import re
+from typing import TYPE_CHECKING
 from loguru import logger
-import bs4
 
-from app.service.scraper import playwright_scrape
+from app.core.config import settings
+from app.core.metrics import timed
+from app.service.cache import cached
+from app.service.fetch import fetch_page, async_fetch_page
+from app.service.offload import run_cpu_bound
+from app.service.parsing import make_soup, selector
+
+if TYPE_CHECKING:
+    import bs4
 
 ROOT_YAHOO_URL = "https://sg.finance.yahoo.com/quote"
 
+# patterns that must be present in a page for its parser to succeed
+OVERVIEW_FIELDS = [r"<h1[^>]*>[^<]*\(", r"class=\"[^\"]*\bexchange\b"]
+HISTORY_FIELDS = [r"<table", r"<tbody[^>]*>\s*<tr"]
+# an update of a stored history may have no rows, e.g. over a weekend
+HISTORY_UPDATE_FIELDS = [r"<table", r"<tbody"]
+FINANCIALS_FIELDS = [r"class=\"[^\"]*\btableHeader\b", r"Diluted average shares"]
+BALANCE_FIELDS = [r"class=\"[^\"]*\btableHeader\b", r"Total assets", r"Total liabilities net minority interest", r"Tangible book value"]
+
+# selectors signalling that a rendered page contains its data
+OVERVIEW_SELECTOR = "span.exchange"
+HISTORY_SELECTOR = "table tbody tr"
+HISTORY_UPDATE_SELECTOR = "table tbody"
+FINANCIALS_SELECTOR = "div.tableHeader"
+
+# only build the parts of each page the extractors read, skipping the head and the large inline scripts
+MAIN_STRAINER = ("h1", "div", "span")
+QUOTE_STRAINER = (*MAIN_STRAINER, "fin-streamer")
+HISTORY_STRAINER = ("table",)
+FINANCIALS_STRAINER = ("div", "span")
+
+# extractors, compiled once on first use
+EXCHANGE_SELECTOR = "span.exchange"
+TABLE_HEADER_SELECTOR = "div.tableHeader"
+QUOTE_PRICE_SELECTOR = '[data-testid="qsp-price"], fin-streamer[data-field="regularMarketPrice"]'
+CURRENCY_PATTERN = re.compile("Currency in .*")
+
 
+@cached("overview")
 def scrape_main(id: str) -> dict[str, str]:
     """
     Scrape the main page.
     """
-    content = playwright_scrape(f"{ROOT_YAHOO_URL}/{id}", headless=True)
-    soup = bs4.BeautifulSoup(content, "html.parser")
+    content = fetch_page(f"{ROOT_YAHOO_URL}/{id}", "yahoo:overview", OVERVIEW_FIELDS, wait_for=OVERVIEW_SELECTOR)
+    return _parse_main(content, id)
+
+
+@cached("overview")
+async def async_scrape_main(id: str) -> dict[str, str]:
+    """
+    Scrape the main page using the Playwright Async API.
+    """
+    content = await async_fetch_page(f"{ROOT_YAHOO_URL}/{id}", "yahoo:overview", OVERVIEW_FIELDS, wait_for=OVERVIEW_SELECTOR)
+    return await run_cpu_bound(_parse_main, content, id)
+
+
+@timed("extract_overview")
+def _parse_main(content: str, id: str) -> dict[str, str]:
+    """
+    Parse the name, sector and currency from the main page.
+    """
+    return _extract_main(make_soup(content, MAIN_STRAINER), id)
+
+
+def _extract_main(soup: "bs4.BeautifulSoup", id: str) -> dict[str, str]:
+    """
+    Extract the name, sector and currency from the parsed main page.
+    """
     results = {"sector": "", "exchange_currency": "", "name": ""}
 
     # scrape name
@@ -44,7 +103,7 @@ def scrape_main(id: str) -> dict[str, str]:
         results["sector"] = siblings[0].get_text(strip=True)
     
     # scrape currency information
-    currency_element_parent = soup.find("span", attrs={"class": "exchange"})
+    currency_element_parent = selector(EXCHANGE_SELECTOR).select_one(soup)
     if not currency_element_parent:
         logger.error(f"No currency information found for {id}.")
     else:
@@ -57,12 +116,91 @@ def scrape_main(id: str) -> dict[str, str]:
     return results
 
 
+@cached("quote")
+def scrape_quote(id: str) -> dict[str, str | float]:
+    """
+    Scrape the name, sector, currency and latest price from a single load of the main page.
+
+    The history page is only loaded if the main page has no price.
+    """
+    content = fetch_page(f"{ROOT_YAHOO_URL}/{id}", "yahoo:quote", _quote_fields(id), wait_for=OVERVIEW_SELECTOR)
+    results = _parse_quote(content, id)
+    if results["price"] <= 0:
+        logger.warning(f"No price found in main page for {id}, falling back to the history page.")
+        results["price"] = scrape_price(id)
+    return results
+
+
+@cached("quote")
+async def async_scrape_quote(id: str) -> dict[str, str | float]:
+    """
+    Scrape the name, sector, currency and latest price from a single load of the main page
+    using the Playwright Async API.
+
+    The history page is only loaded if the main page has no price.
+    """
+    content = await async_fetch_page(f"{ROOT_YAHOO_URL}/{id}", "yahoo:quote", _quote_fields(id), wait_for=OVERVIEW_SELECTOR)
+    results = await run_cpu_bound(_parse_quote, content, id)
+    if results["price"] <= 0:
+        logger.warning(f"No price found in main page for {id}, falling back to the history page.")
+        results["price"] = await async_scrape_price(id)
+    return results
+
+
+def _quote_fields(id: str) -> list[str]:
+    # the prices of related securities are streamed with the same field
+    symbol = re.escape(id)
+    price = rf"data-testid=\"qsp-price\"|<fin-streamer(?=[^>]*data-symbol=\"{symbol}\")(?=[^>]*data-field=\"regularMarketPrice\")"
+    return [*OVERVIEW_FIELDS, price]
+
+
+@timed("extract_quote")
+def _parse_quote(content: str, id: str) -> dict[str, str | float]:
+    """
+    Parse the overview fields and the latest price from the main page.
+    """
+    soup = make_soup(content, QUOTE_STRAINER)
+    results = _extract_main(soup, id)
+    results["price"] = -1
+
+    for element in selector(QUOTE_PRICE_SELECTOR).select(soup):
+        # the page also streams prices of related securities
+        if element.get("data-symbol", id) != id:
+            continue
+        value = element.get("data-value") or element.get_text(strip=True)
+        try:
+            results["price"] = float(value.replace(",", ""))
+        except ValueError as e:
+            logger.error(f"Error converting quote price to float for {id}: {e}")
+            continue
+        break
+    return results
+
+
+@cached("price")
 def scrape_price(id: str) -> float:
     """
     Scrape the price page.
     """
-    content = playwright_scrape(f"{ROOT_YAHOO_URL}/{id}/history", headless=True)
-    soup = bs4.BeautifulSoup(content, "html.parser")
+    content = fetch_page(f"{ROOT_YAHOO_URL}/{id}/history", "yahoo:history", HISTORY_FIELDS, wait_for=HISTORY_SELECTOR)
+    return _parse_price(content, id)
+
+
+@cached("price")
+async def async_scrape_price(id: str) -> float:
+    """
+    Scrape the price page using the Playwright Async API.
+    """
+    content = await async_fetch_page(f"{ROOT_YAHOO_URL}/{id}/history", "yahoo:history", HISTORY_FIELDS, wait_for=HISTORY_SELECTOR)
+    return await run_cpu_bound(_parse_price, content, id)
+
+
+@timed("extract_price")
+def _parse_price(content: str, id: str) -> float:
+    """
+    Parse the latest close price from the history page.
+    """
+    soup = make_soup(content, HISTORY_STRAINER)
     tables = soup.find_all("table")
     if not tables:
         logger.error(f"No table found in page for {id}.")
@@ -106,18 +244,36 @@ def scrape_price(id: str) -> float:
     return price
 
 
+@cached("financials")
 def scrape_financial_statement(id: str) -> dict[str, dict[str, int]]:
     """
     Scrape the financial statement page.
     """
-    content = playwright_scrape(f"{ROOT_YAHOO_URL}/{id}/financials", headless=True)
-    soup = bs4.BeautifulSoup(content, "html.parser")
+    content = fetch_page(f"{ROOT_YAHOO_URL}/{id}/financials", "yahoo:financials", FINANCIALS_FIELDS, wait_for=FINANCIALS_SELECTOR)
+    return _parse_financial_statement(content, id)
+
+
+@cached("financials")
+async def async_scrape_financial_statement(id: str) -> dict[str, dict[str, int]]:
+    """
+    Scrape the financial statement page using the Playwright Async API.
+    """
+    content = await async_fetch_page(f"{ROOT_YAHOO_URL}/{id}/financials", "yahoo:financials", FINANCIALS_FIELDS, wait_for=FINANCIALS_SELECTOR)
+    return await run_cpu_bound(_parse_financial_statement, content, id)
+
+
+@timed("extract_financials")
+def _parse_financial_statement(content: str, id: str) -> dict[str, dict[str, int]]:
+    """
+    Parse the income and shares data from the financial statement page.
+    """
+    soup = make_soup(content, FINANCIALS_STRAINER)
 
-    def parse_financials_table(soup: bs4.BeautifulSoup) -> dict[str, int]:
+    def parse_financials_table(soup: "bs4.BeautifulSoup") -> dict[str, int]:
         """
         Parse a financials table and return a dictionary of financial data.
         """
-        header_div = soup.find("div", attrs={"class": "tableHeader"})
+        header_div = selector(TABLE_HEADER_SELECTOR).select_one(soup)
         if not header_div:
             logger.error(f"No header div found in financials page for {id}.")
             return {}
@@ -165,11 +321,11 @@ def scrape_financial_statement(id: str) -> dict[str, dict[str, int]]:
                 }
         return results
 
-    def parse_currency(soup: bs4.BeautifulSoup) -> str:
+    def parse_currency(soup: "bs4.BeautifulSoup") -> str:
         """
         Parse the currency from the financials page.
         """
-        currency_span = soup.find("span", string=re.compile("Currency in .*"))
+        currency_span = soup.find("span", string=CURRENCY_PATTERN)
         if not currency_span:
             logger.error(f"No currency information found in financials page for {id}.")
             return ""
@@ -181,14 +337,32 @@ def scrape_financial_statement(id: str) -> dict[str, dict[str, int]]:
     return {"financials_currency": parse_currency(soup), "financials": parse_financials_table(soup)}
 
 
+@cached("financials")
 def scrape_balance(id: str) -> dict[str, dict[str, int]]:
     """
     Scrape the balance sheet page.
     """
-    content = playwright_scrape(f"{ROOT_YAHOO_URL}/{id}/balance-sheet", headless=True)
-    soup = bs4.BeautifulSoup(content, "html.parser")
+    content = fetch_page(f"{ROOT_YAHOO_URL}/{id}/balance-sheet", "yahoo:balance-sheet", BALANCE_FIELDS, wait_for=FINANCIALS_SELECTOR)
+    return _parse_balance(content, id)
+
+
+@cached("financials")
+async def async_scrape_balance(id: str) -> dict[str, dict[str, int]]:
+    """
+    Scrape the balance sheet page using the Playwright Async API.
+    """
+    content = await async_fetch_page(f"{ROOT_YAHOO_URL}/{id}/balance-sheet", "yahoo:balance-sheet", BALANCE_FIELDS, wait_for=FINANCIALS_SELECTOR)
+    return await run_cpu_bound(_parse_balance, content, id)
+
+
+@timed("extract_balance")
+def _parse_balance(content: str, id: str) -> dict[str, dict[str, int]]:
+    """
+    Parse the assets, liabilities and book value from the balance sheet page.
+    """
+    soup = make_soup(content, FINANCIALS_STRAINER)
     
-    header_div = soup.find("div", attrs={"class": "tableHeader"})
+    header_div = selector(TABLE_HEADER_SELECTOR).select_one(soup)
     headers = [div.get_text(strip=True) for div in header_div.find("div").find_all("div")]
     if len(headers) < 2:
         logger.error(f"Not enough headers found in balance sheet page for {id}.")
@@ -225,4 +399,38 @@ def scrape_balance(id: str) -> dict[str, dict[str, int]]:
             logger.error(f"Error converting balance sheet data to float for {h} in {id}: {e}")
             continue
     
-    return results
\ No newline at end of file
+    return results
+
+
+# sections of the financials endpoint, scraped concurrently
+FINANCIAL_SECTIONS = {
+    "financial_statement": async_scrape_financial_statement,
+    "balance_sheet": async_scrape_balance,
+}
+
+
+async def async_scrape_financials(id: str, timeout: float = settings.FINANCIALS_SECTION_TIMEOUT) -> tuple[dict, dict[str, Exception]]:
+    """
+    Scrape all financial sections concurrently, each with its own timeout.
+
+    :param id: The ID of the security.
+    :param timeout: Timeout for each section in seconds.
+    :return: Tuple of the sections that succeeded and the errors of those that failed.
+    """
+    async def scrape_section(name: str):
+        try:
+            return await asyncio.wait_for(FINANCIAL_SECTIONS[name](id), timeout=timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"Scraping {name} for {id} timed out after {timeout}s.")
+
+    names = list(FINANCIAL_SECTIONS)
+    outcomes = await asyncio.gather(*(scrape_section(name) for name in names), return_exceptions=True)
+
+    results, errors = {}, {}
+    for name, outcome in zip(names, outcomes):
+        if isinstance(outcome, Exception):
+            logger.error(f"Failed to scrape {name} for {id}: {outcome!r}")
+            errors[name] = outcome
+        else:
+            results[name] = outcome
+    return results, errors
@@ -0,0 +1,180 @@
+"""
+Benchmark end-to-end extraction throughput per page type on a recorded corpus, and check the results are unchanged.
+
+Each recorded page is replayed through the scrapers with caching bypassed, so the fetch from the corpus,
+parsing and extraction are all measured. Results are compared to ``expected.json`` in the corpus directory,
+and the run exits with a non-zero status if any changed.
+
+The committed corpus in ``benchmarks/corpus`` is built from the fixtures in ``benchmarks/fixtures``, so the check
+runs offline, and ``tests/test_extraction.py`` runs it with the test suite. Corpora recorded from the live sites
+are kept per deployment, in ``SCRAPE_CORPUS_DIR`` by default.
+
+Usage (from the backend directory):
+    # rebuild the committed corpus after changing the fixtures, then accept the results as the expected ones
+    python -m benchmarks.bench_extraction --from-fixtures benchmarks/fixtures --update
+    # record pages from the live sites into another corpus
+    python -m benchmarks.bench_extraction --corpus corpus --record AAPL D05.SI --record-fx
+    # benchmark and check the results
+    python -m benchmarks.bench_extraction [--corpus DIR] [--repeat N] [--update]
+"""
+import argparse
+import json
+import re
+import timeit
+from pathlib import Path
+from loguru import logger
+
+from app.core.config import settings
+from app.service import history
+from app.service.corpus import corpus, RECORD, REPLAY
+from app.service.exchange_rate import ROOT_EXCHANGE_URL, get_rate_table, scrape_calculator_rate, _rate_table_url
+from app.service.yahoo_finance import (
+    ROOT_YAHOO_URL, scrape_main, scrape_quote, scrape_price, scrape_financial_statement, scrape_balance
+)
+
+CORPUS_DIR = Path(__file__).parent / "corpus"
+EXPECTED_FILE = "expected.json"
+
+
+def _get_history(id: str) -> dict:
+    # drop the stored series so the page is fetched and parsed again
+    history._histories.pop(id, None)
+    return history.get_history(id).to_dict()
+
+
+def _get_rate_table(base: str) -> dict:
+    # the time of the scrape changes on every run
+    table = get_rate_table.__wrapped__(base)
+    return {key: value for key, value in table.items() if key != "timestamp"}
+
+
+# URL pattern -> extractions run on its pages, as (page type, function taking the arguments parsed from the URL)
+EXTRACTIONS = {
+    "yahoo:overview": [("overview", scrape_main.__wrapped__), ("quote", scrape_quote.__wrapped__)],
+    # the same page, recorded under the pattern of whichever was scraped first
+    "yahoo:quote": [("overview", scrape_main.__wrapped__), ("quote", scrape_quote.__wrapped__)],
+    "yahoo:history": [("price", scrape_price.__wrapped__), ("history", _get_history)],
+    "yahoo:financials": [("financials", scrape_financial_statement.__wrapped__)],
+    "yahoo:balance-sheet": [("balance", scrape_balance.__wrapped__)],
+    "x-rates:calculator": [("fx", scrape_calculator_rate.__wrapped__)],
+    "x-rates:table": [("fxtable", _get_rate_table)],
+}
+SECURITY_URL = re.compile(r"/quote/([^/?]+)")
+CURRENCY_URL = re.compile(r"from=(\w+)(?:&to=(\w+))?")
+
+
+# fixture page type -> (URL pattern, function building the URL from the arguments in the fixture name)
+FIXTURE_URLS = {
+    "overview": ("yahoo:overview", lambda id: f"{ROOT_YAHOO_URL}/{id}"),
+    "history": ("yahoo:history", lambda id: f"{ROOT_YAHOO_URL}/{id}/history"),
+    "financials": ("yahoo:financials", lambda id: f"{ROOT_YAHOO_URL}/{id}/financials"),
+    "balance": ("yahoo:balance-sheet", lambda id: f"{ROOT_YAHOO_URL}/{id}/balance-sheet"),
+    "fx": ("x-rates:calculator", lambda curr1, curr2: f"{ROOT_EXCHANGE_URL}/?from={curr1}&to={curr2}&amount=1"),
+    "fxtable": ("x-rates:table", _rate_table_url),
+}
+
+
+def _url_args(pattern: str, url: str) -> tuple[str, ...]:
+    if pattern.startswith("yahoo:"):
+        return (SECURITY_URL.search(url).group(1),)
+    return tuple(group for group in CURRENCY_URL.search(url).groups() if group)
+
+
+def record(ids: list[str], fx: bool):
+    """
+    Scrape every page type of the given securities, and optionally the exchange rate table, into the corpus.
+    """
+    settings.SCRAPE_MODE = RECORD
+    for id in ids:
+        # together these load every page type of a security
+        for scrape in (scrape_main, scrape_price, scrape_financial_statement, scrape_balance):
+            print(f"Recording {scrape.__name__} for {id}")
+            scrape.__wrapped__(id)
+    if fx:
+        print(f"Recording the exchange rate table for {settings.FX_BASE_CURRENCY}")
+        _get_rate_table(settings.FX_BASE_CURRENCY)
+
+
+def build_from_fixtures(fixtures_dir: Path):
+    """
+    Save fixture pages into the corpus under the URLs the scrapers fetch them from.
+
+    :param fixtures_dir: Directory of pages named ``<page type>-<args>.html``, e.g. ``fx-USD-SGD.html``.
+    """
+    for path in sorted(fixtures_dir.glob("*.html")):
+        page_type, *args = path.stem.split("-")
+        if page_type not in FIXTURE_URLS:
+            continue
+        pattern, url = FIXTURE_URLS[page_type]
+        print(f"Saving {path.name} as {pattern}")
+        corpus.save(url(*args), pattern, path.read_text(encoding="utf-8"))
+
+
+def benchmark(repeat: int) -> tuple[dict[str, list[float]], dict[str, object]]:
+    """
+    Replay every recorded page through its extractions.
+
+    :return: The best time of each extraction in seconds by page type, and the result of each extraction.
+    """
+    settings.SCRAPE_MODE = REPLAY
+    timings, results = {}, {}
+    for entry in corpus.entries():
+        if entry["pattern"] not in EXTRACTIONS:
+            continue
+        args = _url_args(entry["pattern"], entry["url"])
+        for page_type, extract in EXTRACTIONS[entry["pattern"]]:
+            results[":".join([page_type, *args])] = extract(*args)
+            best = min(timeit.repeat(lambda: extract(*args), number=1, repeat=repeat))
+            timings.setdefault(page_type, []).append(best)
+    return timings, results
+
+
+def _normalise(results: dict) -> dict:
+    # compare results the way they are stored, e.g. tuples as lists
+    return json.loads(json.dumps(results, sort_keys=True, default=str))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=CORPUS_DIR, type=Path)
+    parser.add_argument("--repeat", default=10, type=int)
+    parser.add_argument("--update", action="store_true", help="save the current results as the expected ones")
+    parser.add_argument("--record", nargs="+", default=[], metavar="ID", help="record the pages of these securities first")
+    parser.add_argument("--record-fx", action="store_true", help="record the exchange rate table first")
+    parser.add_argument("--from-fixtures", type=Path, metavar="DIR", help="save these fixture pages into the corpus first")
+    args = parser.parse_args()
+
+    corpus.root = args.corpus
+    if args.from_fixtures:
+        build_from_fixtures(args.from_fixtures)
+    if args.record or args.record_fx:
+        record(args.record, args.record_fx)
+
+    logger.remove()
+    timings, results = benchmark(args.repeat)
+    if not timings:
+        raise SystemExit(f"No recorded pages found in {args.corpus}.")
+
+    print(f"{'page type':<14}{'pages':>7}{'mean (ms)':>12}{'pages/s':>10}")
+    for page_type, times in timings.items():
+        mean = sum(times) / len(times)
+        print(f"{page_type:<14}{len(times):>7}{mean * 1000:>12.2f}{1 / mean:>10.0f}")
+
+    results = _normalise(results)
+    expected_path = args.corpus / EXPECTED_FILE
+    if args.update or not expected_path.exists():
+        expected_path.write_text(json.dumps(results, indent=2, sort_keys=True))
+        print(f"Saved {len(results)} expected results to {expected_path}.")
+        return
+
+    expected = json.loads(expected_path.read_text())
+    changed = sorted(key for key in results.keys() | expected.keys() if results.get(key) != expected.get(key))
+    for key in changed:
+        print(f"Changed result for {key}: expected {expected.get(key)!r}, got {results.get(key)!r}")
+    if changed:
+        raise SystemExit(1)
+    print(f"All {len(results)} results match {expected_path}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+Benchmark the vectorised indicator engine on a synthetic tickers x bars price matrix.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_indicators [--tickers 1000] [--bars 10000]
+"""
+import argparse
+import time
+import numpy as np
+
+from app.service.calculations import INDICATORS, compute_indicators, IndicatorState
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickers", default=1000, type=int)
+    parser.add_argument("--bars", default=10000, type=int)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (args.tickers, args.bars)), axis=-1))
+    high = close * (1 + rng.uniform(0, 0.01, close.shape))
+    low = close * (1 - rng.uniform(0, 0.01, close.shape))
+    print(f"{args.tickers} tickers x {args.bars} bars")
+
+    total = 0.0
+    for name in INDICATORS:
+        start = time.perf_counter()
+        compute_indicators(close, high, low, (name,))
+        elapsed = time.perf_counter() - start
+        total += elapsed
+        print(f"{name:<12}{elapsed * 1000:>10.1f} ms")
+    print(f"{'total':<12}{total * 1000:>10.1f} ms")
+
+    state = IndicatorState(close[:, :-1], high[:, :-1], low[:, :-1])
+    start = time.perf_counter()
+    state.update(close[:, -1], high[:, -1], low[:, -1])
+    print(f"{'update':<12}{(time.perf_counter() - start) * 1000:>10.3f} ms for one new bar per ticker")
+
+
+if __name__ == "__main__":
+    main()
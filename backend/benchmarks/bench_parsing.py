@@ -0,0 +1,79 @@
+"""
+Benchmark HTML parse time per page type on saved fixture pages.
+
+Fixtures are named ``<page type>-<args>.html``, for example ``overview-AAPL.html``,
+``history-AAPL.html``, ``financials-AAPL.html``, ``balance-AAPL.html``, ``fx-USD-SGD.html`` or ``fxtable-USD.html``.
+The committed fixtures are generated rather than saved from Yahoo: the markup the extractors read, within a page
+of similar size and structure (navigation, a news stream and inline hydration data). Pages saved from a browser,
+or recorded with ``bench_extraction --record``, can be used instead by passing their directory.
+
+"before" is a full html.parser tree, "after" the configured parser building only the tags the extractor reads,
+and "extract" the whole extractor, i.e. "after" plus reading the values from the tree. On the committed fixtures
+"after" takes around a quarter to a third of "before", and extraction adds little on top of the parse, so "after"
+and "extract" can swap places within the noise of a shared machine. Run the script for the numbers of a machine
+rather than relying on published ones.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_parsing [fixtures_dir] [--repeat N]
+"""
+import argparse
+import timeit
+from pathlib import Path
+import bs4
+from loguru import logger
+
+from app.service import yahoo_finance, exchange_rate
+from app.service.parsing import make_soup
+
+# page type -> (extractor, tags kept by the extractor)
+PAGE_TYPES = {
+    "overview": (yahoo_finance._parse_main, yahoo_finance.MAIN_STRAINER),
+    "history": (yahoo_finance._parse_price, yahoo_finance.HISTORY_STRAINER),
+    "financials": (yahoo_finance._parse_financial_statement, yahoo_finance.FINANCIALS_STRAINER),
+    "balance": (yahoo_finance._parse_balance, yahoo_finance.FINANCIALS_STRAINER),
+    "fx": (exchange_rate._parse_exchange_rate, exchange_rate.CALCULATOR_STRAINER),
+    "fxtable": (exchange_rate._parse_rate_table, exchange_rate.RATE_TABLE_STRAINER),
+}
+
+
+def _time(funcs: list, repeat: int) -> list[float]:
+    """
+    Get the best time of each function call in milliseconds.
+
+    The calls are interleaved, so a slow period of the machine affects all of them rather than one.
+    """
+    best = [float("inf")] * len(funcs)
+    for _ in range(repeat):
+        for i, func in enumerate(funcs):
+            best[i] = min(best[i], timeit.timeit(func, number=1))
+    return [time * 1000 for time in best]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("fixtures_dir", nargs="?", default=Path(__file__).parent / "fixtures", type=Path)
+    parser.add_argument("--repeat", default=20, type=int)
+    args = parser.parse_args()
+
+    logger.remove()
+    fixtures = sorted(args.fixtures_dir.glob("*.html"))
+    if not fixtures:
+        raise SystemExit(f"No fixture pages found in {args.fixtures_dir}.")
+
+    print(f"{'fixture':<28}{'size (kB)':>10}{'before (ms)':>14}{'after (ms)':>13}{'extract (ms)':>15}")
+    for path in fixtures:
+        page_type, *page_args = path.stem.split("-")
+        if page_type not in PAGE_TYPES:
+            continue
+        extractor, strainer = PAGE_TYPES[page_type]
+        content = path.read_text()
+        before, after, extract = _time([
+            lambda: bs4.BeautifulSoup(content, "html.parser"),
+            lambda: make_soup(content, strainer),
+            lambda: extractor(content, *page_args),
+        ], args.repeat)
+        print(f"{path.name:<28}{len(content) / 1000:>10.0f}{before:>14.2f}{after:>13.2f}{extract:>15.2f}")
+
+
+if __name__ == "__main__":
+    main()
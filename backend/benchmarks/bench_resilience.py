@@ -0,0 +1,113 @@
+"""
+Exercise the circuit breaker, adaptive timeouts and retry budget of the fetch layer against a local stub upstream.
+
+The stub serves a healthy page, then degrades to slow or failing responses, then recovers.
+For each phase the run reports how many fetches completed, failed or failed fast without contacting the stub,
+and their latency, showing that a degraded upstream is given up on quickly instead of holding every fetch
+for the full timeout.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_resilience [--degrade slow|fail] [--fetches 40] [--delay 5] [--timeout 3000]
+"""
+import argparse
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from loguru import logger
+
+from app.core.config import settings
+from app.service.fetch import fetch_page
+from app.service.resilience import CircuitOpenError, upstream_for
+
+PATTERN = "stub:page"
+REQUIRED = ["STUB-OK"]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # "ok", "slow" or "fail", switched between phases
+    mode = "ok"
+    delay = 5.0
+
+    def do_GET(self):
+        if self.mode == "fail":
+            self.send_error(500)
+            return
+        if self.mode == "slow":
+            time.sleep(self.delay)
+        body = b"<html><body>STUB-OK</body></html>"
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # the client gave up waiting
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run_phase(name: str, url: str, fetches: int, timeout: int):
+    """
+    Fetch the stub page repeatedly and print the outcomes.
+    """
+    complete = failed = fail_fast = 0
+    latencies = []
+    for _ in range(fetches):
+        start = time.perf_counter()
+        try:
+            content = fetch_page(url, PATTERN, REQUIRED, timeout=timeout)
+            if REQUIRED[0] in content:
+                complete += 1
+            else:
+                failed += 1
+        except CircuitOpenError:
+            fail_fast += 1
+        except Exception:
+            failed += 1
+        latencies.append(time.perf_counter() - start)
+    upstream = upstream_for(url)
+    print(
+        f"{name:<12}{complete:>10}{failed:>8}{fail_fast:>11}"
+        f"{sum(latencies) / len(latencies) * 1000:>11.1f}{max(latencies) * 1000:>10.1f}"
+        f"{upstream.timeout(PATTERN, 'http', timeout):>13}  {upstream.breaker.state}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--degrade", choices=("slow", "fail"), default="slow")
+    parser.add_argument("--fetches", default=40, type=int, help="fetches per phase")
+    parser.add_argument("--delay", default=5.0, type=float, help="in seconds, response time of the slow stub")
+    parser.add_argument("--timeout", default=3000, type=int, help="in milliseconds, fixed timeout of each fetch")
+    args = parser.parse_args()
+
+    # only fetch the stub over plain HTTP, and let the breaker probe again quickly
+    settings.FETCH_HTTP_RETRY_AFTER = 0
+    settings.BREAKER_RESET_TIMEOUT = 1
+    settings.ADAPTIVE_TIMEOUT_MIN = 100
+    settings.RETRY_BACKOFF_BASE = 0.05
+    logger.remove()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/page"
+    StubHandler.delay = args.delay
+
+    print(f"{'phase':<12}{'complete':>10}{'failed':>8}{'fail fast':>11}{'mean (ms)':>11}{'max (ms)':>10}{'timeout (ms)':>13}  breaker")
+    try:
+        StubHandler.mode = "ok"
+        run_phase("healthy", url, args.fetches, args.timeout)
+        StubHandler.mode = args.degrade
+        run_phase(args.degrade, url, args.fetches, args.timeout)
+        StubHandler.mode = "ok"
+        time.sleep(settings.BREAKER_RESET_TIMEOUT)
+        run_phase("recovered", url, args.fetches, args.timeout)
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Measure backend cold start: the import time of app.main and the time until /health first answers.
+
+Exits with a non-zero status if either exceeds the given budget, so regressions can be caught in CI.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_startup [--top 15] [--max-import-ms 2000] [--max-health-ms 5000]
+"""
+import argparse
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+IMPORT_TIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def import_report(top: int) -> float:
+    """
+    Print the slowest imports of app.main and get its total import time in milliseconds.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        capture_output=True, text=True, check=True,
+    )
+    modules = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            modules.append((int(match.group(2)) / 1000, match.group(4)))
+    total = next(ms for ms, name in modules if name == "app.main")
+    print(f"import app.main: {total:.0f} ms")
+    print(f"{'module':<50}{'cumulative (ms)':>16}")
+    for ms, name in sorted(modules, reverse=True)[:top]:
+        print(f"{name:<50}{ms:>16.1f}")
+    return total
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def time_to_health(timeout: float = 60) -> float:
+    """
+    Start the server and get the time in milliseconds until /health answers.
+    """
+    port = _free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env={**os.environ, "PYTHONPATH": os.getcwd()},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+                    if response.status == 200:
+                        elapsed = (time.perf_counter() - start) * 1000
+                        print(f"time to first /health: {elapsed:.0f} ms")
+                        return elapsed
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError("The server did not answer /health in time.")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", default=15, type=int)
+    parser.add_argument("--max-import-ms", default=None, type=float)
+    parser.add_argument("--max-health-ms", default=None, type=float)
+    args = parser.parse_args()
+
+    import_ms = import_report(args.top)
+    health_ms = time_to_health()
+    failed = False
+    if args.max_import_ms is not None and import_ms > args.max_import_ms:
+        print(f"Import time {import_ms:.0f} ms exceeds the budget of {args.max_import_ms:.0f} ms.")
+        failed = True
+    if args.max_health_ms is not None and health_ms > args.max_health_ms:
+        print(f"Time to first /health {health_ms:.0f} ms exceeds the budget of {args.max_health_ms:.0f} ms.")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Benchmark bulk writes and batched reads of the fundamentals and price store against a local mongod.
+
+Synthetic financials and daily price histories are generated for many securities, saved in bulk,
+then read back both in batches and one security at a time. Commands sent to the server are counted,
+so the batched reads can be seen to take a few round trips rather than one per security.
+A scratch database is used and dropped at the end.
+
+Usage (from the backend directory, with mongod listening on MONGO_ENDPOINT):
+    python -m benchmarks.bench_store [--securities 5000] [--years 2] [--single 500] [--db technical_analysis_bench]
+"""
+import argparse
+import time
+import numpy as np
+from loguru import logger
+from pymongo import monitoring
+
+from app.db.db import get_client, close_client
+from app.service.history import COLUMNS, PriceHistory
+from app.service.store import FundamentalsStore
+
+PERIODS = ("TTM", "12/31/2024", "12/31/2023", "12/31/2022", "12/31/2021")
+
+
+class CommandCounter(monitoring.CommandListener):
+    """
+    Count the commands sent to the server, i.e. the round trips.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def synthetic_financials(ids: list[str], rng: np.random.Generator) -> dict[str, dict]:
+    records = {}
+    for id in ids:
+        income = rng.integers(10**6, 10**10, len(PERIODS))
+        shares = rng.integers(10**6, 10**9, len(PERIODS))
+        assets = rng.integers(10**7, 10**11, len(PERIODS) - 1)
+        records[id] = {
+            "financial_statement": {
+                "financials_currency": "USD",
+                "financials": {p: {"income": int(i), "shares": int(s)} for p, i, s in zip(PERIODS, income, shares)},
+            },
+            # balance sheets have no trailing twelve months column
+            "balance_sheet": {
+                p: {"assets": int(a), "liabilities": int(a // 2), "book_value": int(a // 3)} for p, a in zip(PERIODS[1:], assets)
+            },
+        }
+    return records
+
+
+def synthetic_histories(ids: list[str], years: int, rng: np.random.Generator) -> dict[str, PriceHistory]:
+    end = np.datetime64("today", "D")
+    dates = np.arange(end - np.timedelta64(365 * years, "D"), end, dtype="datetime64[D]")
+    # weekdays only, like the history table
+    dates = dates[np.is_busday(dates)]
+    histories = {}
+    for id in ids:
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, len(dates))))
+        columns = {name: close for name in COLUMNS}
+        columns["volume"] = rng.integers(10**5, 10**7, len(dates)).astype(np.float64)
+        histories[id] = PriceHistory(dates, columns)
+    return histories
+
+
+def measure(counter: CommandCounter, label: str, func, *args):
+    """
+    Run ``func`` once and print its time and the number of commands it sent.
+    """
+    counter.count = 0
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40}{elapsed * 1000:>12.1f}{counter.count:>12}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--securities", default=5000, type=int)
+    parser.add_argument("--years", default=2, type=int, help="years of daily prices per security")
+    parser.add_argument("--single", default=500, type=int, help="securities read one at a time, for comparison")
+    parser.add_argument("--db", default="technical_analysis_bench", help="scratch database, dropped at the end")
+    args = parser.parse_args()
+
+    counter = CommandCounter()
+    # listeners must be registered before the client is created
+    monitoring.register(counter)
+    logger.remove()
+
+    rng = np.random.default_rng(0)
+    ids = [f"SEC{i:05d}" for i in range(args.securities)]
+    financials = synthetic_financials(ids, rng)
+    histories = synthetic_histories(ids, args.years, rng)
+    store = FundamentalsStore(db_name=args.db)
+    single = ids[:args.single]
+
+    print(f"{'operation':<40}{'time (ms)':>12}{'commands':>12}")
+    try:
+        measure(counter, f"save financials x{len(ids)}", store.save_fundamentals, financials)
+        measure(counter, f"save prices x{len(ids)}", store.save_prices, histories)
+        loaded = measure(counter, f"load financials x{len(ids)}", store.load_fundamentals, ids)
+        measure(counter, f"load financials one by one x{len(single)}", lambda: [store.load_fundamentals([id]) for id in single])
+        measure(counter, f"load prices x{len(ids)}", store.load_prices, ids)
+        measure(counter, f"load close prices x{len(ids)}", store.load_prices, ids, None, ("close",))
+        measure(counter, f"load prices one by one x{len(single)}", lambda: [store.load_prices([id]) for id in single])
+
+        if loaded != financials:
+            raise SystemExit("Loaded financials differ from the saved ones.")
+        db = get_client()[args.db]
+        for name in ("fundamentals", "prices"):
+            stats = db.command("collStats", name)
+            print(f"{name}: {stats['count']} documents, {stats['size'] / 1e6:.1f} MB, {stats['avgObjSize']} bytes per document")
+    finally:
+        get_client().drop_database(args.db)
+        close_client()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.core.config import settings
+from app.service import fetch, resilience
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Serves the page registered for a path, or a 404.
+    """
+
+    pages: dict[str, tuple[int, str]] = {}
+    hits: list[str] = []
+
+    def do_GET(self):
+        self.hits.append(self.path)
+        status, body = self.pages.get(self.path, (404, "not found"))
+        data = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    """
+    Local upstream serving fixture pages, registered as ``server.pages[path] = (status, html)``,
+    with the requested paths in ``server.hits``.
+    """
+    StubHandler.pages, StubHandler.hits = {}, []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.pages, server.hits = StubHandler.pages, StubHandler.hits
+    server.url = f"http://127.0.0.1:{server.server_port}"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture(autouse=True)
+def fresh_fetch_state(monkeypatch):
+    """
+    Forget the fetch strategies and upstream health learned by other tests.
+    """
+    monkeypatch.setattr(fetch, "_http_failed_at", {})
+    monkeypatch.setattr(resilience, "_upstreams", {})
+    monkeypatch.setattr(settings, "FETCH_HTTP_FIRST", True)
+    monkeypatch.setattr(settings, "SCRAPE_MODE", "live")
+    monkeypatch.setattr(settings, "RETRY_BACKOFF_BASE", 0)
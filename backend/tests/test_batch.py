@@ -0,0 +1,29 @@
+import asyncio
+
+from app.service.batch import run_batch
+
+PRICES = {"AAPL": 190.5, "MISSING": -1, "DELISTED": 0}
+
+
+async def fetch_price(id: str) -> float:
+    if id == "BROKEN":
+        raise RuntimeError("scrape failed")
+    return PRICES[id]
+
+
+def test_not_found_prices_are_errors():
+    outcome = asyncio.run(run_batch(["AAPL", "MISSING", "DELISTED", "BROKEN"], fetch_price))
+
+    assert outcome["results"] == {"AAPL": 190.5}
+    assert set(outcome["errors"]) == {"MISSING", "DELISTED", "BROKEN"}
+    assert outcome["errors"]["BROKEN"] == "scrape failed"
+
+
+def test_empty_overviews_are_errors():
+    async def fetch_overview(id: str) -> dict:
+        return {"sector": "", "exchange_currency": "", "name": ""} if id == "MISSING" else {"sector": "Technology", "exchange_currency": "USD", "name": id}
+
+    outcome = asyncio.run(run_batch(["AAPL", "MISSING"], fetch_overview))
+
+    assert list(outcome["results"]) == ["AAPL"]
+    assert list(outcome["errors"]) == ["MISSING"]
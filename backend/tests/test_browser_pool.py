@@ -0,0 +1,137 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import playwright.sync_api
+import pytest
+
+from app.core.config import settings
+from app.service import scraper
+from app.service.browser_pool import BrowserPool, BrowserPoolFullError, goto
+
+
+class FakePage:
+    def __init__(self):
+        self.url = None
+
+    def goto(self, url, **kwargs):
+        self.url = url
+
+    def wait_for_selector(self, selector, **kwargs):
+        pass
+
+    def content(self):
+        return f"<html>{self.url}</html>"
+
+    def is_closed(self):
+        return False
+
+
+class FakeContext:
+    def route(self, pattern, handler):
+        pass
+
+    def new_page(self):
+        return FakePage()
+
+
+class FakeBrowser:
+    def new_context(self, **kwargs):
+        return FakeContext()
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        pass
+
+
+class FakeChromium:
+    def __init__(self):
+        self.launches = 0
+
+    def launch(self, **kwargs):
+        self.launches += 1
+        return FakeBrowser()
+
+
+def test_sync_scrape_reuses_pooled_browser(monkeypatch):
+    chromium = FakeChromium()
+
+    @contextmanager
+    def fake_sync_playwright():
+        yield type("FakePlaywright", (), {"chromium": chromium})()
+
+    monkeypatch.setattr(playwright.sync_api, "sync_playwright", fake_sync_playwright)
+    pool = BrowserPool(size=1)
+    monkeypatch.setattr(scraper, "browser_pool", pool)
+    try:
+        first = scraper.playwright_scrape("https://example.com/a", headless=True)
+        second = scraper.playwright_scrape("https://example.com/b", headless=True)
+    finally:
+        pool.stop()
+
+    assert first == "<html>https://example.com/a</html>"
+    assert second == "<html>https://example.com/b</html>"
+    assert chromium.launches == 1
+
+
+def test_playwright_start_failure_fails_scrapes(monkeypatch):
+    @contextmanager
+    def broken_sync_playwright():
+        raise RuntimeError("Chromium is missing")
+        yield
+
+    monkeypatch.setattr(playwright.sync_api, "sync_playwright", broken_sync_playwright)
+    pool = BrowserPool(size=1)
+    pool.start()
+    try:
+        for _ in range(2):
+            with pytest.raises(RuntimeError, match="Chromium is missing"):
+                pool.scrape("https://example.com/a", timeout=1000)
+    finally:
+        pool.stop()
+
+
+def test_scrape_gives_up_on_a_stuck_browser(monkeypatch):
+    chromium = FakeChromium()
+    released = threading.Event()
+
+    class StuckPage(FakePage):
+        def goto(self, url, **kwargs):
+            if url != "about:blank":
+                released.wait(5)
+
+    monkeypatch.setattr(FakeContext, "new_page", lambda self: StuckPage())
+
+    @contextmanager
+    def fake_sync_playwright():
+        yield type("FakePlaywright", (), {"chromium": chromium})()
+
+    monkeypatch.setattr(playwright.sync_api, "sync_playwright", fake_sync_playwright)
+    monkeypatch.setattr(settings, "BROWSER_POOL_ACQUIRE_TIMEOUT", 0.1)
+    pool = BrowserPool(size=1)
+    pool.start()
+    try:
+        with pytest.raises(BrowserPoolFullError):
+            pool.scrape("https://example.com/a", timeout=100)
+    finally:
+        released.set()
+        pool.stop()
+
+
+def test_navigation_and_selector_share_the_timeout():
+    class SlowPage(FakePage):
+        def goto(self, url, **kwargs):
+            self.goto_timeout = kwargs["timeout"]
+            time.sleep(0.2)
+            return type("FakeResponse", (), {"status": 200})()
+
+        def wait_for_selector(self, selector, **kwargs):
+            self.selector_timeout = kwargs["timeout"]
+
+    page = SlowPage()
+    goto(page, "https://example.com/a", 1000, wait_for="span.exchange")
+
+    assert page.goto_timeout == 1000
+    assert 1 <= page.selector_timeout <= 800
@@ -0,0 +1,232 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.service import cache as cache_module
+from app.service.cache import LRUCache, SqliteCache, TieredCache, _is_cacheable, cached
+from app.service.resilience import CircuitOpenError
+
+
+class Counter:
+    """
+    A fetch returning its number of calls, optionally slow so concurrent callers overlap.
+    """
+
+    def __init__(self, delay: float = 0):
+        self.delay = delay
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        time.sleep(self.delay)
+        return self.calls
+
+    async def fetch(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self.calls
+
+
+def test_entries_expire_but_stay_available_as_stale():
+    local = LRUCache()
+    local.set("price:a", 1.0, ttl=0.05)
+    assert local.get("price:a") == 1.0
+
+    time.sleep(0.1)
+    assert local.get("price:a") is None
+    assert local.get_stale("price:a") == 1.0
+
+
+def test_least_recently_used_entry_is_evicted():
+    local = LRUCache(max_size=2)
+    local.set("a", 1, ttl=60)
+    local.set("b", 2, ttl=60)
+    local.get("a")
+    local.set("c", 3, ttl=60)
+
+    assert local.get_stale("b") is None
+    assert local.get("a") == 1
+    assert local.get("c") == 3
+
+
+def test_concurrent_misses_fetch_once():
+    tiered = TieredCache(LRUCache())
+    fetch = Counter(delay=0.2)
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(tiered.get_or_fetch("price:a", 60, fetch))) for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert fetch.calls == 1
+    assert results == [1] * 5
+    assert tiered.get_or_fetch("price:a", 60, fetch) == 1
+
+
+def test_failed_fetch_is_raised_to_coalesced_callers_and_not_cached():
+    tiered = TieredCache(LRUCache())
+    started = threading.Event()
+
+    def fail():
+        started.set()
+        time.sleep(0.2)
+        raise ValueError("boom")
+
+    errors = []
+
+    def call():
+        try:
+            tiered.get_or_fetch("price:a", 60, fail)
+        except ValueError as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait()
+    follower = threading.Thread(target=call)
+    follower.start()
+    leader.join()
+    follower.join()
+
+    assert len(errors) == 2
+    assert tiered.get_or_fetch("price:a", 60, lambda: 2.0) == 2.0
+
+
+def test_async_concurrent_misses_fetch_once():
+    tiered = TieredCache(LRUCache())
+    fetch = Counter(delay=0.1)
+
+    async def main():
+        return await asyncio.gather(*(tiered.async_get_or_fetch("price:a", 60, fetch.fetch) for _ in range(5)))
+
+    assert asyncio.run(main()) == [1] * 5
+    assert fetch.calls == 1
+
+
+def test_async_caller_fetches_again_when_the_leader_is_cancelled():
+    tiered = TieredCache(LRUCache())
+    fetch = Counter(delay=0.1)
+
+    async def main():
+        leader = asyncio.create_task(tiered.async_get_or_fetch("price:a", 60, fetch.fetch))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(tiered.async_get_or_fetch("price:a", 60, fetch.fetch))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    # the follower is not cancelled with the leader, it takes over the fetch
+    assert asyncio.run(main()) == 2
+    assert fetch.calls == 2
+
+
+def test_shared_tier_serves_other_processes(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    first = TieredCache(LRUCache(), SqliteCache(path))
+    second = TieredCache(LRUCache(), SqliteCache(path))
+    fetch = Counter()
+
+    assert first.get_or_fetch("quote:a", 60, fetch) == 1
+    assert second.get_or_fetch("quote:a", 60, fetch) == 1
+    assert fetch.calls == 1
+
+
+def test_shared_tier_waits_for_the_lease_holder(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    holder = SqliteCache(path)
+    tiered = TieredCache(LRUCache(), SqliteCache(path))
+    fetch = Counter()
+
+    # another worker is scraping the key
+    assert holder.lease("quote:a", 60)
+    threading.Timer(0.2, holder.set, ("quote:a", 5, 60)).start()
+
+    assert tiered.get_or_fetch("quote:a", 60, fetch) == 5
+    assert fetch.calls == 0
+
+
+def test_stale_value_is_served_while_the_circuit_is_open():
+    tiered = TieredCache(LRUCache())
+    tiered.get_or_fetch("price:a", 0.01, lambda: 1.0)
+    time.sleep(0.05)
+
+    def open_circuit():
+        raise CircuitOpenError("finance.yahoo.com is failing")
+
+    assert tiered.get_or_fetch("price:a", 60, open_circuit) == 1.0
+    with pytest.raises(CircuitOpenError):
+        tiered.get_or_fetch("price:a", 60, open_circuit, refresh=True)
+    with pytest.raises(CircuitOpenError):
+        tiered.get_or_fetch("price:b", 60, open_circuit)
+
+
+@pytest.mark.parametrize(
+    "value, cacheable",
+    [
+        (None, False),
+        (0, False),
+        (-1.0, False),
+        (101.5, True),
+        ({}, False),
+        ({"name": None, "sector": None}, False),
+        ({"name": "Apple Inc.", "price": -1}, False),
+        ({"name": "Apple Inc.", "price": 0.0}, False),
+        ({"name": "Apple Inc.", "price": 227.5}, True),
+        ({"name": "Apple Inc.", "sector": None}, True),
+        ([], False),
+        ([{"date": "2026-10-16"}], True),
+    ],
+)
+def test_is_cacheable(value, cacheable):
+    assert _is_cacheable(value) is cacheable
+
+
+def test_cached_sync_and_async_versions_share_entries(monkeypatch):
+    monkeypatch.setattr(cache_module, "cache", TieredCache(LRUCache()))
+    fetch = Counter()
+
+    @cached("price")
+    def scrape_price(ticker: str):
+        return fetch()
+
+    @cached("price")
+    async def async_scrape_price(ticker: str):
+        return fetch()
+
+    assert scrape_price("AAPL") == 1
+    assert asyncio.run(async_scrape_price("AAPL")) == 1
+    assert scrape_price("MSFT") == 2
+    assert scrape_price.refresh("AAPL") == 3
+    assert asyncio.run(async_scrape_price("AAPL")) == 3
+    assert scrape_price.__wrapped__("AAPL") == 4
+
+
+def test_sqlite_lease_is_exclusive_until_it_expires(tmp_path, monkeypatch):
+    path = tmp_path / "cache.sqlite3"
+    first, second = SqliteCache(path), SqliteCache(path)
+    owner = cache_module.LEASE_OWNER
+
+    assert first.lease("quote:a", 0.1)
+    assert not second.lease("quote:a", 0.1)
+    assert second.lease("quote:b", 0.1)
+
+    # the holder stopped renewing it, e.g. its worker died
+    time.sleep(0.15)
+    monkeypatch.setattr(cache_module, "LEASE_OWNER", "other-host:1")
+    assert second.lease("quote:a", 60)
+
+    # the previous holder cannot release a lease taken over by another worker
+    monkeypatch.setattr(cache_module, "LEASE_OWNER", owner)
+    first.release("quote:a")
+    assert not first.lease("quote:a", 60)
+
+    monkeypatch.setattr(cache_module, "LEASE_OWNER", "other-host:1")
+    second.release("quote:a")
+    assert first.lease("quote:a", 60)
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from app.service.calculations import predict_values, predict_values_batch, fallback_predict_average_income
+
+
+def _single(y: list[float]) -> tuple[float, float]:
+    # as the endpoints call it
+    try:
+        return predict_values(y)
+    except (AssertionError, ValueError):
+        return fallback_predict_average_income(y)
+
+
+@pytest.mark.parametrize("y", [
+    [10, -5],
+    [-5, 10],
+    [10, 0],
+    [10, 12],
+    [10, -5, 3],
+    [1, 2, 4, 8],
+    [-4, -2, -1],
+])
+def test_batch_matches_single(y):
+    growth_rate, avg_income, _ = predict_values_batch([y])
+    expected_rate, expected_income = _single(y)
+
+    assert growth_rate[0] == pytest.approx(expected_rate)
+    assert avg_income[0] == pytest.approx(expected_income)
+
+
+def test_sign_change_of_two_points_uses_fallback():
+    growth_rate, _, fallback = predict_values_batch(np.array([[10.0, -5.0]]))
+
+    assert growth_rate[0] == 0.0
+    assert fallback[0]
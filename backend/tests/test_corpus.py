@@ -0,0 +1,49 @@
+import gzip
+import json
+
+import pytest
+
+from app.core.config import settings
+from app.service import corpus as corpus_module
+from app.service.corpus import Corpus, CorpusMissError, INDEX_FILE, RECORD, REPLAY
+from app.service.fetch import fetch_page
+
+URL = "https://sg.finance.yahoo.com/quote/AAPL/history"
+
+
+def test_save_and_load(tmp_path):
+    corpus = Corpus(tmp_path / "corpus")
+    corpus.save(URL, "yahoo:history", "<html>first</html>")
+    corpus.save(URL, "yahoo:history", "<html>second</html>")
+
+    assert corpus.load(URL) == "<html>second</html>"
+    with gzip.open(tmp_path / "corpus" / f"{Corpus.key(URL)}.html.gz", "rt") as f:
+        assert f.read() == "<html>second</html>"
+    # recording a page again only replaces it
+    entries = corpus.entries()
+    assert [(entry["url"], entry["pattern"]) for entry in entries] == [(URL, "yahoo:history")]
+    assert json.loads((tmp_path / "corpus" / INDEX_FILE).read_text()) == entries[0]
+
+
+def test_missing_pages(tmp_path):
+    corpus = Corpus(tmp_path / "corpus")
+    assert corpus.entries() == []
+    with pytest.raises(CorpusMissError):
+        corpus.load(URL)
+
+
+def test_record_then_replay(monkeypatch, tmp_path, stub_server):
+    monkeypatch.setattr(corpus_module.corpus, "root", tmp_path / "corpus")
+    stub_server.pages["/quote"] = (200, "<html>Diluted average shares</html>")
+    url = f"{stub_server.url}/quote"
+
+    monkeypatch.setattr(settings, "SCRAPE_MODE", RECORD)
+    assert fetch_page(url, "yahoo:financials", ["Diluted average shares"]) == "<html>Diluted average shares</html>"
+
+    # replaying never reaches the host
+    stub_server.pages["/quote"] = (500, "")
+    monkeypatch.setattr(settings, "SCRAPE_MODE", REPLAY)
+    assert fetch_page(url, "yahoo:financials", ["Diluted average shares"]) == "<html>Diluted average shares</html>"
+    assert len(stub_server.hits) == 1
+    with pytest.raises(CorpusMissError):
+        fetch_page(f"{stub_server.url}/other", "yahoo:financials", ["Diluted average shares"])
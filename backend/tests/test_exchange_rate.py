@@ -0,0 +1,118 @@
+import asyncio
+import re
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.core.config import settings
+from app.service import cache as cache_module
+from app.service import exchange_rate, fetch
+from app.service.cache import LRUCache, TieredCache
+from app.service.exchange_rate import (
+    _parse_rate_table, async_get_exchange_rate, cross_rate, get_exchange_rate, rate_matrix,
+)
+
+FIXTURES = Path(__file__).parents[1] / "benchmarks" / "fixtures"
+RATE_TABLE = (FIXTURES / "fxtable-USD.html").read_text()
+CALCULATOR = (FIXTURES / "fx-USD-SGD.html").read_text()
+TABLE_PATH = "/table/?from=USD&amount=1"
+CALCULATOR_PATH = "/calculator/?from=USD&to=SGD&amount=1"
+
+client = TestClient(main.app)
+
+
+@pytest.fixture
+def table() -> dict:
+    return _parse_rate_table(RATE_TABLE, "USD")
+
+
+@pytest.fixture
+def x_rates(stub_server, monkeypatch):
+    monkeypatch.setattr(exchange_rate, "ROOT_RATE_TABLE_URL", f"{stub_server.url}/table")
+    monkeypatch.setattr(exchange_rate, "ROOT_EXCHANGE_URL", f"{stub_server.url}/calculator")
+    monkeypatch.setattr(settings, "FX_BASE_CURRENCY", "USD")
+    monkeypatch.setattr(cache_module, "cache", TieredCache(LRUCache()))
+    monkeypatch.setattr(fetch, "playwright_scrape", lambda url, **kwargs: pytest.fail("the browser must not be used"))
+    stub_server.pages[CALCULATOR_PATH] = (200, CALCULATOR)
+    return stub_server
+
+
+def test_parse_rate_table_keeps_the_rates_from_the_base(table):
+    assert table["base"] == "USD"
+    assert table["rates"]["SGD"] == 1.35
+    assert table["rates"]["EUR"] == 0.92
+    # the inverse rates of the table are not rates from the base
+    assert "USD" not in table["rates"]
+
+
+def test_cross_rate(table):
+    assert cross_rate(table, "USD", "USD") == 1.0
+    assert cross_rate(table, "usd", "SGD") == 1.35
+    assert cross_rate(table, "SGD", "USD") == pytest.approx(1 / 1.35)
+    assert cross_rate(table, "EUR", "SGD") == pytest.approx(1.35 / 0.92)
+    assert cross_rate(table, "SGD", "SGD") == 1.0
+    assert cross_rate(table, "USD", "XYZ") is None
+    assert cross_rate({}, "USD", "SGD") is None
+
+
+def test_rate_matrix(table):
+    matrix = rate_matrix(table)
+    assert set(matrix) == {"USD", *table["rates"]}
+    assert matrix["USD"]["USD"] == 1.0
+    assert matrix["SGD"]["EUR"] == pytest.approx(cross_rate(table, "SGD", "EUR"))
+
+    matrix = rate_matrix(table, ["sgd", "EUR", "XYZ"])
+    assert set(matrix) == {"SGD", "EUR"}
+    assert set(matrix["SGD"]) == {"SGD", "EUR"}
+
+
+def test_exchange_rate_is_triangulated_from_the_table(x_rates):
+    x_rates.pages[TABLE_PATH] = (200, RATE_TABLE)
+
+    assert get_exchange_rate("SGD", "EUR") == pytest.approx(0.92 / 1.35)
+    assert get_exchange_rate("USD", "SGD") == 1.35
+    # one table for every pair
+    assert x_rates.hits == [TABLE_PATH]
+
+
+def test_exchange_rate_falls_back_to_the_calculator(x_rates):
+    # the table does not list SGD
+    x_rates.pages[TABLE_PATH] = (200, re.sub(r"<a href='[^']*to=SGD'>[^<]*</a>", "", RATE_TABLE))
+
+    assert get_exchange_rate("USD", "SGD") == 1.35
+    assert asyncio.run(async_get_exchange_rate("USD", "EUR")) == 0.92
+    assert x_rates.hits == [TABLE_PATH, CALCULATOR_PATH]
+
+
+def test_exchange_rate_falls_back_to_the_calculator_when_the_table_fails(x_rates):
+    x_rates.pages[TABLE_PATH] = (500, "")
+
+    assert asyncio.run(async_get_exchange_rate("USD", "SGD")) == 1.35
+    assert x_rates.hits[-1] == CALCULATOR_PATH
+
+
+def test_matrix_endpoint(table, monkeypatch):
+    async def get_rate_table(base):
+        return table
+
+    monkeypatch.setattr(main, "async_get_rate_table", get_rate_table)
+    response = client.get("/exchange/matrix", params={"currencies": "usd, SGD,XYZ"})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["base"] == "USD"
+    assert body["timestamp"] == table["timestamp"]
+    assert body["rates"] == {"USD": {"USD": 1.0, "SGD": 1.35}, "SGD": {"USD": pytest.approx(1 / 1.35), "SGD": 1.0}}
+    assert body["missing"] == ["XYZ"]
+    assert set(client.get("/exchange/matrix").json()["rates"]) == {"USD", *table["rates"]}
+
+
+def test_matrix_endpoint_without_a_table(monkeypatch):
+    async def get_rate_table(base):
+        return {}
+
+    monkeypatch.setattr(main, "async_get_rate_table", get_rate_table)
+
+    assert client.get("/exchange/matrix").status_code == 502
@@ -0,0 +1,14 @@
+import json
+
+from app.service.corpus import corpus
+from benchmarks.bench_extraction import CORPUS_DIR, EXPECTED_FILE, benchmark, _normalise
+
+
+def test_committed_corpus_extracts_the_expected_results(monkeypatch):
+    monkeypatch.setattr(corpus, "root", CORPUS_DIR)
+
+    timings, results = benchmark(repeat=1)
+
+    expected = json.loads((CORPUS_DIR / EXPECTED_FILE).read_text())
+    assert _normalise(results) == expected
+    assert set(timings) == {"overview", "quote", "price", "history", "financials", "balance", "fx", "fxtable"}
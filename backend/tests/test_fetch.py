@@ -0,0 +1,104 @@
+import pytest
+import requests
+
+from app.core.config import settings
+from app.service import fetch
+from app.service.browser_pool import PageLoadError
+from app.service.fetch import fetch_page, strategy_for, HTTP, BROWSER
+from app.service.resilience import CircuitOpenError, upstream_for, CLOSED, OPEN
+
+REQUIRED = ["Diluted average shares"]
+COMPLETE = "<html><div>Diluted average shares</div></html>"
+INCOMPLETE = "<html><div>Symbol lookup</div></html>"
+
+
+def _no_browser(url, **kwargs):
+    raise AssertionError("the browser must not be used")
+
+
+def test_http_complete_uses_http(stub_server, monkeypatch):
+    stub_server.pages["/quote/AAPL"] = (200, COMPLETE)
+    monkeypatch.setattr(fetch, "playwright_scrape", _no_browser)
+
+    assert fetch_page(f"{stub_server.url}/quote/AAPL", "test:page", REQUIRED) == COMPLETE
+    assert strategy_for("test:page") == HTTP
+
+
+def test_http_and_browser_incomplete_keep_http(stub_server, monkeypatch):
+    stub_server.pages["/quote/NOSUCH"] = (200, INCOMPLETE)
+    rendered = []
+
+    def fake_scrape(url, **kwargs):
+        rendered.append(url)
+        return INCOMPLETE
+
+    monkeypatch.setattr(fetch, "playwright_scrape", fake_scrape)
+
+    assert fetch_page(f"{stub_server.url}/quote/NOSUCH", "test:page", REQUIRED) == INCOMPLETE
+    assert rendered
+    # neither strategy returned the data, so nothing is learned about the pattern
+    assert strategy_for("test:page") == HTTP
+
+
+def test_http_incomplete_browser_complete_switches_to_browser(stub_server, monkeypatch):
+    stub_server.pages["/quote/AAPL"] = (200, INCOMPLETE)
+    monkeypatch.setattr(fetch, "playwright_scrape", lambda url, **kwargs: COMPLETE)
+
+    assert fetch_page(f"{stub_server.url}/quote/AAPL", "test:page", REQUIRED) == COMPLETE
+    assert strategy_for("test:page") == BROWSER
+
+
+def test_invalid_tickers_do_not_open_the_circuit(stub_server, monkeypatch):
+    monkeypatch.setattr(settings, "BREAKER_FAILURE_THRESHOLD", 2)
+    monkeypatch.setattr(fetch, "playwright_scrape", lambda url, **kwargs: INCOMPLETE)
+    stub_server.pages["/quote/NOSUCH1"] = (200, INCOMPLETE)
+    stub_server.pages["/quote/NOSUCH2"] = (404, INCOMPLETE)
+    stub_server.pages["/quote/AAPL"] = (200, COMPLETE)
+
+    for path in ("/quote/NOSUCH1", "/quote/NOSUCH2", "/quote/NOSUCH1"):
+        assert fetch_page(stub_server.url + path, "test:page", REQUIRED) == INCOMPLETE
+    # fetched once each, without retries
+    assert len(stub_server.hits) == 3
+    assert upstream_for(stub_server.url).breaker.state == CLOSED
+    assert fetch_page(f"{stub_server.url}/quote/AAPL", "test:page", REQUIRED) == COMPLETE
+
+
+def test_server_errors_open_the_circuit_without_rendering(stub_server, monkeypatch):
+    monkeypatch.setattr(settings, "BREAKER_FAILURE_THRESHOLD", 2)
+    monkeypatch.setattr(fetch, "playwright_scrape", _no_browser)
+    stub_server.pages["/quote/AAPL"] = (503, INCOMPLETE)
+
+    with pytest.raises(requests.HTTPError):
+        fetch_page(f"{stub_server.url}/quote/AAPL", "test:page", REQUIRED)
+    assert upstream_for(stub_server.url).breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        fetch_page(f"{stub_server.url}/quote/AAPL", "test:page", REQUIRED)
+
+
+def test_browser_timeouts_open_the_circuit(stub_server, monkeypatch):
+    monkeypatch.setattr(settings, "BREAKER_FAILURE_THRESHOLD", 2)
+    monkeypatch.setattr(settings, "FETCH_HTTP_FIRST", False)
+    renders = []
+
+    def slow_scrape(url, **kwargs):
+        renders.append(url)
+        raise PageLoadError(f"Timed out loading {url}.", INCOMPLETE)
+
+    monkeypatch.setattr(fetch, "playwright_scrape", slow_scrape)
+
+    # what loaded is returned once the retries are exhausted
+    assert fetch_page(f"{stub_server.url}/quote/AAPL", "test:page", REQUIRED) == INCOMPLETE
+    assert len(renders) == 2
+    assert upstream_for(stub_server.url).breaker.state == OPEN
+
+
+def test_browser_timeout_with_the_data_is_complete(stub_server, monkeypatch):
+    monkeypatch.setattr(settings, "FETCH_HTTP_FIRST", False)
+
+    def slow_scrape(url, **kwargs):
+        raise PageLoadError(f"Timed out loading {url}.", COMPLETE)
+
+    monkeypatch.setattr(fetch, "playwright_scrape", slow_scrape)
+
+    assert fetch_page(f"{stub_server.url}/quote/AAPL", "test:page", REQUIRED) == COMPLETE
+    assert upstream_for(stub_server.url).breaker.state == CLOSED
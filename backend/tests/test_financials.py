@@ -0,0 +1,61 @@
+import asyncio
+import functools
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.core.config import settings
+from app.service import yahoo_finance
+from app.service.yahoo_finance import FINANCIAL_SECTIONS
+
+STATEMENT = {"financials": {"TTM": {"income": 1000000, "shares": 1000000}}, "financials_currency": "USD"}
+
+client = TestClient(main.app)
+
+
+async def scrape_statement(id):
+    return STATEMENT
+
+
+async def scrape_slowly(id):
+    await asyncio.sleep(10)
+
+
+async def scrape_failing(id):
+    raise RuntimeError(f"No balance sheet found for {id}.")
+
+
+@pytest.fixture
+def sections(monkeypatch) -> dict:
+    monkeypatch.setattr(settings, "STORE_ENABLED", False)
+    # sections time out quickly
+    monkeypatch.setattr(main, "async_scrape_financials", functools.partial(yahoo_finance.async_scrape_financials, timeout=0.1))
+    return FINANCIAL_SECTIONS
+
+
+def test_failed_sections_are_reported_with_the_others(sections, monkeypatch):
+    monkeypatch.setitem(sections, "financial_statement", scrape_statement)
+    monkeypatch.setitem(sections, "balance_sheet", scrape_slowly)
+    monkeypatch.setitem(sections, "cash_flow", scrape_failing)
+
+    response = client.get("/finance/financials/AAPL")
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "financial_statement": STATEMENT,
+        "errors": {
+            "balance_sheet": "Scraping balance_sheet for AAPL timed out after 0.1s.",
+            "cash_flow": "No balance sheet found for AAPL.",
+        },
+    }
+
+
+def test_every_section_failing_is_an_error(sections, monkeypatch):
+    monkeypatch.setitem(sections, "financial_statement", scrape_slowly)
+    monkeypatch.setitem(sections, "balance_sheet", scrape_failing)
+
+    response = client.get("/finance/financials/AAPL")
+
+    assert response.status_code == 500
+    assert response.json()["detail"] == "Scraping financial_statement for AAPL timed out after 0.1s."
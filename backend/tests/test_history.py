@@ -0,0 +1,110 @@
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.service import history
+from app.service.fetch import _has_fields
+from app.service.history import COLUMNS, HistoryNotFoundError, PriceHistory, get_history
+
+HEAD = "<thead><tr><th>Date</th><th>Open</th><th>High</th><th>Low</th><th>Close*</th><th>Adj. close**</th><th>Volume</th></tr></thead>"
+
+
+def _page(*rows: tuple[str, float]) -> str:
+    body = "".join(
+        f"<tr><td>{date}</td>" + f"<td>{close}</td>" * 5 + "<td>1,000</td></tr>" for date, close in rows
+    )
+    return f"<html><table>{HEAD}<tbody>{body}</tbody></table></html>"
+
+
+def _history(dates: list[str], closes: list[float]) -> PriceHistory:
+    return PriceHistory(np.array(dates, dtype="datetime64[D]"), {name: closes for name in COLUMNS})
+
+
+def test_append_replaces_overlapping_bars():
+    stored = _history(["2026-10-14", "2026-10-15", "2026-10-16"], [99.0, 100.0, 101.0])
+    stored.append(_history(["2026-10-16", "2026-10-19"], [105.0, 106.0]))
+
+    assert np.datetime_as_string(stored.dates).tolist() == ["2026-10-14", "2026-10-15", "2026-10-16", "2026-10-19"]
+    assert stored.columns["close"].tolist() == [99.0, 100.0, 105.0, 106.0]
+
+
+def test_update_refreshes_last_bar_and_accepts_no_new_rows(monkeypatch):
+    pages = [
+        _page(("16 Oct 2026", 101.0), ("15 Oct 2026", 100.0)),
+        # the last bar closed higher than when it was first fetched
+        _page(("16 Oct 2026", 105.0)),
+        _page(),
+    ]
+    fetched = []
+
+    def fake_fetch_page(url, pattern, required, wait_for=None):
+        content = pages[len(fetched)]
+        fetched.append(url)
+        assert _has_fields(content, required)
+        return content
+
+    monkeypatch.setattr(history, "fetch_page", fake_fetch_page)
+    monkeypatch.setattr(history, "_histories", OrderedDict())
+    monkeypatch.setattr(history.settings, "HISTORY_REFRESH_INTERVAL", 0)
+
+    assert get_history("AAPL").columns["close"].tolist() == [100.0, 101.0]
+    assert get_history("AAPL").columns["close"].tolist() == [100.0, 105.0]
+    # e.g. over a weekend
+    assert get_history("AAPL").columns["close"].tolist() == [100.0, 105.0]
+    # updates start from the last stored bar, inclusive
+    start = int(np.datetime64("2026-10-16", "s").astype(int))
+    assert all(f"period1={start}&" in url for url in fetched[1:])
+
+
+def test_empty_first_fetch_is_not_stored(monkeypatch):
+    pages = [_page(), _page(("16 Oct 2026", 101.0))]
+
+    def fake_fetch_page(url, pattern, required, wait_for=None):
+        return pages.pop(0)
+
+    monkeypatch.setattr(history, "fetch_page", fake_fetch_page)
+    monkeypatch.setattr(history, "_histories", OrderedDict())
+
+    with pytest.raises(HistoryNotFoundError):
+        get_history("NOSUCH")
+    assert "NOSUCH" not in history._histories
+    # fetched again rather than served empty
+    assert get_history("NOSUCH").columns["close"].tolist() == [101.0]
+
+
+def test_endpoint_returns_404_for_unknown_security(monkeypatch):
+    async def not_found(id):
+        raise HistoryNotFoundError(f"No price history found for {id}.")
+
+    monkeypatch.setattr(main, "async_get_history", not_found)
+
+    response = TestClient(main.app).get("/finance/history/NOSUCH")
+    assert response.status_code == 404
+
+
+def test_least_recently_used_histories_are_evicted_with_their_locks(monkeypatch):
+    monkeypatch.setattr(history, "fetch_page", lambda url, pattern, required, wait_for=None: _page(("16 Oct 2026", 101.0)))
+    monkeypatch.setattr(history, "_histories", OrderedDict())
+    monkeypatch.setattr(history, "_ticker_locks", {})
+    monkeypatch.setattr(history.settings, "HISTORY_MAX_SECURITIES", 2)
+
+    for id in ("A", "B", "A", "C"):
+        get_history(id)
+
+    assert list(history._histories) == ["A", "C"]
+    assert set(history._ticker_locks) == {"A", "C"}
+
+
+def test_failed_first_fetch_keeps_no_lock(monkeypatch):
+    def failing_fetch_page(url, pattern, required, wait_for=None):
+        raise RuntimeError("blocked")
+
+    monkeypatch.setattr(history, "fetch_page", failing_fetch_page)
+    monkeypatch.setattr(history, "_ticker_locks", {})
+
+    with pytest.raises(RuntimeError):
+        get_history("NOSUCH")
+    assert history._ticker_locks == {}
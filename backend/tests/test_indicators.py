@@ -0,0 +1,151 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.service.calculations import (
+    INDICATORS, WARMUP, IndicatorState, atr, bollinger, compute_indicators, drawdown, ema, macd, rsi, sma, volatility,
+)
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def prices() -> dict[str, np.ndarray]:
+    rng = np.random.default_rng(0)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (3, 80)), axis=-1))
+    return {
+        "close": close,
+        "high": close * (1 + rng.uniform(0, 0.01, close.shape)),
+        "low": close * (1 - rng.uniform(0, 0.01, close.shape)),
+    }
+
+
+def _reference_smooth(x: list[float], alpha: float, period: int) -> list[float]:
+    # the textbook recursion, seeded with the simple average of the first period values
+    out = [np.nan] * len(x)
+    if len(x) < period:
+        return out
+    out[period - 1] = sum(x[:period]) / period
+    for t in range(period, len(x)):
+        out[t] = alpha * x[t] + (1 - alpha) * out[t - 1]
+    return out
+
+
+def test_sma():
+    x = np.arange(1.0, 6.0)
+
+    np.testing.assert_allclose(sma(x, 3), [np.nan, np.nan, 2, 3, 4])
+
+
+def test_ema_is_seeded_with_the_simple_average(prices):
+    close = prices["close"][0]
+
+    np.testing.assert_allclose(ema(close, 10), _reference_smooth(list(close), 2 / 11, 10))
+
+
+def test_rsi_uses_wilder_smoothing(prices):
+    close = prices["close"][0]
+    change = np.diff(close)
+    gain = _reference_smooth(list(np.clip(change, 0, None)), 1 / 14, 14)
+    loss = _reference_smooth(list(np.clip(-change, 0, None)), 1 / 14, 14)
+    expected = [np.nan] + [100 - 100 / (1 + g / l) for g, l in zip(gain, loss)]
+
+    np.testing.assert_allclose(rsi(close, 14), expected)
+
+
+def test_rsi_is_undefined_before_its_period():
+    assert np.isnan(rsi(np.array([1.0, 2, 3, 4, 5]), 14)).all()
+
+
+def test_macd_signal_starts_once_the_line_does(prices):
+    close = prices["close"][0]
+    result = macd(close, 12, 26, 9)
+    line = ema(close, 12) - ema(close, 26)
+
+    assert np.isnan(line[:25]).all() and not np.isnan(line[25:]).any()
+    assert np.isnan(result["signal"][:33]).all() and not np.isnan(result["signal"][33:]).any()
+    np.testing.assert_allclose(result["signal"][25:], _reference_smooth(list(line[25:]), 2 / 10, 9))
+    np.testing.assert_allclose(result["histogram"], line - result["signal"])
+
+
+def test_atr(prices):
+    high, low, close = prices["high"][0], prices["low"][0], prices["close"][0]
+    prev_close = np.concatenate([close[:1], close[:-1]])
+    true_range = np.maximum(high - low, np.maximum(abs(high - prev_close), abs(low - prev_close)))
+
+    np.testing.assert_allclose(atr(high, low, close, 14), _reference_smooth(list(true_range), 1 / 14, 14))
+
+
+def test_bollinger(prices):
+    close = prices["close"][0]
+    result = bollinger(close, 20, 2.0)
+    std = np.array([np.std(close[t - 19:t + 1]) if t >= 19 else np.nan for t in range(len(close))])
+
+    np.testing.assert_allclose(result["middle"], sma(close, 20))
+    np.testing.assert_allclose(result["upper"] - result["middle"], 2 * std)
+
+
+def test_volatility(prices):
+    close = prices["close"][0]
+    returns = np.diff(np.log(close))
+    expected = [np.nan] * 20 + [np.std(returns[t - 19:t + 1], ddof=1) * np.sqrt(252) for t in range(19, len(returns))]
+
+    np.testing.assert_allclose(volatility(close, 20), expected)
+
+
+def test_drawdown():
+    np.testing.assert_allclose(drawdown(np.array([1.0, 2, 1, 4])), [0, 0, -0.5, 0])
+
+
+def test_state_update_matches_full_computation(prices):
+    close, high, low = prices["close"], prices["high"], prices["low"]
+    start = WARMUP + 5
+    state = IndicatorState(close[:, :start], high[:, :start], low[:, :start])
+
+    for t in range(start, close.shape[-1]):
+        latest = state.update(close[:, t], high[:, t], low[:, t])
+        full = compute_indicators(close[:, :t + 1], high[:, :t + 1], low[:, :t + 1])
+        for name in INDICATORS:
+            if isinstance(full[name], dict):
+                for line, values in full[name].items():
+                    np.testing.assert_allclose(latest[name][line], values[:, -1], err_msg=f"{name} {line}")
+            else:
+                np.testing.assert_allclose(latest[name], full[name][:, -1], err_msg=name)
+
+
+def test_state_needs_the_warm_up(prices):
+    with pytest.raises(ValueError):
+        IndicatorState(prices["close"][:, :WARMUP - 1])
+
+
+def test_endpoint_computes_every_series(prices):
+    close = prices["close"]
+    body = {
+        "series": {
+            "AAPL": {"close": close[0].tolist()},
+            # a different length is computed separately
+            "D05.SI": {"close": close[1, :30].tolist(), "high": prices["high"][1, :30].tolist(), "low": prices["low"][1, :30].tolist()},
+        },
+        "indicators": ["sma", "macd"],
+    }
+    response = client.post("/calculate/indicators", json=body)
+
+    assert response.status_code == 200
+    result = response.json()
+    np.testing.assert_allclose(np.array(result["AAPL"]["sma"], dtype=float), sma(close[0]))
+    assert result["D05.SI"]["sma"][:19] == [None] * 19
+    assert result["D05.SI"]["macd"]["signal"] == [None] * 30
+
+
+def test_endpoint_rejects_unknown_indicators():
+    response = client.post("/calculate/indicators", json={"series": {"AAPL": {"close": [1.0, 2.0]}}, "indicators": ["foo"]})
+
+    assert response.status_code == 422
+
+
+def test_endpoint_rejects_empty_series():
+    response = client.post("/calculate/indicators", json={"series": {"AAPL": {"close": []}}})
+
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body", "series", "AAPL", "close"]
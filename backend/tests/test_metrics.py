@@ -0,0 +1,110 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.metrics import (
+    Counter, Gauge, Histogram, Registry, _Metric, collect_timings, server_timing, stage_seconds, timed, timeouts_total,
+)
+from app.main import app
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def registry(monkeypatch) -> Registry:
+    # metrics register themselves on creation, keep the test ones out of the process registry
+    registry = Registry()
+    monkeypatch.setattr(metrics, "registry", registry)
+    return registry
+
+
+def test_render_counter_and_gauge(registry):
+    requests = Counter("requests_total", "Requests.", ("path",))
+    requests.inc(path="/a")
+    requests.inc(2, path='/"b"')
+    pages = Gauge("pages", "Pages in use.")
+    pages.track(lambda: 3)
+
+    assert registry.render() == (
+        "# HELP requests_total Requests.\n"
+        "# TYPE requests_total counter\n"
+        'requests_total{path="/a"} 1\n'
+        'requests_total{path="/\\"b\\""} 2\n'
+        "# HELP pages Pages in use.\n"
+        "# TYPE pages gauge\n"
+        "pages 3\n"
+    )
+
+
+def test_render_histogram_buckets_are_cumulative(registry):
+    latency = Histogram("latency_seconds", "Latency.", ("stage",), buckets=(0.1, 1))
+    for value in (0.05, 0.5, 5):
+        latency.observe(value, stage="parse")
+
+    assert registry.render().splitlines()[2:] == [
+        'latency_seconds_bucket{stage="parse",le="0.1"} 1',
+        'latency_seconds_bucket{stage="parse",le="1"} 2',
+        'latency_seconds_bucket{stage="parse",le="+Inf"} 3',
+        'latency_seconds_sum{stage="parse"} 5.55',
+        'latency_seconds_count{stage="parse"} 3',
+    ]
+
+
+def test_metrics_check_their_labels(registry):
+    with pytest.raises(ValueError):
+        Counter("requests_total", "Requests.", ("path",)).inc(method="GET")
+    with pytest.raises(TypeError):
+        _Metric("untyped", "Metrics must render their samples.")
+
+
+def _count(stage: str) -> int:
+    counts = stage_seconds._values.get((stage,))
+    return counts[-2] if counts else 0
+
+
+def test_timed_records_nested_stages_and_timeouts():
+    parses, timeouts = _count("test_parse"), timeouts_total._values.get(("test_navigate",), 0)
+
+    with collect_timings() as timings:
+        with timed("test_extract"):
+            with timed("test_parse"):
+                time.sleep(0.01)
+            with timed("test_parse"):
+                pass
+        with pytest.raises(TimeoutError):
+            with timed("test_navigate", timeouts=TimeoutError):
+                raise TimeoutError
+    # outside of a collection, stages are only observed by the histogram
+    with timed("test_parse"):
+        pass
+
+    assert list(timings) == ["test_parse", "test_extract", "test_navigate"]
+    assert timings["test_extract"] >= timings["test_parse"] >= 0.01
+    assert _count("test_parse") == parses + 3
+    assert timeouts_total._values[("test_navigate",)] == timeouts + 1
+    assert server_timing({"parse": 0.0125}) == "parse;dur=12.5"
+
+
+def test_metrics_endpoint():
+    client.get("/health")
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE http_request_seconds histogram" in response.text
+    assert 'http_request_seconds_count{method="GET",endpoint="health_check",status="200"}' in response.text
+
+
+def test_server_timing_is_reported_on_request(monkeypatch):
+    monkeypatch.setattr(settings, "SERVER_TIMING", True)
+    body = {"series": {"AAPL": {"close": [1.0, 2.0, 3.0]}}, "indicators": ["sma"]}
+
+    assert "Server-Timing" not in client.post("/calculate/indicators", json=body).headers
+    response = client.post("/calculate/indicators", json=body, headers={"X-Server-Timing": "1"})
+    assert response.headers["Server-Timing"].startswith("indicators;dur=")
+
+    monkeypatch.setattr(settings, "SERVER_TIMING", False)
+    assert "Server-Timing" not in client.post("/calculate/indicators", json=body, headers={"X-Server-Timing": "1"}).headers
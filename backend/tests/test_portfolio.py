@@ -0,0 +1,128 @@
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.service import portfolio
+from app.service.portfolio import PortfolioValuation
+
+QUOTES = {
+    "AAPL": {"name": "APPLE INC", "sector": "Technology", "exchange_currency": "USD", "price": 200.0},
+    "D05.SI": {"name": "DBS GROUP", "sector": "Financial Services", "exchange_currency": "SGD", "price": 40.0},
+    "Z74.SI": {"name": "SINGTEL", "sector": "Communication Services", "exchange_currency": "SGD", "price": 3.0},
+}
+FINANCIALS = {
+    "financial_statement": {
+        "financials": {
+            "TTM": {"income": 400, "shares": 100},
+            "31/12/2024": {"income": 300, "shares": 100},
+            "31/12/2023": {"income": 200, "shares": 100},
+            "31/12/2022": {"income": 100, "shares": 100},
+        },
+    },
+    "balance_sheet": {"TTM": {"assets": 2000, "liabilities": 1000, "book_value": 1000}},
+}
+RATES = {("SGD", "USD"): 0.75}
+
+client = TestClient(main.app)
+
+
+@pytest.fixture
+def upstream(monkeypatch) -> dict[str, list]:
+    """
+    Stub scrapers, recording their calls.
+    """
+    calls = {"quote": [], "financials": [], "rate": []}
+
+    async def scrape_quote(id):
+        calls["quote"].append(id)
+        await asyncio.sleep(0.01)
+        return QUOTES[id]
+
+    async def scrape_financials(id):
+        calls["financials"].append(id)
+        await asyncio.sleep(0.01)
+        return FINANCIALS, {}
+
+    async def get_exchange_rate(curr1, curr2):
+        calls["rate"].append((curr1, curr2))
+        await asyncio.sleep(0.01)
+        return RATES[curr1, curr2]
+
+    monkeypatch.setattr(portfolio, "async_scrape_quote", scrape_quote)
+    monkeypatch.setattr(portfolio, "async_scrape_financials", scrape_financials)
+    monkeypatch.setattr(portfolio, "async_get_exchange_rate", get_exchange_rate)
+    return calls
+
+
+def test_valuation_stream(upstream):
+    holdings = [
+        {"id": "AAPL", "quantity": 1},
+        {"id": "D05.SI", "quantity": 10},
+        {"id": "AAPL", "quantity": 2},
+        {"id": "Z74.SI", "quantity": 100},
+    ]
+    response = client.post("/portfolio/valuation", json={"holdings": holdings})
+
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    results = {line["id"]: line["result"] for line in lines[:-1]}
+    # duplicate holdings are merged into one valuation
+    assert results["AAPL"]["quantity"] == 3
+    assert results["AAPL"]["value"] == 600.0
+    assert results["D05.SI"]["price"] == 30.0
+    assert results["D05.SI"]["eps"] == pytest.approx(4 * 0.75)
+    assert results["Z74.SI"]["value"] == pytest.approx(225.0)
+    assert lines[-1] == {"summary": {"currency": "USD", "value": pytest.approx(1125.0), "holdings": 3, "errors": 0}}
+    assert sorted(upstream["quote"]) == ["AAPL", "D05.SI", "Z74.SI"]
+    # one rate for both SGD holdings, none for the base currency
+    assert upstream["rate"] == [("SGD", "USD")]
+
+
+def test_holdings_pending_at_the_deadline_are_errors(upstream, monkeypatch):
+    scrape_quote = portfolio.async_scrape_quote
+
+    async def slow_quote(id):
+        if id == "D05.SI":
+            await asyncio.sleep(10)
+        return await scrape_quote(id)
+
+    monkeypatch.setattr(portfolio, "async_scrape_quote", slow_quote)
+
+    async def main():
+        valuation = PortfolioValuation({"AAPL": 1, "D05.SI": 10})
+        return [outcome async for outcome in valuation.stream(deadline=0.5)]
+
+    outcomes = asyncio.run(main())
+
+    assert outcomes[0]["id"] == "AAPL"
+    assert outcomes[1] == {"id": "D05.SI", "error": "Valuation did not complete within 0.5s."}
+    assert outcomes[2]["summary"] == {"currency": "USD", "value": 200.0, "holdings": 2, "errors": 1}
+
+
+def test_failed_fetch_cancels_its_sibling(upstream, monkeypatch):
+    cancelled = []
+
+    async def failing_quote(id):
+        raise RuntimeError("scrape failed")
+
+    async def slow_financials(id):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(id)
+            raise
+
+    monkeypatch.setattr(portfolio, "async_scrape_quote", failing_quote)
+    monkeypatch.setattr(portfolio, "async_scrape_financials", slow_financials)
+
+    async def main():
+        with pytest.raises(RuntimeError):
+            await PortfolioValuation({"AAPL": 1}).value("AAPL")
+        # let the cancellation reach the sibling, before the event loop cancels what is left on shutdown
+        await asyncio.sleep(0)
+        return list(cancelled)
+
+    assert asyncio.run(main()) == ["AAPL"]
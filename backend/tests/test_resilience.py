@@ -0,0 +1,26 @@
+from app.core.config import settings
+from app.service.resilience import Upstream
+
+PATTERN = "test:page"
+
+
+def test_timeout_widens_again_after_a_slowdown(monkeypatch):
+    monkeypatch.setattr(settings, "ADAPTIVE_TIMEOUT_MIN", 100)
+    monkeypatch.setattr(settings, "ADAPTIVE_TIMEOUT_MIN_SAMPLES", 10)
+    monkeypatch.setattr(settings, "ADAPTIVE_TIMEOUT_WINDOW", 20)
+    upstream = Upstream("test.example")
+    default = 10000
+
+    for _ in range(20):
+        upstream.record_latency(PATTERN, "http", 0.1)
+    assert upstream.timeout(PATTERN, "http", default) == 200
+
+    # the host now takes 1.5s, above the adapted timeout
+    latency = 1.5
+    for _ in range(100):
+        timeout = upstream.timeout(PATTERN, "http", default)
+        if timeout >= latency * 1000:
+            upstream.record_latency(PATTERN, "http", latency)
+        else:
+            upstream.record_timeout(PATTERN, "http", timeout)
+    assert latency * 1000 <= upstream.timeout(PATTERN, "http", default) <= default
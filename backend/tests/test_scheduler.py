@@ -0,0 +1,60 @@
+import asyncio
+import time
+
+from app.core.config import settings
+from app.service.scheduler import RefreshScheduler, SharedRequests
+
+
+def test_touch_keeps_the_most_recently_requested(monkeypatch):
+    monkeypatch.setattr(settings, "SCHEDULER_RECENT_MAX", 2)
+
+    async def main():
+        scheduler = RefreshScheduler(concurrency=1)
+        scheduler.start(watchlist=[], fx=False)
+        try:
+            for id in ("A", "B", "A", "C"):
+                scheduler.touch(id)
+            return list(scheduler._requested)
+        finally:
+            await scheduler.stop()
+
+    assert asyncio.run(main()) == ["A", "C"]
+
+
+def test_requests_from_other_workers_are_kept_fresh(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "SCHEDULER_SYNC_INTERVAL", 0.05)
+    path = tmp_path / "scheduler.sqlite3"
+
+    async def main():
+        # the worker running the scheduler, and one handling requests only
+        running = RefreshScheduler(concurrency=1, shared=SharedRequests(path))
+        other = RefreshScheduler(concurrency=1, shared=SharedRequests(path))
+        running.start(watchlist=[], fx=False)
+        try:
+            other.touch("AAPL")
+            await asyncio.sleep(0.2)
+            return list(running._requested), running._scheduled
+        finally:
+            await running.stop()
+            running.close()
+            other.close()
+
+    requested, scheduled = asyncio.run(main())
+    assert requested == ["AAPL"]
+    assert scheduled == {("price", "AAPL"), ("quote", "AAPL")}
+
+
+def test_shared_requests_are_bounded(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "SCHEDULER_RECENT_MAX", 2)
+    shared = SharedRequests(tmp_path / "scheduler.sqlite3")
+    for id in ("A", "B", "A", "C"):
+        shared.add(id)
+        time.sleep(0.01)
+
+    requested = shared.since(0)
+    assert [id for id, _ in requested] == ["A", "C"]
+    assert [id for id, _ in shared.since(requested[0][1])] == ["C"]
+
+    monkeypatch.setattr(settings, "SCHEDULER_RECENT_TTL", 0)
+    assert shared.since(0) == []
+    shared.close()
@@ -0,0 +1,57 @@
+import numpy as np
+
+from app.core.config import settings
+from app.service.history import COLUMNS, PriceHistory
+from app.service.store import FundamentalsStore
+
+
+class FakeResult:
+    def __init__(self, count: int):
+        self.upserted_count = count
+        self.matched_count = 0
+
+
+class FakeCollection:
+    def __init__(self):
+        self.docs = {}
+
+    def bulk_write(self, operations, ordered=True):
+        for operation in operations:
+            self.docs[operation._filter["_id"]] = operation._doc
+        return FakeResult(len(operations))
+
+
+def _history(dates: list[str], closes: list[float]) -> PriceHistory:
+    return PriceHistory(np.array(dates, dtype="datetime64[D]"), {name: closes for name in COLUMNS})
+
+
+def test_save_prices_only_writes_the_years_an_update_touched(monkeypatch):
+    store = FundamentalsStore(batch_size=10)
+    store.prices.collection = FakeCollection()
+    monkeypatch.setattr(store, "_connect", lambda: None)
+
+    history = _history(["2024-12-30", "2025-06-02", "2025-12-31", "2026-10-15", "2026-10-16"], [1.0, 2.0, 3.0, 4.0, 5.0])
+    assert store.save_prices({"AAPL": history}) == 3
+    # the last bar is refreshed and a new one appended, as ``get_history`` does
+    history.append(_history(["2026-10-16", "2026-10-19"], [6.0, 7.0]))
+
+    assert store.save_prices({"AAPL": history}) == 1
+    assert store.prices.collection.docs["AAPL:2026"]["close"] == [4.0, 6.0, 7.0]
+    assert store.save_prices({"AAPL": history}) == 0
+
+
+def test_saved_state_is_bounded(monkeypatch):
+    monkeypatch.setattr(settings, "STORE_SAVED_MAX", 2)
+    store = FundamentalsStore(batch_size=10)
+    store.prices.collection = FakeCollection()
+    monkeypatch.setattr(store, "_connect", lambda: None)
+
+    histories = {id: _history(["2026-10-15", "2026-10-16"], [1.0, 2.0]) for id in ("A", "B", "C")}
+    for id in ("A", "B", "A", "C"):
+        store.save_prices({id: histories[id]})
+
+    assert list(store._saved_prices) == ["A", "C"]
+    # a forgotten history is written again in full
+    assert store.save_prices({"B": histories["B"]}) == 1
+    assert store.save_prices({"C": histories["C"]}) == 0
+    assert list(store._saved_prices) == ["B", "C"]
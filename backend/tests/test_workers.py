@@ -0,0 +1,35 @@
+import pytest
+
+from app.core import workers
+from app.core.config import settings
+from app.core.workers import hold_worker_lock
+
+
+@pytest.fixture
+def lock_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "SHARED_STATE_DIR", str(tmp_path))
+    monkeypatch.setattr(workers, "_held", {})
+    yield tmp_path
+    for lock_file in workers._held.values():
+        lock_file.close()
+
+
+def test_one_worker_holds_the_lock(lock_dir):
+    assert hold_worker_lock("scheduler")
+    assert hold_worker_lock("scheduler")
+    assert (lock_dir / "scheduler.lock").exists()
+
+    # another worker, which has not opened the lock file yet
+    held = workers._held
+    workers._held = {}
+    assert not hold_worker_lock("scheduler")
+    assert hold_worker_lock("other")
+    workers._held["scheduler"] = held.pop("scheduler")
+
+
+def test_lock_is_taken_over_once_released(lock_dir):
+    assert hold_worker_lock("scheduler")
+    # the holding process exited
+    workers._held.pop("scheduler").close()
+
+    assert hold_worker_lock("scheduler")
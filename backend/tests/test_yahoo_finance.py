@@ -0,0 +1,59 @@
+import re
+from pathlib import Path
+
+import pytest
+
+from app.service import cache as cache_module
+from app.service import fetch, yahoo_finance
+from app.service.cache import LRUCache, TieredCache
+from app.service.fetch import _has_fields
+from app.service.yahoo_finance import OVERVIEW_FIELDS, _quote_fields, scrape_quote
+
+FIXTURES = Path(__file__).parents[1] / "benchmarks" / "fixtures"
+OVERVIEW = (FIXTURES / "overview-AAPL.html").read_text()
+HISTORY = (FIXTURES / "history-AAPL.html").read_text()
+# the overview fixture without the price of the security, keeping the related ones
+NO_PRICE = re.sub(r'<div class="price">.*?</div>', "", OVERVIEW)
+
+
+@pytest.fixture
+def yahoo(stub_server, monkeypatch):
+    monkeypatch.setattr(yahoo_finance, "ROOT_YAHOO_URL", f"{stub_server.url}/quote")
+    monkeypatch.setattr(cache_module, "cache", TieredCache(LRUCache()))
+    return stub_server
+
+
+def test_quote_page_without_price_is_incomplete():
+    assert _has_fields(OVERVIEW, _quote_fields("AAPL"))
+    assert _has_fields(NO_PRICE, OVERVIEW_FIELDS)
+    # related securities are streamed without the quote price test id
+    assert "MSFT" in NO_PRICE
+    assert not _has_fields(NO_PRICE, _quote_fields("AAPL"))
+    assert _has_fields(NO_PRICE.replace('data-symbol="MSFT"', 'data-symbol="AAPL"'), _quote_fields("AAPL"))
+
+
+def test_quote_reads_the_price_from_the_main_page(yahoo, monkeypatch):
+    yahoo.pages["/quote/AAPL"] = (200, OVERVIEW)
+    monkeypatch.setattr(fetch, "playwright_scrape", lambda url, **kwargs: pytest.fail("the browser must not be used"))
+
+    assert scrape_quote.__wrapped__("AAPL") == {
+        "name": "APPLE INC", "sector": "Technology", "exchange_currency": "USD", "price": 227.52,
+    }
+    assert yahoo.hits == ["/quote/AAPL"]
+
+
+def test_quote_falls_back_to_the_history_page(yahoo, monkeypatch):
+    yahoo.pages["/quote/AAPL"] = (200, NO_PRICE)
+    yahoo.pages["/quote/AAPL/history"] = (200, HISTORY)
+    rendered = []
+
+    def fake_scrape(url, **kwargs):
+        # the rendered page has no price either
+        rendered.append(url)
+        return NO_PRICE
+
+    monkeypatch.setattr(fetch, "playwright_scrape", fake_scrape)
+
+    assert scrape_quote.__wrapped__("AAPL")["price"] == 1234.1
+    assert rendered == [f"{yahoo.url}/quote/AAPL"]
+    assert yahoo.hits == ["/quote/AAPL", "/quote/AAPL/history"]